@@ -1,37 +1,68 @@
 import uuid
 from fastapi import Depends, HTTPException, status, Header
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError
 from app.db import crud, session, models
 from app.schemas.token import TokenData
 from app.core.security import jwt
 from app.core.config import settings
+from app.core import identity_cache
 
-def get_current_user(authorization: str = Header(...), db: Session = Depends(session.get_db)) -> models.User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def _decode_token(authorization: str) -> TokenData:
     try:
         token_str = authorization.split(" ")[1]
         payload = jwt.decode(token_str, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        
+
         email: str = payload.get("sub")
-        bot_id_str: str = payload.get("bot_id") 
-        
+        bot_id_str: str = payload.get("bot_id")
+
         if email is None:
             raise credentials_exception
-        if bot_id_str:
-            bot_id = uuid.UUID(bot_id_str)
-            user = crud.get_user_by_email_and_bot(db, email=email, bot_id=bot_id)
-        else:
-            user = db.query(models.User).filter(models.User.email == email, models.User.bot_id == None).first()
-
-    except (JWTError, IndexError, ValueError): 
+        bot_id = uuid.UUID(bot_id_str) if bot_id_str else None
+    except (JWTError, IndexError, ValueError):
         raise credentials_exception
-    
+    return TokenData(email=email, bot_id=bot_id)
+
+def _resolve_user(db: Session, token_data: TokenData) -> models.User:
+    return identity_cache.get_user(token_data.email, token_data.bot_id) or _load_user(db, token_data)
+
+def _load_user(db: Session, token_data: TokenData) -> models.User:
+    if token_data.bot_id:
+        user = crud.get_user_by_email_and_bot(db, email=token_data.email, bot_id=token_data.bot_id)
+    else:
+        user = db.query(models.User).filter(models.User.email == token_data.email, models.User.bot_id == None).first()
+
     if user is None:
         raise credentials_exception
-        
+
+    db.expunge(user)
+    identity_cache.put_user(user)
     return user
+
+def get_current_user(authorization: str = Header(...), db: Session = Depends(session.get_db)) -> models.User:
+    return _resolve_user(db, _decode_token(authorization))
+
+async def get_current_user_async(authorization: str = Header(...), db: AsyncSession = Depends(session.get_async_db)) -> models.User:
+    token_data = _decode_token(authorization)
+    return identity_cache.get_user(token_data.email, token_data.bot_id) or await db.run_sync(_load_user, token_data)
+
+def get_cached_bot(db: Session, bot_id: uuid.UUID) -> models.Bot | None:
+    """Loads a bot through the identity cache. The returned row is detached and shared: don't modify it."""
+    return identity_cache.get_bot(bot_id) or _load_bot(db, bot_id)
+
+def _load_bot(db: Session, bot_id: uuid.UUID) -> models.Bot | None:
+    bot = crud.get_bot(db, bot_id=bot_id)
+    if bot is not None:
+        db.expunge(bot)
+        identity_cache.put_bot(bot)
+    return bot
+
+async def aget_cached_bot(db: AsyncSession, bot_id: uuid.UUID) -> models.Bot | None:
+    return identity_cache.get_bot(bot_id) or await db.run_sync(_load_bot, bot_id)
@@ -1,70 +1,115 @@
 from typing import List 
+import json
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import crud, session, models
-from app.schemas.chat import UserChatSummary, AnalyticsReport
-from app.core import llm
-from app.api.dependencies import get_current_user
+from app.schemas.chat import UserChatSummary, AnalyticsReport, SummaryJobStatus
+from app.core import analytics, summary_jobs
+from app.core.config import settings
+from app.api.dependencies import get_current_user, get_current_user_async, get_cached_bot, aget_cached_bot
+from app.api.pagination import PageParams, paginate
 
 router = APIRouter()
 
 @router.get("/bots/{bot_id}/summaries", response_model=List[UserChatSummary])
 def get_all_bot_summaries(
     bot_id: uuid.UUID,
-    db: Session = Depends(session.get_db),
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: Session = Depends(session.get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    db_bot = crud.get_bot(db, bot_id=bot_id)
+    db_bot = get_cached_bot(db, bot_id)
     if not db_bot or current_user.id != db_bot.owner_id:
         raise HTTPException(status_code=403, detail="Permission denied.")
 
-    summaries = crud.get_all_summaries_for_bot(db, bot_id=bot_id)
+    summaries = crud.get_summaries_page(db, bot_id=bot_id, limit=page.fetch_limit, after=page.after)
+    summaries = paginate(summaries, page, request, response, key=lambda s: (s.created_at, s.id))
     return [{"summary": s.summary_text, "session_id": s.session_id} for s in summaries]
 
+async def _stream_summaries_ndjson(bot_id: uuid.UUID):
+    # The request's session is closed once the response starts, so the stream opens its own.
+    async with session.AsyncReadSessionLocal() as db:
+        result = await db.stream(crud.select_summaries_for_export(bot_id).execution_options(yield_per=settings.EXPORT_BATCH_ROWS))
+        async for rows in result.partitions():
+            yield "".join(
+                json.dumps({"session_id": row.session_id, "summary": row.summary_text, "created_at": row.created_at.isoformat()}) + "\n"
+                for row in rows
+            )
+
+@router.get("/bots/{bot_id}/summaries/export")
+async def export_bot_summaries(
+    bot_id: uuid.UUID,
+    db: AsyncSession = Depends(session.get_async_read_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """All of a bot's summaries as NDJSON, streamed from a server-side cursor EXPORT_BATCH_ROWS at a time."""
+    db_bot = await aget_cached_bot(db, bot_id)
+    if current_user.bot_id is not None or not db_bot or current_user.id != db_bot.owner_id:
+        raise HTTPException(status_code=403, detail="Permission denied.")
+
+    return StreamingResponse(
+        _stream_summaries_ndjson(bot_id), media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="summaries-{bot_id}.ndjson"'},
+    )
+
 @router.post("/bots/{bot_id}/process-summaries", status_code=status.HTTP_202_ACCEPTED)
-def process_new_chat_summaries(
+async def process_new_chat_summaries(
     bot_id: uuid.UUID,
-    db: Session = Depends(session.get_db),
-    current_user: models.User = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(session.get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
-    if current_user.bot_id is not None or current_user.id != crud.get_bot(db, bot_id).owner_id:
+    db_bot = await aget_cached_bot(db, bot_id)
+    if current_user.bot_id is not None or not db_bot or current_user.id != db_bot.owner_id:
         raise HTTPException(status_code=403, detail="Permission denied.")
 
-    unsummarized = crud.get_unsummarized_sessions(db, bot_id=bot_id)
+    active_job = summary_jobs.get_active_job_for_bot(bot_id)
+    if active_job:
+        return {"message": "A summary job is already running for this bot.", "job_id": active_job.id}
+
+    unsummarized = await db.run_sync(crud.get_unsummarized_sessions, bot_id=bot_id)
     if not unsummarized:
         return {"message": "No new chat sessions to process."}
 
-    processed_count = 0
-    for session_info in unsummarized:
-        full_history = crud.get_full_chat_history_by_session(db, session_id=session_info.session_id, user_id=session_info.user_id)
-        if full_history:
-            # UPDATED: Call the new admin-specific summary function
-            summary_text = llm.summarize_conversation_for_admin(full_history)
-            crud.create_chat_summary(db, bot_id=bot_id, session_id=session_info.session_id, summary_text=summary_text)
-            processed_count += 1
-    
-    return {"message": f"Successfully processed and stored {processed_count} new chat summaries."}
+    job = summary_jobs.create_job(
+        bot_id=bot_id, owner_id=current_user.id,
+        sessions=[(s.session_id, s.user_id) for s in unsummarized]
+    )
+    background_tasks.add_task(summary_jobs.run_summary_job, job)
+    return {"message": f"Started processing {job.total_sessions} chat sessions.", "job_id": job.id}
+
+@router.get("/jobs/{job_id}", response_model=SummaryJobStatus)
+async def get_summary_job_status(
+    job_id: uuid.UUID,
+    current_user: models.User = Depends(get_current_user_async)
+):
+    job = summary_jobs.get_job(job_id)
+    if not job or job.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
 
 @router.get("/bots/{bot_id}/analytics", response_model=AnalyticsReport)
-def get_bot_analytics(
+async def get_bot_analytics(
     bot_id: uuid.UUID,
-    db: Session = Depends(session.get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(session.get_async_read_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
-    db_bot = crud.get_bot(db, bot_id=bot_id)
-    if current_user.bot_id is not None or current_user.id != db_bot.owner_id:
+    db_bot = await aget_cached_bot(db, bot_id)
+    if current_user.bot_id is not None or not db_bot or current_user.id != db_bot.owner_id:
         raise HTTPException(status_code=403, detail="Permission denied.")
 
-    summaries_from_db = crud.get_all_summaries_for_bot(db, bot_id=bot_id)
-    if not summaries_from_db:
+    result = await analytics.get_analytics_report(db, bot_id=bot_id)
+    if result is None:
         raise HTTPException(status_code=404, detail="No summary data available for this bot. Run processing first.")
 
-    summary_texts = [s.summary_text for s in summaries_from_db]
-    analytics_data = llm.generate_analytics_summary(summary_texts)
-
+    total_summaries, analytics_data = result
     return AnalyticsReport(
         bot_name=db_bot.name,
-        total_summaries_analyzed=len(summary_texts),
+        total_summaries_analyzed=total_summaries,
         **analytics_data
     )
@@ -1,7 +1,7 @@
 import uuid
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import crud, session, models
 from app.schemas.user import UserCreate, User
 from app.schemas.token import Token
@@ -9,46 +9,76 @@ from app.core import security
 
 router = APIRouter()
 
+password_hashing_busy = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many login attempts in progress, please retry shortly.",
+    headers={"Retry-After": "1"},
+)
+
+async def _hash_password(password: str) -> str:
+    try:
+        return await security.aget_password_hash(password)
+    except security.PasswordHashingBusy:
+        raise password_hashing_busy
+
+async def _verify_password(db: AsyncSession, user: models.User | None, password: str) -> bool:
+    """Checks the password and transparently rehashes it if BCRYPT_ROUNDS has changed."""
+    if not user:
+        return False
+    try:
+        valid, new_hash = await security.averify_and_update_password(password, user.hashed_password)
+    except security.PasswordHashingBusy:
+        raise password_hashing_busy
+    if valid and new_hash:
+        await db.run_sync(crud.update_user_password_hash, user=user, hashed_password=new_hash)
+    return valid
+
 @router.post("/admin/register", response_model=User, status_code=status.HTTP_201_CREATED)
-def create_admin_user(user: UserCreate, db: Session = Depends(session.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email, models.User.bot_id == None).first()
+async def create_admin_user(user: UserCreate, db: AsyncSession = Depends(session.get_async_db)):
+    db_user = await db.run_sync(crud.get_admin_user_by_email, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Admin email already registered",
         )
-    return crud.create_user(db=db, user=user, bot_id=None)
+    await db.commit()
+    hashed_password = await _hash_password(user.password)
+    return await db.run_sync(crud.create_user, user=user, hashed_password=hashed_password, bot_id=None)
 
 @router.post("/{bot_id}/register", response_model=User, status_code=status.HTTP_201_CREATED)
-def register_user_for_bot(bot_id: uuid.UUID, user: UserCreate, db: Session = Depends(session.get_db)):
-    db_bot = crud.get_bot(db, bot_id=bot_id)
+async def register_user_for_bot(bot_id: uuid.UUID, user: UserCreate, db: AsyncSession = Depends(session.get_async_db)):
+    db_bot = await db.run_sync(crud.get_bot, bot_id=bot_id)
     if not db_bot:
         raise HTTPException(status_code=404, detail="Bot not found")
-        
-    db_user = crud.get_user_by_email_and_bot(db, email=user.email, bot_id=bot_id)
+
+    db_user = await db.run_sync(crud.get_user_by_email_and_bot, email=user.email, bot_id=bot_id)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered for this bot",
         )
-    return crud.create_user(db=db, user=user, bot_id=bot_id)
+    # Release the connection while the password is hashed.
+    await db.commit()
+    hashed_password = await _hash_password(user.password)
+    return await db.run_sync(crud.create_user, user=user, hashed_password=hashed_password, bot_id=bot_id)
 
 @router.post("/admin/login", response_model=Token)
-def login_admin(db: Session = Depends(session.get_db), form_data: OAuth2PasswordRequestForm = Depends()):
-    user = db.query(models.User).filter(models.User.email == form_data.username, models.User.bot_id == None).first()
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+async def login_admin(db: AsyncSession = Depends(session.get_async_db), form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await db.run_sync(crud.get_admin_user_by_email, email=form_data.username)
+    await db.commit()
+    if not await _verify_password(db, user, form_data.password):
         raise HTTPException(status_code=401, detail="Incorrect admin email or password")
-    access_token = security.create_access_token(data={"sub": user.email}) 
+    access_token = security.create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/{bot_id}/login", response_model=Token)
-def login_user_for_bot(bot_id: uuid.UUID, db: Session = Depends(session.get_db), form_data: OAuth2PasswordRequestForm = Depends()):
-    user = crud.get_user_by_email_and_bot(db, email=form_data.username, bot_id=bot_id)
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+async def login_user_for_bot(bot_id: uuid.UUID, db: AsyncSession = Depends(session.get_async_db), form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await db.run_sync(crud.get_user_by_email_and_bot, email=form_data.username, bot_id=bot_id)
+    await db.commit()
+    if not await _verify_password(db, user, form_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password for this bot",
         )
     access_token = security.create_access_token(data={"sub": user.email, "bot_id": user.bot_id})
     return {"access_token": access_token, "token_type": "bearer"}
-
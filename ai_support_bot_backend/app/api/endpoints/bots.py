@@ -1,12 +1,11 @@
 import uuid
-import json
-import csv
-import io
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from app.db import crud, session, models
-from app.schemas.bot import Bot
+from app.schemas.bot import Bot, BotSettingsUpdate, FAQUploadResult
+from app.core import faq_ingest
+from app.core.retrieval import RETRIEVAL_BACKENDS
 from app.api.dependencies import get_current_user
 
 router = APIRouter()
@@ -15,44 +14,64 @@ router = APIRouter()
 def create_new_bot(
     name: str = Form(...),
     file: UploadFile = File(...),
+    retrieval_backend: str = Form("exact"),
+    prompt_token_budget: int | None = Form(None, ge=500),
     db: Session = Depends(session.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     if current_user.bot_id is not None:
         raise HTTPException(status_code=403, detail="Only admin users can create bots.")
+    if retrieval_backend not in RETRIEVAL_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unsupported retrieval backend: {', '.join(RETRIEVAL_BACKENDS)} only.")
 
-    faqs_data = []
-    contents = file.file.read()
-
-    if file.filename.endswith('.json'):
-        try:
-            data = json.loads(contents)
-            if isinstance(data, list) and all('question' in item and 'answer' in item for item in data):
-                faqs_data = data
-            else:
-                raise HTTPException(status_code=400, detail="Invalid JSON format.")
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=400, detail="Invalid JSON file.")
-
-    elif file.filename.endswith('.csv'):
-        try:
-            csv_file = io.StringIO(contents.decode('utf-8'))
-            reader = csv.DictReader(csv_file)
-            for row in reader:
-                if 'question' in row and 'answer' in row:
-                    faqs_data.append({"question": row['question'], "answer": row['answer']})
-                else:
-                    raise HTTPException(status_code=400, detail="CSV must have 'question' and 'answer' columns.")
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error processing CSV file: {e}")
-            
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported file format: .json or .csv only.")
-
-    if not faqs_data:
+    try:
+        faqs = faq_ingest.iter_uploaded_faqs(file.filename, file.file)
+        db_bot = crud.create_bot(db=db, name=name, owner_id=current_user.id, retrieval_backend=retrieval_backend,
+                                 prompt_token_budget=prompt_token_budget, commit=False)
+        faq_count = faq_ingest.ingest_faqs(db, bot_id=db_bot.id, faqs_hash=db_bot.faqs_hash, faqs=faqs)
+    except faq_ingest.FAQFormatError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not faq_count:
+        db.rollback()
         raise HTTPException(status_code=400, detail="No valid FAQ data found in the uploaded file.")
+    return db_bot
+
+@router.patch("/{bot_id}", response_model=Bot)
+def update_bot(
+    bot_id: uuid.UUID,
+    bot_settings: BotSettingsUpdate,
+    db: Session = Depends(session.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    db_bot = crud.get_bot(db, bot_id=bot_id)
+    if current_user.bot_id is not None or not db_bot or current_user.id != db_bot.owner_id:
+        raise HTTPException(status_code=403, detail="Permission denied.")
+    return crud.update_bot_settings(db, db_bot, bot_settings.model_dump(exclude_unset=True))
+
+@router.post("/{bot_id}/faqs", response_model=FAQUploadResult)
+def upload_bot_faqs(
+    bot_id: uuid.UUID,
+    file: UploadFile = File(...),
+    db: Session = Depends(session.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Adds the uploaded FAQs to the bot; an FAQ whose question already exists has its answer replaced."""
+    db_bot = crud.get_bot(db, bot_id=bot_id)
+    if current_user.bot_id is not None or not db_bot or current_user.id != db_bot.owner_id:
+        raise HTTPException(status_code=403, detail="Permission denied.")
+
+    try:
+        faqs = faq_ingest.iter_uploaded_faqs(file.filename, file.file)
+        faq_count = faq_ingest.ingest_faqs(db, bot_id=bot_id, faqs_hash=db_bot.faqs_hash, faqs=faqs)
+    except faq_ingest.FAQFormatError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return crud.create_bot(db=db, name=name, faqs_data=faqs_data, owner_id=current_user.id)
+    if not faq_count:
+        raise HTTPException(status_code=400, detail="No valid FAQ data found in the uploaded file.")
+    return FAQUploadResult(bot_id=bot_id, faqs_received=faq_count, total_faqs=crud.count_faqs(db, bot_id=bot_id))
 
 @router.get("/", response_model=List[Bot])
 def read_user_bots(db: Session = Depends(session.get_db), current_user: models.User = Depends(get_current_user)):
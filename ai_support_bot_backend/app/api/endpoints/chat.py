@@ -1,57 +1,79 @@
 import uuid
+import json
+import time
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import crud, session, models
 from app.schemas.chat import ChatRequest, ChatResponse, ChatMessage, ChatSession, UserChatSummary
-from app.core import llm
-from app.api.dependencies import get_current_user
+from app.core import llm, faq_index, rolling_summary, tracing
+from app.core.tracing import stage
+from app.core.metrics import CHAT_REQUESTS
+from app.core.chat_writer import persist_chat_turn
+from app.core.response_cache import response_cache, cache_bucket, is_cacheable
+from app.api.dependencies import get_current_user_async, aget_cached_bot
+from app.api.pagination import PageParams, paginate
 
 router = APIRouter()
 
+def _cache_result(cacheable: bool, cached_output: dict | None) -> str:
+    if not cacheable:
+        return "skipped"
+    return "miss" if cached_output is None else "hit"
+
 @router.get("/{bot_id}/sessions", response_model=List[ChatSession])
-def get_sessions_for_bot(
+async def get_sessions_for_bot(
     bot_id: uuid.UUID,
-    db: Session = Depends(session.get_db),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(session.get_async_read_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
     if current_user.bot_id != bot_id:
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    sessions = crud.get_user_chat_sessions(db, user_id=current_user.id, bot_id=bot_id)
-    return sessions
+    sessions = await db.run_sync(crud.get_user_chat_sessions, user_id=current_user.id, bot_id=bot_id, limit=page.fetch_limit, after=page.after)
+    return paginate(sessions, page, request, response, key=lambda s: (s.last_updated, s.id))
 
 @router.get("/summary/{session_id}", response_model=UserChatSummary)
-def get_user_chat_summary(
+async def get_user_chat_summary(
     session_id: str,
-    db: Session = Depends(session.get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(session.get_async_read_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
-    chat_history = crud.get_full_chat_history_by_session(db, session_id=session_id, user_id=current_user.id)
+    chat_history = await db.run_sync(crud.get_full_chat_history_by_session, session_id=session_id, user_id=current_user.id)
     if not chat_history:
         raise HTTPException(status_code=404, detail="Chat session not found or you do not have permission.")
+    await db.commit()
 
-    summary_text = llm.summarize_conversation_for_user(chat_history)
+    summary_text = await llm.asummarize_conversation_for_user(chat_history)
     return UserChatSummary(summary=summary_text, session_id=session_id)
 
 @router.get("/history/{session_id}", response_model=List[ChatMessage])
-def get_chat_history_for_session(
+async def get_chat_history_for_session(
     session_id: str,
-    db: Session = Depends(session.get_db),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(session.get_async_read_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
-    history = crud.get_full_chat_history_by_session(db, session_id=session_id, user_id=current_user.id)
-    if not history:
+    history = await db.run_sync(crud.get_chat_history_page, session_id=session_id, user_id=current_user.id, limit=page.fetch_limit, after=page.after)
+    # Past the first page an empty result just means the session has no more messages.
+    if not history and page.after is None:
         raise HTTPException(status_code=404, detail="Chat session not found or you do not have permission to view it.")
     
-    return history
+    return paginate(history, page, request, response, key=lambda m: (m.timestamp, m.id))
 
 @router.post("/{bot_id}", response_model=ChatResponse)
-def chat_with_bot(
+async def chat_with_bot(
     bot_id: uuid.UUID,
     request: ChatRequest,
-    db: Session = Depends(session.get_db),
-    current_user: models.User = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(session.get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
     if current_user.bot_id != bot_id:
         raise HTTPException(
@@ -59,24 +81,143 @@ def chat_with_bot(
             detail="You do not have permission to access this bot",
         )
     
-    chat_history = crud.get_chat_history(db, session_id=request.session_id, bot_id=bot_id, user_id=current_user.id)
-    relevant_faqs = llm.get_relevant_faqs(query=request.message, faqs_data=current_user.bot.faqs)
-
-    llm_output = llm.generate_llm_response(
-        query=request.message,
-        chat_history=chat_history,
-        relevant_faqs=relevant_faqs,
-        bot_name=current_user.bot.name 
-    )
+    CHAT_REQUESTS.labels(bot_id=str(bot_id), endpoint="chat").inc()
+    tracing.annotate(bot_id=bot_id, session_id=request.session_id)
+    with stage("bot"):
+        bot = await aget_cached_bot(db, bot_id)
+    with stage("history"):
+        chat_history, history_summary = await db.run_sync(
+            crud.get_chat_context, session_id=request.session_id, bot_id=bot_id, user_id=current_user.id,
+            limit=rolling_summary.history_window(),
+        )
+    with stage("faq_index"):
+        bot_index = await faq_index.aget_faq_index(db, bot)
+    cacheable = is_cacheable(chat_history)
+    with stage("retrieval"):
+        # Only a response cache lookup needs the query embedding beyond retrieval itself.
+        query_embedding, faq_ids = await llm.aretrieve_faqs(
+            query=request.message, faqs_data=bot_index.faqs, faq_index=bot_index.index,
+            lexical_index=bot_index.lexical, need_embedding=cacheable,
+        )
+    relevant_faqs = [bot_index.faqs[i] for i in faq_ids]
+    # End the read transaction so the pooled connection isn't held for the whole LLM call.
+    await db.commit()
+
+    llm_output = response_cache.lookup(cache_bucket(bot, faq_ids), query_embedding) if cacheable else None
+    tracing.annotate(response_cache=_cache_result(cacheable, llm_output))
+    if llm_output is None:
+        with stage("llm"):
+            llm_output = await llm.agenerate_llm_response(
+                query=request.message,
+                chat_history=chat_history,
+                relevant_faqs=relevant_faqs,
+                bot_name=bot.name,
+                history_summary=history_summary,
+                token_budget=bot.prompt_token_budget,
+            )
+        if cacheable and llm.is_cacheable_answer(llm_output["answer"]):
+            response_cache.store(cache_bucket(bot, faq_ids), query_embedding, llm_output)
     response_text = llm_output.get("answer")
     suggestions = llm_output.get("suggestions")
 
-    crud.create_chat_message(
-        db, session_id=request.session_id, bot_id=bot_id, user_id=current_user.id, role="user", message=request.message
-    )
-    crud.create_chat_message(
-        db, session_id=request.session_id, bot_id=bot_id, user_id=current_user.id, role="bot", message=response_text
-    )
+    with stage("persist"):
+        await persist_chat_turn(
+            session_id=request.session_id, bot_id=bot_id, user_id=current_user.id, user_message=request.message, bot_message=response_text
+        )
+    if rolling_summary.is_fold_due(chat_history):
+        background_tasks.add_task(rolling_summary.update_rolling_summary, request.session_id, current_user.id)
 
     return ChatResponse(response=response_text, suggested_actions=suggestions)
 
+@router.post("/{bot_id}/stream")
+async def stream_chat_with_bot(
+    bot_id: uuid.UUID,
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(session.get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Streams the reply as NDJSON: one {"type": "token", "text": ...} line per answer chunk,
+    then a final {"type": "done", "response": ..., "suggested_actions": [...]} line. If the LLM
+    failed, the done line has "error": true and "response" is the canned answer that is stored.
+    """
+    if current_user.bot_id != bot_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to access this bot",
+        )
+
+    CHAT_REQUESTS.labels(bot_id=str(bot_id), endpoint="stream").inc()
+    tracing.annotate(bot_id=bot_id, session_id=request.session_id)
+    with stage("bot"):
+        bot = await aget_cached_bot(db, bot_id)
+    with stage("history"):
+        chat_history, history_summary = await db.run_sync(
+            crud.get_chat_context, session_id=request.session_id, bot_id=bot_id, user_id=current_user.id,
+            limit=rolling_summary.history_window(),
+        )
+    with stage("faq_index"):
+        bot_index = await faq_index.aget_faq_index(db, bot)
+    cacheable = is_cacheable(chat_history)
+    with stage("retrieval"):
+        # Only a response cache lookup needs the query embedding beyond retrieval itself.
+        query_embedding, faq_ids = await llm.aretrieve_faqs(
+            query=request.message, faqs_data=bot_index.faqs, faq_index=bot_index.index,
+            lexical_index=bot_index.lexical, need_embedding=cacheable,
+        )
+    relevant_faqs = [bot_index.faqs[i] for i in faq_ids]
+    await db.commit()
+    user_id = current_user.id
+    cached_output = response_cache.lookup(cache_bucket(bot, faq_ids), query_embedding) if cacheable else None
+    tracing.annotate(response_cache=_cache_result(cacheable, cached_output))
+
+    async def event_stream():
+        failed = False
+        if cached_output is not None:
+            answer, suggestions = cached_output["answer"], cached_output["suggestions"]
+            yield json.dumps({"type": "token", "text": answer}) + "\n"
+        else:
+            parser = llm.ResponseStreamParser()
+            started, first_chunk = time.perf_counter(), True
+            stream = llm.astream_llm_response(
+                query=request.message, chat_history=chat_history, relevant_faqs=relevant_faqs,
+                bot_name=bot.name, history_summary=history_summary, token_budget=bot.prompt_token_budget,
+            )
+            async for chunk in stream:
+                if first_chunk:
+                    tracing.record_stage("llm_first_chunk", time.perf_counter() - started)
+                    first_chunk = False
+                text = parser.feed(chunk)
+                if text:
+                    yield json.dumps({"type": "token", "text": text}) + "\n"
+            text = parser.finish()
+            if text:
+                yield json.dumps({"type": "token", "text": text}) + "\n"
+            tracing.record_stage("llm", time.perf_counter() - started)
+            failed = stream.failed
+            if failed:
+                # Whatever was streamed before the failure is not a reply worth caching or storing.
+                answer, suggestions = stream.error_answer, []
+            else:
+                answer, suggestions = parser.answer, parser.suggestions
+                if cacheable and llm.is_cacheable_answer(answer):
+                    response_cache.store(cache_bucket(bot, faq_ids), query_embedding, {"answer": answer, "suggestions": suggestions})
+
+        with stage("persist"):
+            await persist_chat_turn(
+                session_id=request.session_id, bot_id=bot_id, user_id=user_id, user_message=request.message, bot_message=answer
+            )
+
+        done = {"type": "done", "response": answer, "suggested_actions": suggestions}
+        yield json.dumps({**done, "error": True} if failed else done) + "\n"
+
+    if rolling_summary.is_fold_due(chat_history):
+        # Background tasks run once the stream, and so the turn's write, has finished.
+        background_tasks.add_task(rolling_summary.update_rolling_summary, request.session_id, user_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,49 @@
+import json
+import uuid
+import base64
+import datetime
+from fastapi import HTTPException, Query, Request, Response
+from app.core.config import settings
+
+def encode_cursor(timestamp: datetime.datetime, row_id: uuid.UUID) -> str:
+    raw = json.dumps([timestamp.isoformat(), str(row_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(timestamp), uuid.UUID(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+class PageParams:
+    """
+    The limit and cursor query parameters of a keyset-paginated list endpoint. Pagination is
+    opt-in: with neither, limit is None and the endpoint returns the whole list, as it did before.
+    """
+    def __init__(
+        self,
+        limit: int | None = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+        cursor: str | None = Query(None),
+    ):
+        self.limit = settings.PAGE_DEFAULT_LIMIT if limit is None and cursor else limit
+        self.cursor = cursor
+        self.after = decode_cursor(cursor) if cursor else None
+
+    @property
+    def fetch_limit(self) -> int | None:
+        """Rows to query: one past the page, to tell whether there is a next one."""
+        return None if self.limit is None else self.limit + 1
+
+def paginate(rows: list, page: PageParams, request: Request, response: Response, key) -> list:
+    """
+    Trims the one extra row the query fetched past the limit and, if there was one, points
+    X-Next-Cursor and a rel="next" Link header at the page after the last row kept.
+    """
+    if page.limit is not None and len(rows) > page.limit:
+        rows = rows[:page.limit]
+        cursor = encode_cursor(*key(rows[-1]))
+        response.headers["X-Next-Cursor"] = cursor
+        response.headers["Link"] = f'<{request.url.include_query_params(limit=page.limit, cursor=cursor)}>; rel="next"'
+    return rows
@@ -0,0 +1,111 @@
+import json
+import uuid
+import asyncio
+import hashlib
+import logging
+from cachetools import LRUCache
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import crud
+from . import llm
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Partial analyses keyed by a hash of their exact input, so unchanged chunks are never re-analysed.
+_partial_cache = LRUCache(maxsize=settings.ANALYTICS_CACHE_MAX_CHUNKS)
+# bot_id -> (summaries fingerprint, final report)
+_report_cache = LRUCache(maxsize=1000)
+
+def _content_hash(kind: str, items: list) -> str:
+    return hashlib.sha256(json.dumps([kind, items], sort_keys=True).encode("utf-8")).hexdigest()
+
+def chunk_summaries(summaries: list[str], token_budget: int, target_size: int) -> list[list[str]]:
+    """
+    Splits summaries into chunks of at most token_budget tokens. Boundaries are also placed
+    after summaries whose content hash hits 1/target_size, so adding, removing or editing a
+    summary only changes the chunk it lives in instead of shifting every later boundary.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for summary in summaries:
+        tokens = llm.estimate_tokens(summary)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += tokens
+        if int(hashlib.md5(summary.encode("utf-8")).hexdigest(), 16) % target_size == 0:
+            chunks.append(current)
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _group_reports(reports: list[dict], token_budget: int) -> list[list[dict]]:
+    groups, current, current_tokens = [], [], 0
+    for report in reports:
+        tokens = llm.estimate_tokens(json.dumps(report))
+        if len(current) >= 2 and current_tokens + tokens > token_budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(report)
+        current_tokens += tokens
+    groups.append(current)
+    return groups
+
+async def _cached_call(kind: str, items: list, semaphore: asyncio.Semaphore, call):
+    key = _content_hash(kind, items)
+    report = _partial_cache.get(key)
+    if report is not None:
+        return report, True
+    async with semaphore:
+        try:
+            report = await call(items)
+        except Exception as e:
+            logger.error(f"Error generating analytics: {e}")
+            return llm.analytics_error_report(), False
+    _partial_cache[key] = report
+    return report, True
+
+async def _single(group: list[dict]):
+    return group[0], True
+
+async def build_analytics_report(summaries: list[str]) -> tuple[dict, bool]:
+    """Map-reduce over the summaries; returns the report and whether every step succeeded."""
+    semaphore = asyncio.Semaphore(settings.ANALYTICS_CONCURRENCY)
+    chunks = chunk_summaries(summaries, settings.ANALYTICS_CHUNK_TOKEN_BUDGET, settings.ANALYTICS_CHUNK_SUMMARIES)
+    results = await asyncio.gather(*(
+        _cached_call("map", chunk, semaphore, llm.agenerate_analytics_summary) for chunk in chunks
+    ))
+    reports, all_ok = [report for report, _ in results], all(ok for _, ok in results)
+
+    # Merge partial reports level by level until a single report remains.
+    while len(reports) > 1:
+        results = await asyncio.gather(*(
+            _cached_call("reduce", group, semaphore, llm.amerge_analytics_reports) if len(group) > 1 else _single(group)
+            for group in _group_reports(reports, settings.ANALYTICS_CHUNK_TOKEN_BUDGET)
+        ))
+        reports, all_ok = [report for report, _ in results], all_ok and all(ok for _, ok in results)
+    return reports[0], all_ok
+
+async def get_analytics_report(db: AsyncSession, bot_id: uuid.UUID) -> tuple[int, dict] | None:
+    """
+    Returns (summary count, report) for a bot, or None if it has no summaries. The final
+    report is reused until a summary is added or updated.
+    """
+    count, last_created_at = await db.run_sync(crud.get_summaries_fingerprint, bot_id=bot_id)
+    if not count:
+        return None
+    fingerprint = (count, last_created_at)
+    cached = _report_cache.get(bot_id)
+    if cached and cached[0] == fingerprint:
+        return count, cached[1]
+
+    summaries = await db.run_sync(crud.get_all_summaries_for_bot, bot_id=bot_id)
+    summary_texts = [s.summary_text for s in sorted(summaries, key=lambda s: (s.created_at, s.session_id))]
+    # Release the connection before the LLM calls.
+    await db.commit()
+
+    report, all_ok = await build_analytics_report(summary_texts)
+    if all_ok:
+        _report_cache[bot_id] = (fingerprint, report)
+    return len(summary_texts), report
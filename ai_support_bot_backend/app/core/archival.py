@@ -0,0 +1,76 @@
+"""
+Chat history retention and archival.
+
+Sessions idle for longer than their bot's archive_after_days (CHAT_ARCHIVE_AFTER_DAYS when unset)
+have their messages moved out of chat_history into one compressed chat_archives row each, which
+the history, summary and summary-job reads merge back in. Sessions idle for longer than
+retention_days (CHAT_RETENTION_DAYS) are deleted along with their archive and summary.
+
+Run it from cron with `python -m app.core.archival`, or set CHAT_ARCHIVE_INTERVAL_SECONDS to
+run it inside the server.
+"""
+import asyncio
+import datetime
+import logging
+from app.db import crud, models
+from app.db.session import AsyncSessionLocal, async_engine
+from .config import settings
+from .metrics import CHAT_RETENTION_SESSIONS
+
+logger = logging.getLogger(__name__)
+
+def _days(bot_days: int | None, default_days: int) -> int:
+    return default_days if bot_days is None else bot_days
+
+async def apply_bot_policy(bot: models.Bot, now: datetime.datetime) -> dict[str, int]:
+    """Deletes then archives the bot's idle sessions, CHAT_ARCHIVE_BATCH_SESSIONS per transaction."""
+    counts = {"archived": 0, "deleted": 0}
+    retention_days = _days(bot.retention_days, settings.CHAT_RETENTION_DAYS)
+    archive_after_days = _days(bot.archive_after_days, settings.CHAT_ARCHIVE_AFTER_DAYS)
+    batch = settings.CHAT_ARCHIVE_BATCH_SESSIONS
+    async with AsyncSessionLocal() as db:
+        if retention_days:
+            idle_before = now - datetime.timedelta(days=retention_days)
+            while sessions := await db.run_sync(crud.get_expired_sessions, bot_id=bot.id, idle_before=idle_before, limit=batch):
+                await db.run_sync(crud.delete_sessions, bot_id=bot.id, sessions=[tuple(s) for s in sessions])
+                counts["deleted"] += len(sessions)
+        if archive_after_days:
+            idle_before = now - datetime.timedelta(days=archive_after_days)
+            # Archived sessions get archived_at = now, so each pass picks up new ones.
+            while sessions := await db.run_sync(crud.get_sessions_to_archive, bot_id=bot.id, idle_before=idle_before, limit=batch):
+                await db.run_sync(crud.archive_sessions, bot_id=bot.id, sessions=[tuple(s) for s in sessions], archived_at=now)
+                counts["archived"] += len(sessions)
+    return counts
+
+async def run_retention() -> dict[str, int]:
+    """Applies every bot's retention and archival policy; returns the sessions archived and deleted."""
+    now = datetime.datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        bots = await db.run_sync(crud.get_all_bots)
+    totals = {"archived": 0, "deleted": 0}
+    for bot in bots:
+        counts = await apply_bot_policy(bot, now)
+        for action, count in counts.items():
+            totals[action] += count
+            CHAT_RETENTION_SESSIONS.labels(action=action).inc(count)
+    return totals
+
+async def run_periodically(interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            totals = await run_retention()
+            logger.info(f"Chat retention: archived {totals['archived']} and deleted {totals['deleted']} session(s).")
+        except Exception as e:
+            logger.exception(f"Error applying chat retention: {e}")
+
+async def _main():
+    try:
+        totals = await run_retention()
+    finally:
+        # Open async connections would keep the process alive.
+        await async_engine.dispose()
+    print(f"Archived {totals['archived']} and deleted {totals['deleted']} chat session(s).")
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,56 @@
+import asyncio
+from abc import ABC, abstractmethod
+
+class BatchQueue(ABC):
+    """
+    Base for background workers that drain an asyncio queue in batches. A batch is closed once
+    it holds max_batch items or max_wait_s after its first item arrived, whichever comes first.
+    Subclasses enqueue with _put and implement _run, looping on _next_batch until it reports
+    that stop was called.
+    """
+    def __init__(self, max_batch: int, max_wait_s: float):
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_s
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Processes everything already submitted, then stops the worker."""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def _put(self, item):
+        await self._queue.put(item)
+
+    async def _next_batch(self) -> tuple[list, bool]:
+        """Returns the next batch and whether stop was called; the batch may be empty only when it was."""
+        item = await self._queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = asyncio.get_running_loop().time() + self.max_wait_s
+        while len(batch) < self.max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            try:
+                item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    @abstractmethod
+    async def _run(self):
+        ...
@@ -0,0 +1,59 @@
+import uuid
+import asyncio
+import datetime
+import logging
+from app.db import crud
+from app.db.session import AsyncSessionLocal
+from .batching import BatchQueue
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class ChatWriteBuffer(BatchQueue):
+    """
+    Write-behind buffer for chat turns. Turns submitted by concurrent requests are grouped
+    into one bulk insert and commit; a batch is flushed once it holds max_batch turns or
+    max_wait_s after its first turn arrived, whichever comes first.
+    """
+
+    async def submit(self, turn: dict):
+        """Queues a turn and waits until the batch containing it has been committed."""
+        future = asyncio.get_running_loop().create_future()
+        await self._put((turn, future))
+        await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if not batch:
+                continue
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.run_sync(crud.create_chat_turns, turns=[turn for turn, _ in batch])
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} chat turns: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+chat_write_buffer = ChatWriteBuffer(
+    max_batch=settings.CHAT_WRITE_BUFFER_MAX_BATCH,
+    max_wait_s=settings.CHAT_WRITE_BUFFER_FLUSH_MS / 1000,
+)
+
+async def persist_chat_turn(session_id: str, bot_id: uuid.UUID, user_id: uuid.UUID, user_message: str, bot_message: str):
+    """Stores a user message and the bot's reply in one transaction, through the write buffer when it is running."""
+    turn = {
+        "session_id": session_id, "bot_id": bot_id, "user_id": user_id,
+        "user_message": user_message, "bot_message": bot_message, "timestamp": datetime.datetime.utcnow(),
+    }
+    if chat_write_buffer.running:
+        await chat_write_buffer.submit(turn)
+        return
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(crud.create_chat_turns, turns=[turn])
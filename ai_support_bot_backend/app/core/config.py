@@ -5,10 +5,128 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Derived from DATABASE_URL (asyncpg / aiosqlite) when not set.
+    ASYNC_DATABASE_URL: str | None = os.getenv("ASYNC_DATABASE_URL")
+    # Read-only views (history, session and summary listings, analytics) go here when set.
+    READ_REPLICA_DATABASE_URL: str | None = os.getenv("READ_REPLICA_DATABASE_URL")
+    ASYNC_READ_REPLICA_DATABASE_URL: str | None = os.getenv("ASYNC_READ_REPLICA_DATABASE_URL")
+
+    # Per engine; each process has a sync and an async engine (and two more with a replica).
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
 
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
+    # "gemini", or "fake" for an offline deterministic stub (load tests, benchmarks).
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini")
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+    FAKE_LLM_LATENCY_MS: float = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+    FAKE_LLM_RESPONSES_FILE: str | None = os.getenv("FAKE_LLM_RESPONSES_FILE")
+    FAKE_LLM_FAILURE_RATE: float = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+    FAKE_LLM_TAIL_RATE: float = float(os.getenv("FAKE_LLM_TAIL_RATE", "0"))
+    FAKE_LLM_TAIL_LATENCY_MS: float = float(os.getenv("FAKE_LLM_TAIL_LATENCY_MS", "0"))
+
+    # Deadline of a whole LLM call, retries included, and of each attempt within it.
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+    LLM_ATTEMPT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "15"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_RETRY_BASE_DELAY_MS: float = float(os.getenv("LLM_RETRY_BASE_DELAY_MS", "200"))
+    LLM_RETRY_MAX_DELAY_MS: float = float(os.getenv("LLM_RETRY_MAX_DELAY_MS", "2000"))
+    # Concurrent requests to the provider per process, to stay within its rate limits.
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    LLM_CIRCUIT_RESET_SECONDS: float = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+    # Send a second, hedged request when the first hasn't answered after this long; 0 disables.
+    LLM_HEDGE_AFTER_MS: float = float(os.getenv("LLM_HEDGE_AFTER_MS", "0"))
+
+    FAQ_EMBEDDING_CACHE_MB: int = int(os.getenv("FAQ_EMBEDDING_CACHE_MB", "256"))
+    EMBEDDING_MODEL_NAME: str = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+    # "torch", or "onnx" / "openvino" for CPU-only hosts (needs sentence-transformers[onnx] / [openvino]).
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    # Weights file in the model repo for the onnx/openvino backends, e.g. "onnx/model_qint8_avx2.onnx" for int8.
+    EMBEDDING_MODEL_FILE: str | None = os.getenv("EMBEDDING_MODEL_FILE")
+    # Load the embedding model in the background at startup; /ready reports 503 until it is loaded.
+    WARM_UP_ON_STARTUP: bool = os.getenv("WARM_UP_ON_STARTUP", "true").lower() == "true"
+    RUN_MIGRATIONS_ON_STARTUP: bool = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
+
+    # FAQs read, encoded and written per step when ingesting an upload.
+    FAQ_INGEST_BATCH_SIZE: int = int(os.getenv("FAQ_INGEST_BATCH_SIZE", "512"))
+    IVF_N_PROBE: int = int(os.getenv("IVF_N_PROBE", "8"))
+    EMBEDDING_WORKERS: int = int(os.getenv("EMBEDDING_WORKERS", "2"))
+    # Coalesce concurrent query embeddings into batched encode calls.
+    EMBEDDING_BATCHING_ENABLED: bool = os.getenv("EMBEDDING_BATCHING_ENABLED", "false").lower() == "true"
+    EMBEDDING_BATCH_MAX_SIZE: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "2"))
+
+    # FAQ retrieval ranks the FAQs whose cosine similarity clears the usual threshold by that
+    # similarity plus HYBRID_LEXICAL_WEIGHT x a BM25 score (about 1 when every query term
+    # matches); BM25 never makes an FAQ relevant on its own. Turns that can't use the response cache skip
+    # the query embedding when a FAQ matches at least LEXICAL_FAST_PATH_SCORE on at least
+    # LEXICAL_FAST_PATH_MIN_TERMS query terms; a score of 0 disables the fast path.
+    HYBRID_RETRIEVAL_ENABLED: bool = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() == "true"
+    HYBRID_LEXICAL_WEIGHT: float = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0.3"))
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    LEXICAL_FAST_PATH_SCORE: float = float(os.getenv("LEXICAL_FAST_PATH_SCORE", "0.9"))
+    LEXICAL_FAST_PATH_MIN_TERMS: int = int(os.getenv("LEXICAL_FAST_PATH_MIN_TERMS", "2"))
+
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_SIMILARITY: float = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+    # Only answers to conversations with at most this many prior messages are cached or served.
+    RESPONSE_CACHE_MAX_HISTORY: int = int(os.getenv("RESPONSE_CACHE_MAX_HISTORY", "2"))
+
+    # Estimated tokens per chat prompt, unless the bot sets its own prompt_token_budget.
+    PROMPT_TOKEN_BUDGET: int = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+    # Share of the budget left after the instructions and query that retrieved FAQs may use.
+    PROMPT_FAQ_SHARE: float = float(os.getenv("PROMPT_FAQ_SHARE", "0.6"))
+    PROMPT_FAQ_MAX_TOKENS: int = int(os.getenv("PROMPT_FAQ_MAX_TOKENS", "400"))
+    PROMPT_MESSAGE_MAX_TOKENS: int = int(os.getenv("PROMPT_MESSAGE_MAX_TOKENS", "300"))
+    PROMPT_SUMMARY_MAX_TOKENS: int = int(os.getenv("PROMPT_SUMMARY_MAX_TOKENS", "400"))
+    # Messages kept verbatim; older ones are folded into the session's rolling summary,
+    # ROLLING_SUMMARY_EVERY messages at a time.
+    PROMPT_RECENT_MESSAGES: int = int(os.getenv("PROMPT_RECENT_MESSAGES", "6"))
+    ROLLING_SUMMARY_EVERY: int = int(os.getenv("ROLLING_SUMMARY_EVERY", "4"))
+
+    SUMMARY_JOB_CONCURRENCY: int = int(os.getenv("SUMMARY_JOB_CONCURRENCY", "8"))
+    SUMMARY_JOB_BATCH_SIZE: int = int(os.getenv("SUMMARY_JOB_BATCH_SIZE", "50"))
+
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "256"))
+
+    IDENTITY_CACHE_TTL_SECONDS: float = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "60"))
+    IDENTITY_CACHE_MAX_ENTRIES: int = int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", "10000"))
+
+    CHAT_WRITE_BUFFER_ENABLED: bool = os.getenv("CHAT_WRITE_BUFFER_ENABLED", "false").lower() == "true"
+    CHAT_WRITE_BUFFER_MAX_BATCH: int = int(os.getenv("CHAT_WRITE_BUFFER_MAX_BATCH", "200"))
+    CHAT_WRITE_BUFFER_FLUSH_MS: float = float(os.getenv("CHAT_WRITE_BUFFER_FLUSH_MS", "20"))
+
+    ANALYTICS_CHUNK_TOKEN_BUDGET: int = int(os.getenv("ANALYTICS_CHUNK_TOKEN_BUDGET", "8000"))
+    # Average number of summaries per analytics chunk (content-defined boundaries).
+    ANALYTICS_CHUNK_SUMMARIES: int = int(os.getenv("ANALYTICS_CHUNK_SUMMARIES", "25"))
+    ANALYTICS_CONCURRENCY: int = int(os.getenv("ANALYTICS_CONCURRENCY", "4"))
+    ANALYTICS_CACHE_MAX_CHUNKS: int = int(os.getenv("ANALYTICS_CACHE_MAX_CHUNKS", "10000"))
+
+    # Days of inactivity before a session's messages are archived / deleted, unless the bot
+    # overrides them; 0 never. CHAT_ARCHIVE_INTERVAL_SECONDS > 0 runs the job in the server.
+    CHAT_ARCHIVE_AFTER_DAYS: int = int(os.getenv("CHAT_ARCHIVE_AFTER_DAYS", "0"))
+    CHAT_RETENTION_DAYS: int = int(os.getenv("CHAT_RETENTION_DAYS", "0"))
+    CHAT_ARCHIVE_BATCH_SESSIONS: int = int(os.getenv("CHAT_ARCHIVE_BATCH_SESSIONS", "200"))
+    CHAT_ARCHIVE_INTERVAL_SECONDS: float = float(os.getenv("CHAT_ARCHIVE_INTERVAL_SECONDS", "0"))
+
+    # Keyset-paginated list endpoints (opt-in: without limit or cursor they return every row);
+    # the next page's cursor is returned in X-Next-Cursor.
+    PAGE_DEFAULT_LIMIT: int = int(os.getenv("PAGE_DEFAULT_LIMIT", "100"))
+    PAGE_MAX_LIMIT: int = int(os.getenv("PAGE_MAX_LIMIT", "1000"))
+    EXPORT_BATCH_ROWS: int = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
 
 settings = Settings()
@@ -0,0 +1,66 @@
+import time
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Callable
+import numpy as np
+from .batching import BatchQueue
+from .metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class QueryEmbeddingBatcher(BatchQueue):
+    """
+    Coalesces concurrent query embeddings into batched encode calls. A batch is closed once it
+    holds max_batch queries or max_wait_s after its first query arrived, whichever comes first,
+    and up to max_in_flight batches are encoded at a time; while they are, new queries keep
+    queueing, so batches grow with load instead of running as many batch-size-1 forward passes.
+    """
+    def __init__(self, encode: Callable[[list[str]], np.ndarray], executor: Executor,
+                 max_batch: int, max_wait_s: float, max_in_flight: int):
+        super().__init__(max_batch, max_wait_s)
+        self.encode = encode
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+
+    async def submit(self, query: str) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self._put((query, future, time.perf_counter()))
+        return await future
+
+    async def _encode_batch(self, batch: list, slots: asyncio.Semaphore):
+        try:
+            now = time.perf_counter()
+            EMBEDDING_BATCH_SIZE.observe(len(batch))
+            for _, _, submitted in batch:
+                EMBEDDING_BATCH_WAIT_SECONDS.observe(now - submitted)
+            loop = asyncio.get_running_loop()
+            embeddings = await loop.run_in_executor(self.executor, self.encode, [query for query, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Error encoding a batch of {len(batch)} queries: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            slots.release()
+        for (_, future, _), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.max_in_flight)
+        in_flight = set()
+        stopping = False
+        while not stopping:
+            # Waiting for a free slot first lets the queue fill up while every worker is busy.
+            await slots.acquire()
+            batch, stopping = await self._next_batch()
+            if not batch:
+                slots.release()
+                continue
+            task = asyncio.create_task(self._encode_batch(batch, slots))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
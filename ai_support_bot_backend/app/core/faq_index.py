@@ -0,0 +1,90 @@
+import threading
+import numpy as np
+from cachetools import LRUCache
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import crud, models
+from . import llm
+from .config import settings
+from .metrics import FAQ_INDEX_CACHE_REQUESTS
+from .retrieval import BM25Index, build_index
+
+# Keyed by (bot_id, faqs_hash, backend) so a stale index can never be served for changed FAQs.
+_index_cache = LRUCache(maxsize=settings.FAQ_EMBEDDING_CACHE_MB * 1024 * 1024, getsizeof=lambda index: index.nbytes)
+_cache_lock = threading.Lock()
+
+class FAQIndex:
+    """
+    A bot's FAQs with the embedding index over their questions and the lexical index over their
+    text; index positions are positions in faqs.
+    """
+    def __init__(self, faqs: list[dict], index=None, lexical=None):
+        self.faqs = faqs
+        self.index = index
+        self.lexical = lexical
+
+    @property
+    def nbytes(self) -> int:
+        text_bytes = sum(len(faq["question"]) + len(faq["answer"]) for faq in self.faqs)
+        index_bytes = sum(index.nbytes for index in (self.index, self.lexical) if index is not None)
+        return text_bytes + index_bytes
+
+    def __len__(self):
+        return len(self.faqs)
+
+def build_faq_index(backend: str, embeddings: np.ndarray):
+    return build_index(backend, embeddings, n_probe=settings.IVF_N_PROBE)
+
+def build_lexical_index(faqs: list[dict]) -> BM25Index:
+    # Users tend to phrase queries like questions, so question words count twice.
+    return BM25Index([f"{faq['question']} {faq['question']} {faq['answer']}" for faq in faqs])
+
+def cache_faq_index(bot: models.Bot, faq_index: FAQIndex):
+    with _cache_lock:
+        try:
+            _index_cache[(bot.id, bot.faqs_hash, bot.retrieval_backend)] = faq_index
+        except ValueError:
+            # A single index larger than the whole budget is served uncached.
+            pass
+
+def _cached_faq_index(bot: models.Bot) -> FAQIndex | None:
+    with _cache_lock:
+        faq_index = _index_cache.get((bot.id, bot.faqs_hash, bot.retrieval_backend))
+    FAQ_INDEX_CACHE_REQUESTS.labels(result="miss" if faq_index is None else "hit").inc()
+    return faq_index
+
+def _load_faq_index(bot: models.Bot, rows: list) -> tuple[FAQIndex, dict]:
+    """Builds the index from the stored FAQ rows, encoding only the questions that have no embedding yet."""
+    faqs = [{"question": row.question, "answer": row.answer} for row in rows]
+    if not rows:
+        return FAQIndex(faqs), {}
+    missing = [i for i, row in enumerate(rows) if row.embedding is None]
+    encoded = llm.encode_faq_questions([faqs[i] for i in missing]) if missing else None
+    new_embeddings = {rows[i].id: encoded[j].tobytes() for j, i in enumerate(missing)}
+    embeddings = np.stack([
+        np.frombuffer(row.embedding if row.embedding is not None else new_embeddings[row.id], dtype=np.float32)
+        for row in rows
+    ])
+    return FAQIndex(faqs, build_faq_index(bot.retrieval_backend, embeddings), build_lexical_index(faqs)), new_embeddings
+
+async def aget_faq_index(db: AsyncSession, bot: models.Bot) -> FAQIndex:
+    faq_index = _cached_faq_index(bot)
+    if faq_index is not None:
+        return faq_index
+
+    rows = await db.run_sync(crud.get_faqs_for_bot, bot_id=bot.id)
+    faq_index, new_embeddings = await llm.run_in_embedding_executor(_load_faq_index, bot, rows)
+    if new_embeddings:
+        await db.run_sync(crud.update_faq_embeddings, embeddings=new_embeddings)
+    cache_faq_index(bot, faq_index)
+    return faq_index
+
+async def embed_missing_faqs(db: AsyncSession) -> int:
+    """
+    Computes the embeddings of FAQs stored without one (by migration 0005, or an upload that
+    didn't encode them) and caches those bots' indexes, so their first chat request doesn't
+    pay for it. Returns the number of bots.
+    """
+    bots = await db.run_sync(crud.get_bots_with_unembedded_faqs)
+    for bot in bots:
+        await aget_faq_index(db, bot)
+    return len(bots)
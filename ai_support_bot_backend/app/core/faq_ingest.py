@@ -0,0 +1,119 @@
+import io
+import csv
+import json
+import uuid
+from typing import BinaryIO, Iterator
+from sqlalchemy.orm import Session
+from app.db import crud, models
+from . import llm
+from .config import settings
+
+# Upper bound on a single JSON array item, so malformed input can't make the parser buffer the whole file.
+MAX_JSON_ITEM_CHARS = 1 << 20
+
+class FAQFormatError(ValueError):
+    """The uploaded file is not a valid FAQ list; the message is safe to show to the uploader."""
+
+def _validate(item) -> dict:
+    if not isinstance(item, dict) or not isinstance(item.get("question"), str) or not isinstance(item.get("answer"), str):
+        raise FAQFormatError("Invalid JSON format.")
+    return {"question": item["question"], "answer": item["answer"]}
+
+def iter_csv_faqs(file: BinaryIO) -> Iterator[dict]:
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8", newline=""))
+    if not reader.fieldnames or "question" not in reader.fieldnames or "answer" not in reader.fieldnames:
+        raise FAQFormatError("CSV must have 'question' and 'answer' columns.")
+    try:
+        for row in reader:
+            yield {"question": row["question"] or "", "answer": row["answer"] or ""}
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise FAQFormatError(f"Error processing CSV file: {e}")
+
+def iter_json_faqs(file: BinaryIO, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """Yields the items of a top-level JSON array one at a time, reading the file in chunks."""
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(file, encoding="utf-8")
+    buffer, pos, eof = "", 0, False
+    started, expect_item = False, True
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer, pos = buffer[pos:] + chunk, 0
+        return True
+
+    try:
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos == len(buffer):
+                if fill():
+                    continue
+                raise FAQFormatError("Invalid JSON file.")
+            char = buffer[pos]
+            if not started:
+                if char != "[":
+                    raise FAQFormatError("Invalid JSON format.")
+                started, pos = True, pos + 1
+            elif char == "]":
+                pos += 1
+                while pos < len(buffer) or fill():
+                    if not buffer[pos:].isspace():
+                        raise FAQFormatError("Invalid JSON file.")
+                    pos = len(buffer)
+                return
+            elif char == "," and not expect_item:
+                expect_item, pos = True, pos + 1
+            elif expect_item:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # The item may continue in the next chunk.
+                    if len(buffer) - pos <= MAX_JSON_ITEM_CHARS and fill():
+                        continue
+                    raise FAQFormatError("Invalid JSON file.")
+                if end == len(buffer) and not eof and fill():
+                    # A number or literal could be cut off at the chunk boundary; decode it again.
+                    continue
+                pos, expect_item = end, False
+                yield _validate(item)
+            else:
+                raise FAQFormatError("Invalid JSON file.")
+    except UnicodeDecodeError:
+        raise FAQFormatError("Invalid JSON file.")
+
+def iter_uploaded_faqs(filename: str, file: BinaryIO) -> Iterator[dict]:
+    if filename.endswith(".json"):
+        return iter_json_faqs(file)
+    if filename.endswith(".csv"):
+        return iter_csv_faqs(file)
+    raise FAQFormatError("Unsupported file format: .json or .csv only.")
+
+def _batches(items: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def ingest_faqs(db: Session, bot_id: uuid.UUID, faqs_hash: str, faqs: Iterator[dict]) -> int:
+    """
+    Upserts FAQs batch by batch, encoding each batch's questions as it goes, so memory stays
+    bounded by FAQ_INGEST_BATCH_SIZE whatever the upload size. Everything, including any
+    pending changes in db, is committed together at the end; returns the number of FAQs read.
+    """
+    count, position = 0, crud.get_next_faq_position(db, bot_id)
+    for batch in _batches(faqs, settings.FAQ_INGEST_BATCH_SIZE):
+        embeddings = llm.encode_faq_questions(batch)
+        crud.upsert_faqs(db, bot_id, batch, [embedding.tobytes() for embedding in embeddings], start_position=position)
+        faqs_hash = models.faqs_content_hash(batch, faqs_hash)
+        count, position = count + len(batch), position + len(batch)
+    if count:
+        crud.set_bot_faqs_hash(db, bot_id, faqs_hash)
+    return count
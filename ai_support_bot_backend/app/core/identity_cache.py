@@ -0,0 +1,44 @@
+import uuid
+import threading
+from cachetools import TTLCache
+from .config import settings
+from .metrics import IDENTITY_CACHE_REQUESTS
+
+# Detached, fully loaded User and Bot rows shared by concurrent requests; treat them as read-only.
+# Writes in this process invalidate explicitly, the TTL bounds staleness from other processes.
+_users = TTLCache(maxsize=settings.IDENTITY_CACHE_MAX_ENTRIES, ttl=settings.IDENTITY_CACHE_TTL_SECONDS)
+_bots = TTLCache(maxsize=settings.IDENTITY_CACHE_MAX_ENTRIES, ttl=settings.IDENTITY_CACHE_TTL_SECONDS)
+_lock = threading.Lock()
+
+def get_user(email: str, bot_id: uuid.UUID | None):
+    with _lock:
+        user = _users.get((email, bot_id))
+    IDENTITY_CACHE_REQUESTS.labels(kind="user", result="miss" if user is None else "hit").inc()
+    return user
+
+def put_user(user):
+    with _lock:
+        _users[(user.email, user.bot_id)] = user
+
+def invalidate_user(email: str, bot_id: uuid.UUID | None):
+    with _lock:
+        _users.pop((email, bot_id), None)
+
+def get_bot(bot_id: uuid.UUID):
+    with _lock:
+        bot = _bots.get(bot_id)
+    IDENTITY_CACHE_REQUESTS.labels(kind="bot", result="miss" if bot is None else "hit").inc()
+    return bot
+
+def put_bot(bot):
+    with _lock:
+        _bots[bot.id] = bot
+
+def invalidate_bot(bot_id: uuid.UUID):
+    with _lock:
+        _bots.pop(bot_id, None)
+
+def clear():
+    with _lock:
+        _users.clear()
+        _bots.clear()
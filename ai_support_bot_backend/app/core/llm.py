@@ -1,82 +1,298 @@
 import json
-import google.generativeai as genai
-from sentence_transformers import SentenceTransformer, util
-import torch
+import asyncio
+import functools
+import importlib.util
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from .config import settings
+from .llm_providers import get_llm_provider
+from .retrieval import ExactIndex, SIMILARITY_THRESHOLD, hybrid_search
+from .embedding_batcher import QueryEmbeddingBatcher
+from .prompt_builder import build_response_prompt, estimate_tokens
+from .metrics import PROMPT_TOKENS, PROMPT_ITEMS_DROPPED, FAQ_RETRIEVALS
+from . import tracing
 
-genai.configure(api_key=settings.GEMINI_API_KEY)
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+logger = logging.getLogger(__name__)
 
-def get_relevant_faqs(query: str, faqs_data: list, top_k: int = 3):
+BLOCKED_ANSWER = "I'm sorry, my response was blocked. Please rephrase."
+ERROR_ANSWER = "I'm sorry, I encountered a technical issue."
+
+FALLBACK_PREFIX = "Here is the closest answer from our knowledge base: "
+
+def faq_fallback_answer(relevant_faqs: list) -> str:
+    """Answer used when the LLM is unavailable: the best-matching FAQ's answer, if any."""
+    return FALLBACK_PREFIX + relevant_faqs[0]["answer"].strip() if relevant_faqs else ERROR_ANSWER
+
+def is_cacheable_answer(answer: str) -> bool:
+    return answer not in (BLOCKED_ANSWER, ERROR_ANSWER) and not answer.startswith(FALLBACK_PREFIX)
+
+# Loaded on first use (or by warm_up at startup): importing torch and the model takes seconds and
+# hundreds of MB, which imports of this module, tests and tooling shouldn't pay.
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "openvino")
+# Modules the optional backends import through sentence-transformers, and the extra that installs them.
+_BACKEND_MODULES = {
+    "onnx": (("optimum", "optimum.onnxruntime", "onnxruntime"), "sentence-transformers[onnx]"),
+    "openvino": (("optimum", "optimum.intel", "openvino"), "sentence-transformers[openvino]"),
+}
+
+def check_embedding_backend(backend: str):
+    """Raises ValueError for an unknown backend or one whose optional packages aren't installed."""
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'; expected one of {', '.join(EMBEDDING_BACKENDS)}.")
+    modules, extra = _BACKEND_MODULES.get(backend, ((), None))
+    missing = []
+    for module in modules:
+        # find_spec imports a dotted name's parent, so skip submodules of missing packages.
+        if module.rpartition(".")[0] in missing or importlib.util.find_spec(module) is None:
+            missing.append(module)
+    if missing:
+        raise ValueError(
+            f"The '{backend}' embedding backend needs modules that aren't installed ({', '.join(missing)}); "
+            f'run pip install "{extra}" or set EMBEDDING_BACKEND=torch.'
+        )
+
+def load_embedding_model(model_name: str, backend: str = "torch", file_name: str | None = None):
+    """
+    Loads a SentenceTransformer on the given inference backend. The onnx and openvino
+    backends run the same weights (or a quantised export of them, picked with file_name)
+    without torch kernels, and keep the model's pooling and normalisation, so embeddings
+    stay comparable with those stored by the torch backend.
+    """
+    check_embedding_backend(backend)
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    return SentenceTransformer(model_name, backend=backend, model_kwargs={"file_name": file_name} if file_name else None)
+
+def get_embedding_model():
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                _embedding_model = load_embedding_model(
+                    settings.EMBEDDING_MODEL_NAME, settings.EMBEDDING_BACKEND, settings.EMBEDDING_MODEL_FILE
+                )
+    return _embedding_model
+
+def is_embedding_model_loaded() -> bool:
+    return _embedding_model is not None
+
+def warm_up():
+    """Loads the embedding model and runs one encode so the first request doesn't pay for either."""
+    get_embedding_model().encode("warm up", convert_to_numpy=True)
+
+# CPU-bound encoding runs here so async endpoints never block the event loop or the request threadpool.
+embedding_executor = ThreadPoolExecutor(max_workers=settings.EMBEDDING_WORKERS, thread_name_prefix="embedding")
+
+async def run_in_embedding_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(embedding_executor, functools.partial(func, *args, **kwargs))
+
+def encode_queries(queries: list[str]) -> np.ndarray:
+    return get_embedding_model().encode(queries, batch_size=len(queries), convert_to_numpy=True)
+
+query_embedding_batcher = QueryEmbeddingBatcher(
+    encode_queries,
+    embedding_executor,
+    max_batch=settings.EMBEDDING_BATCH_MAX_SIZE,
+    max_wait_s=settings.EMBEDDING_BATCH_MAX_WAIT_MS / 1000,
+    max_in_flight=settings.EMBEDDING_WORKERS,
+)
+
+def encode_faq_questions(faqs_data: list) -> np.ndarray:
+    faq_questions = [item['question'] for item in faqs_data]
+    return get_embedding_model().encode(faq_questions, convert_to_numpy=True).astype(np.float32)
+
+def search_faqs(query_embedding: np.ndarray, faqs_data: list, top_k: int = 3, faq_index=None, lexical_hits=None) -> list[int]:
+    """
+    Returns the indices of the FAQs relevant to an embedded query, best match first. Relevance
+    is always cosine similarity above SIMILARITY_THRESHOLD; with the query's lexical hits (see
+    search_lexical), the relevant FAQs are ranked by the hybrid score instead.
+    """
     if not faqs_data:
         return []
-    faq_questions = [item['question'] for item in faqs_data]
-    faq_embeddings = embedding_model.encode(faq_questions, convert_to_tensor=True)
-    query_embedding = embedding_model.encode(query, convert_to_tensor=True)
-    cos_scores = util.pytorch_cos_sim(query_embedding, faq_embeddings)[0]
-    top_results = torch.topk(cos_scores, k=min(top_k, len(faqs_data)))
-    relevant_faqs = []
-    for score, idx in zip(top_results[0], top_results[1]):
-        if score > 0.5:
-            relevant_faqs.append(faqs_data[idx])
-    return relevant_faqs
-
-def generate_llm_response(query: str, chat_history: list, relevant_faqs: list, bot_name: str):
-    history_str = "\n".join([f"{msg.role}: {msg.message}" for msg in chat_history] if chat_history else [])
-    context_str = "\n".join([f"Q: {faq['question']}\nA: {faq['answer']}" for faq in relevant_faqs])
-
-    prompt = f"""
-You are '{bot_name}', an advanced AI assistant.
-Your Persona: You are empathetic, professional, and concise.
-
-**Your Core Directives (Follow in this order):**
-1.  **Use Context for Factual Queries:** If "CONTEXT" is available, answer the user's question based strictly on it.
-2.  **Reason About Context:** If the user asks a follow-up question related to the context (e.g., "What does 'original condition' mean?"), provide a helpful, general explanation based on common understanding, but explicitly state that the policy details are not specified in your knowledge base.
-3.  **Acknowledge User Feedback:** If the user provides feedback or suggests an improvement (e.g., "You should add this to your FAQs", "Tell your admin"), you MUST acknowledge their feedback positively. Example: "Thank you for that suggestion. I will pass it along to the team to improve our knowledge base." Do not re-state that you cannot answer.
-4.  **Handle Small Talk:** If no context is found and the query is a simple greeting or question about you, respond conversationally.
-5.  **Intelligent Escalation:** If the query fits none of the above, escalate by politely stating you cannot help and recommending contact with a human agent.
-
-**Output Format:** After your response, you MUST include a markdown-fenced JSON object with one key: "suggestions". This should be an array of 2-3 relevant follow-up questions. For feedback, small talk, or escalations, this array should be empty.
+    if faq_index is None:
+        faq_index = ExactIndex(encode_faq_questions(faqs_data))
+    if lexical_hits is None:
+        FAQ_RETRIEVALS.labels(path="semantic").inc()
+        scores, indices = faq_index.search(query_embedding, top_k=top_k)
+    else:
+        FAQ_RETRIEVALS.labels(path="hybrid").inc()
+        lexical_scores, lexical_indices, _ = lexical_hits
+        scores, indices = hybrid_search(
+            faq_index, query_embedding, lexical_scores, lexical_indices, top_k=top_k,
+            lexical_weight=settings.HYBRID_LEXICAL_WEIGHT, n_candidates=max(top_k, settings.HYBRID_CANDIDATES),
+            min_similarity=SIMILARITY_THRESHOLD,
+        )
+    return [int(idx) for score, idx in zip(scores, indices) if score > SIMILARITY_THRESHOLD]
 
----
-CONTEXT FROM KNOWLEDGE BASE:
-{context_str if relevant_faqs else "No relevant information found."}
----
-CONVERSATION HISTORY:
-{history_str}
----
-User Query: {query}
+def search_lexical(query: str, lexical_index):
+    """The query's BM25 hits, or None when hybrid retrieval is off or the bot has no lexical index."""
+    if lexical_index is None or not settings.HYBRID_RETRIEVAL_ENABLED:
+        return None
+    return lexical_index.search(query, top_k=settings.HYBRID_CANDIDATES)
 
-Response:
-"""
+def lexical_fast_path(lexical_hits, top_k: int) -> list[int] | None:
+    """The FAQs a query matches so closely on its words that embedding it can't change the outcome; else None."""
+    if lexical_hits is None or not settings.LEXICAL_FAST_PATH_SCORE:
+        return None
+    scores, indices, matched_terms = lexical_hits
+    if matched_terms < settings.LEXICAL_FAST_PATH_MIN_TERMS or not len(scores) or scores[0] < settings.LEXICAL_FAST_PATH_SCORE:
+        return None
+    FAQ_RETRIEVALS.labels(path="lexical_fast_path").inc()
+    return [int(idx) for score, idx in zip(scores[:top_k], indices[:top_k]) if score >= settings.LEXICAL_FAST_PATH_SCORE]
+
+def retrieve_faqs(query: str, faqs_data: list, top_k: int = 3, faq_index=None, lexical_index=None, need_embedding: bool = True):
+    """
+    Returns the query embedding and the indices of the FAQs relevant to it, best match first.
+    Unless need_embedding, a confident lexical match skips encoding and returns no embedding.
+    """
+    lexical_hits = search_lexical(query, lexical_index)
+    faq_ids = None if need_embedding else lexical_fast_path(lexical_hits, top_k)
+    if faq_ids is not None:
+        return None, faq_ids
+    query_embedding = get_embedding_model().encode(query, convert_to_numpy=True)
+    return query_embedding, search_faqs(query_embedding, faqs_data, top_k=top_k, faq_index=faq_index, lexical_hits=lexical_hits)
+
+async def aretrieve_faqs(query: str, faqs_data: list, top_k: int = 3, faq_index=None, lexical_index=None, need_embedding: bool = True):
+    if not query_embedding_batcher.running:
+        return await run_in_embedding_executor(
+            retrieve_faqs, query, faqs_data, top_k=top_k, faq_index=faq_index, lexical_index=lexical_index, need_embedding=need_embedding
+        )
+    # Posting lists are short for FAQ-sized corpora, so the lexical search runs on the event loop.
+    lexical_hits = search_lexical(query, lexical_index)
+    faq_ids = None if need_embedding else lexical_fast_path(lexical_hits, top_k)
+    if faq_ids is not None:
+        return None, faq_ids
+    query_embedding = await query_embedding_batcher.submit(query)
+    faq_ids = await run_in_embedding_executor(
+        search_faqs, query_embedding, faqs_data, top_k=top_k, faq_index=faq_index, lexical_hits=lexical_hits
+    )
+    return query_embedding, faq_ids
+
+def _build_response_prompt(query: str, chat_history: list, relevant_faqs: list, bot_name: str,
+                           history_summary: str | None = None, token_budget: int | None = None) -> str:
+    prompt, stats = build_response_prompt(query, chat_history, relevant_faqs, bot_name, history_summary, token_budget)
+    PROMPT_TOKENS.observe(stats["tokens"])
+    PROMPT_ITEMS_DROPPED.labels(kind="faq").inc(stats["faqs_dropped"])
+    PROMPT_ITEMS_DROPPED.labels(kind="message").inc(stats["messages_dropped"])
+    tracing.annotate(prompt_tokens=stats["tokens"])
+    return prompt
+
+class ResponseStreamParser:
+    """
+    Incrementally splits a completion into the user-facing answer and the trailing
+    ```json suggestions block, so answer text can be forwarded as it arrives.
+    """
+    FENCE = "```json"
+
+    def __init__(self):
+        self._pending = ""
+        self._json_buffer = None
+        self._answer_parts = []
+        self.suggestions = []
+
+    @property
+    def answer(self) -> str:
+        return "".join(self._answer_parts).strip()
+
+    def _emit(self, text: str) -> str:
+        if not self._answer_parts:
+            text = text.lstrip()
+        if text:
+            self._answer_parts.append(text)
+        return text
+
+    def feed(self, chunk: str) -> str:
+        """Consumes a chunk of the completion and returns the answer text that is safe to emit."""
+        if self._json_buffer is not None:
+            self._json_buffer += chunk
+            return ""
+        self._pending += chunk
+        fence_start = self._pending.find(self.FENCE)
+        if fence_start != -1:
+            self._json_buffer = self._pending[fence_start + len(self.FENCE):]
+            text, self._pending = self._pending[:fence_start].rstrip(), ""
+            return self._emit(text)
+        # Hold back anything that could still turn into the fence, plus the whitespace before it.
+        held = next((n for n in range(min(len(self.FENCE) - 1, len(self._pending)), 0, -1)
+                     if self.FENCE.startswith(self._pending[-n:])), 0)
+        safe = self._pending[:len(self._pending) - held]
+        cut = len(safe.rstrip())
+        text, self._pending = self._pending[:cut], self._pending[cut:]
+        return self._emit(text)
+
+    def finish(self) -> str:
+        """Parses the suggestions block and returns any answer text still held back."""
+        if self._json_buffer is None:
+            text, self._pending = self._pending.rstrip(), ""
+            return self._emit(text)
+        json_end = self._json_buffer.find("```")
+        if json_end != -1:
+            try:
+                self.suggestions = json.loads(self._json_buffer[:json_end].strip()).get("suggestions", [])
+            except json.JSONDecodeError:
+                logger.warning("Failed to parse suggestions JSON from LLM response.")
+        return ""
+
+def _parse_response_text(full_text: str) -> dict:
+    parser = ResponseStreamParser()
+    parser.feed(full_text)
+    parser.finish()
+    return {"answer": parser.answer, "suggestions": parser.suggestions}
+
+async def agenerate_llm_response(query: str, chat_history: list, relevant_faqs: list, bot_name: str,
+                                 history_summary: str | None = None, token_budget: int | None = None):
+    prompt = _build_response_prompt(query, chat_history, relevant_faqs, bot_name, history_summary, token_budget)
     try:
-        gemini_model = genai.GenerativeModel('gemini-2.0-flash')
-        response = gemini_model.generate_content(prompt)
-        if not response.parts:
-            return {"answer": "I'm sorry, my response was blocked. Please rephrase.", "suggestions": []}
-        full_text = response.text
-        answer, suggestions = full_text, []
-        json_start = full_text.find("```json")
-        if json_start != -1:
-            answer = full_text[:json_start].strip()
-            json_str_part = full_text[json_start + 7:]
-            json_end = json_str_part.find("```")
-            if json_end != -1:
-                json_str = json_str_part[:json_end].strip()
-                try:
-                    suggestions = json.loads(json_str).get("suggestions", [])
-                except json.JSONDecodeError:
-                    print("Warning: Failed to parse suggestions JSON from LLM response.")
-        return {"answer": answer, "suggestions": suggestions}
+        full_text = await get_llm_provider().agenerate(prompt)
+        if full_text is None:
+            return {"answer": BLOCKED_ANSWER, "suggestions": []}
+        return _parse_response_text(full_text)
     except Exception as e:
-        print(f"Error generating or parsing LLM response: {e}")
-        return {"answer": "I'm sorry, I encountered a technical issue.", "suggestions": []}
+        logger.error(f"Error generating or parsing LLM response: {e}")
+        return {"answer": faq_fallback_answer(relevant_faqs), "suggestions": []}
 
-def summarize_conversation_for_user(chat_history: list) -> str:
-    if not chat_history:
-        return "This chat session is empty."
+class ResponseStream:
+    """
+    Async iterator over the raw completion text as the provider streams it; feed it through a
+    ResponseStreamParser. If the provider fails, failed is set and the text ends with
+    error_answer instead: the FAQ fallback, or ERROR_ANSWER after part of a reply.
+    """
+    def __init__(self, prompt: str, relevant_faqs: list):
+        self.prompt = prompt
+        self.relevant_faqs = relevant_faqs
+        self.failed = False
+        self.error_answer = None
+
+    async def __aiter__(self):
+        produced_text = False
+        try:
+            async for chunk in get_llm_provider().astream(self.prompt):
+                produced_text = True
+                yield chunk
+            if not produced_text:
+                yield BLOCKED_ANSWER
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {e}")
+            self.failed = True
+            self.error_answer = ERROR_ANSWER if produced_text else faq_fallback_answer(self.relevant_faqs)
+            yield self.error_answer
+
+def astream_llm_response(query: str, chat_history: list, relevant_faqs: list, bot_name: str,
+                         history_summary: str | None = None, token_budget: int | None = None) -> ResponseStream:
+    prompt = _build_response_prompt(query, chat_history, relevant_faqs, bot_name, history_summary, token_budget)
+    return ResponseStream(prompt, relevant_faqs)
+
+def _build_user_summary_prompt(chat_history: list) -> str:
     transcript = "\n".join([f"{msg.role}: {msg.message}" for msg in chat_history])
-    prompt = f"""
+    return f"""
 Summarize the following conversation from the user's perspective. Use the second person ("You asked...", "The bot told you..."). The tone should be a helpful reminder of the conversation's key points. Avoid mentioning technical difficulties.
 
 CONVERSATION TRANSCRIPT:
@@ -85,18 +301,44 @@ CONVERSATION TRANSCRIPT:
 ---
 SUMMARY FOR USER:
 """
+
+async def asummarize_conversation_for_user(chat_history: list) -> str:
+    if not chat_history:
+        return "This chat session is empty."
     try:
-        gemini_model = genai.GenerativeModel('gemini-2.0-flash')
-        response = gemini_model.generate_content(prompt)
-        return response.text.strip() if response.parts else "Could not generate a summary."
+        text = await get_llm_provider().agenerate(_build_user_summary_prompt(chat_history))
+        return text.strip() if text is not None else "Could not generate a summary."
     except Exception as e:
         return f"An error occurred during summarization: {e}"
 
-def summarize_conversation_for_admin(chat_history: list) -> str:
-    if not chat_history:
-        return "This chat session has no messages."
+def _build_rolling_summary_prompt(previous_summary: str | None, messages: list) -> str:
+    transcript = "\n".join([f"{msg.role}: {msg.message}" for msg in messages])
+    max_words = settings.PROMPT_SUMMARY_MAX_TOKENS * 3 // 4
+    return f"""
+Maintain a running summary of a customer support conversation; it replaces the older messages in the assistant's context.
+Update the current summary with the new messages. Keep the user's goals, details they shared (names, order numbers, dates, products), what the assistant already answered or promised, and anything still unresolved. Write at most {max_words} words.
+
+CURRENT SUMMARY:
+{previous_summary or "None yet."}
+---
+NEW MESSAGES:
+{transcript}
+---
+UPDATED SUMMARY:
+"""
+
+async def aupdate_rolling_summary(previous_summary: str | None, messages: list) -> str | None:
+    """Folds messages into the rolling summary; None when the LLM gave no usable summary."""
+    try:
+        text = await get_llm_provider().agenerate(_build_rolling_summary_prompt(previous_summary, messages))
+        return text.strip() if text and text.strip() else None
+    except Exception as e:
+        logger.error(f"Error updating rolling summary: {e}")
+        return None
+
+def _build_admin_summary_prompt(chat_history: list) -> str:
     transcript = "\n".join([f"{msg.role}: {msg.message}" for msg in chat_history])
-    prompt = f"""
+    return f"""
 As a support manager, summarize the following conversation objectively.
 1. Identify the user's primary problem.
 2. State the bot's solution.
@@ -108,19 +350,26 @@ CONVERSATION TRANSCRIPT:
 ---
 OBJECTIVE SUMMARY:
 """
-    try:
-        gemini_model = genai.GenerativeModel('gemini-2.0-flash')
-        response = gemini_model.generate_content(prompt)
-        return response.text.strip() if response.parts else "Could not generate a summary."
-    except Exception as e:
-        return f"An error occurred during summarization: {e}"
 
-def generate_analytics_summary(summaries: list) -> dict:
-    default_response = {"trending_topics": [], "unanswered_questions": [], "suggested_new_faqs": []}
-    if not summaries:
-        return default_response
+async def asummarize_conversation_for_admin(chat_history: list) -> str:
+    """Raises if the LLM call fails or returns nothing, so the caller never stores an error as a summary."""
+    if not chat_history:
+        return "This chat session has no messages."
+    text = await get_llm_provider().agenerate(_build_admin_summary_prompt(chat_history))
+    if text is None:
+        raise ValueError("The LLM returned no summary.")
+    return text.strip()
+
+def _empty_report() -> dict:
+    return {"trending_topics": [], "unanswered_questions": [], "suggested_new_faqs": []}
+
+def analytics_error_report() -> dict:
+    """Stands in for an analysis whose LLM call failed."""
+    return {**_empty_report(), "trending_topics": ["Error generating report due to an internal issue."]}
+
+def _build_analytics_prompt(summaries: list) -> str:
     summary_texts = "\n- ".join(summaries)
-    prompt = f"""
+    return f"""
 You are a data analyst. Analyze these chat summaries to identify key insights.
 Respond with a single JSON object with three keys: "trending_topics", "unanswered_questions", and "suggested_new_faqs".
 
@@ -133,11 +382,32 @@ CHAT SUMMARIES:
 ---
 JSON ANALYSIS:
 """
-    try:
-        gemini_model = genai.GenerativeModel('gemini-2.0-flash')
-        generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
-        response = gemini_model.generate_content(prompt, generation_config=generation_config)
-        return json.loads(response.text) if response.parts else default_response
-    except Exception as e:
-        print(f"Error generating analytics: {e}")
-        return {"trending_topics": ["Error generating report due to an internal issue."], "unanswered_questions": [], "suggested_new_faqs": []}
+
+def _build_analytics_merge_prompt(reports: list) -> str:
+    partial_reports = "\n".join(json.dumps(report) for report in reports)
+    return f"""
+You are a data analyst. Each line below is a JSON analysis of a different batch of chat summaries for the same support bot.
+Combine them into a single JSON object with the same three keys: "trending_topics", "unanswered_questions", and "suggested_new_faqs".
+
+1.  **trending_topics**: The top 3-5 topics across all batches, favouring topics that recur in several batches.
+2.  **unanswered_questions**: The distinct unanswered questions, merging duplicates.
+3.  **suggested_new_faqs**: The 2-3 most valuable question-and-answer pairs for the knowledge base.
+
+PARTIAL ANALYSES:
+{partial_reports}
+---
+JSON ANALYSIS:
+"""
+
+async def _agenerate_analytics_json(prompt: str) -> dict:
+    """Raises if the LLM call fails or returns invalid JSON, so a failed analysis is never mistaken for a result."""
+    text = await get_llm_provider().agenerate(prompt, json_mode=True)
+    return json.loads(text) if text is not None else _empty_report()
+
+async def agenerate_analytics_summary(summaries: list) -> dict:
+    if not summaries:
+        return _empty_report()
+    return await _agenerate_analytics_json(_build_analytics_prompt(summaries))
+
+async def amerge_analytics_reports(reports: list) -> dict:
+    return await _agenerate_analytics_json(_build_analytics_merge_prompt(reports))
@@ -0,0 +1,141 @@
+import re
+import json
+import random
+import asyncio
+import functools
+from .config import settings
+
+class LLMProvider:
+    """
+    Text-in, text-out interface used by app.core.llm. Implementations return None
+    (or yield nothing when streaming) when the provider blocks the response.
+    """
+    name = "base"
+
+    async def agenerate(self, prompt: str, json_mode: bool = False, timeout: float | None = None) -> str | None:
+        raise NotImplementedError
+
+    async def astream(self, prompt: str):
+        raise NotImplementedError
+        yield
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether the error is transient (timeouts, overload), so retrying may succeed."""
+        return isinstance(error, (TimeoutError, ConnectionError))
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
+        self._json_config = genai.types.GenerationConfig(response_mime_type="application/json")
+
+    async def agenerate(self, prompt: str, json_mode: bool = False, timeout: float | None = None) -> str | None:
+        response = await self._model.generate_content_async(
+            prompt, generation_config=self._json_config if json_mode else None, request_options={"timeout": timeout} if timeout else None
+        )
+        return response.text if response.parts else None
+
+    async def astream(self, prompt: str):
+        response = await self._model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.parts:
+                yield chunk.text
+
+    def is_retryable(self, error: Exception) -> bool:
+        from google.api_core import exceptions
+
+        # 429s and 5xx (including deadline exceeded) are transient; other API errors are not.
+        return super().is_retryable(error) or isinstance(
+            error, (exceptions.TooManyRequests, exceptions.ResourceExhausted, exceptions.ServerError)
+        )
+
+class FakeLLMProvider(LLMProvider):
+    """
+    Deterministic in-process provider for offline load tests. Replays the first canned
+    response whose key occurs in the prompt, otherwise answers from a template. Calls can
+    be made to fail (ConnectionError) or to take tail_latency_s, at the given rates.
+    """
+    name = "fake"
+
+    def __init__(self, latency_s: float = 0.0, responses: dict | None = None, failure_rate: float = 0.0,
+                 tail_rate: float = 0.0, tail_latency_s: float = 0.0, seed: int | None = None):
+        self.latency_s = latency_s
+        self.responses = responses or {}
+        self.failure_rate = failure_rate
+        self.tail_rate = tail_rate
+        self.tail_latency_s = tail_latency_s
+        self._random = random.Random(seed)
+
+    def _call_latency(self) -> float:
+        if self._random.random() < self.failure_rate:
+            raise ConnectionError("Injected fake LLM failure.")
+        return self.tail_latency_s if self._random.random() < self.tail_rate else self.latency_s
+
+    def _respond(self, prompt: str, json_mode: bool) -> str:
+        for key, response in self.responses.items():
+            if key in prompt:
+                return response
+        if json_mode:
+            return json.dumps({"trending_topics": [], "unanswered_questions": [], "suggested_new_faqs": []})
+        query = re.search(r"User Query: (.*)", prompt)
+        if query:
+            answer = re.search(r"\nA: (.*)", prompt)
+            text = answer.group(1) if answer else f"I can help with: {query.group(1).strip()}"
+            suggestions = ["Can you tell me more?"] if answer else []
+            return f"{text}\n```json\n{json.dumps({'suggestions': suggestions})}\n```"
+        return f"Summary of a conversation ({prompt.count(chr(10))} transcript lines)."
+
+    async def agenerate(self, prompt: str, json_mode: bool = False, timeout: float | None = None) -> str | None:
+        await asyncio.sleep(self._call_latency())
+        return self._respond(prompt, json_mode)
+
+    async def astream(self, prompt: str):
+        latency_s = self._call_latency()
+        words = self._respond(prompt, json_mode=False).split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(latency_s / len(words))
+            yield word if i == 0 else " " + word
+
+def _load_fake_responses(path: str | None) -> dict:
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _build_provider() -> LLMProvider:
+    if settings.LLM_PROVIDER == GeminiProvider.name:
+        return GeminiProvider(api_key=settings.GEMINI_API_KEY, model_name=settings.LLM_MODEL)
+    if settings.LLM_PROVIDER == FakeLLMProvider.name:
+        return FakeLLMProvider(
+            latency_s=settings.FAKE_LLM_LATENCY_MS / 1000,
+            responses=_load_fake_responses(settings.FAKE_LLM_RESPONSES_FILE),
+            failure_rate=settings.FAKE_LLM_FAILURE_RATE,
+            tail_rate=settings.FAKE_LLM_TAIL_RATE,
+            tail_latency_s=settings.FAKE_LLM_TAIL_LATENCY_MS / 1000,
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER: {settings.LLM_PROVIDER}")
+
+@functools.lru_cache(maxsize=None)
+def get_llm_provider() -> LLMProvider:
+    """
+    Builds the configured provider once, wrapped in the resilience layer; every LLM call
+    in the process reuses it, and so shares its circuit breaker and concurrency limit.
+    """
+    from .llm_resilience import CircuitBreaker, ResilientLLMProvider
+
+    return ResilientLLMProvider(
+        _build_provider(),
+        breaker=CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_SECONDS),
+        timeout_s=settings.LLM_TIMEOUT_SECONDS,
+        attempt_timeout_s=settings.LLM_ATTEMPT_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        retry_base_delay_s=settings.LLM_RETRY_BASE_DELAY_MS / 1000,
+        retry_max_delay_s=settings.LLM_RETRY_MAX_DELAY_MS / 1000,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        hedge_after_s=settings.LLM_HEDGE_AFTER_MS / 1000,
+    )
@@ -0,0 +1,229 @@
+import time
+import random
+import asyncio
+import threading
+import weakref
+from .llm_providers import LLMProvider
+from .prompt_builder import estimate_tokens
+from .metrics import LLM_ATTEMPTS, LLM_SHORT_CIRCUITED, LLM_HEDGED_REQUESTS, LLM_CIRCUIT_OPEN, LLM_TOKENS
+
+class LLMUnavailable(Exception):
+    """The call was refused or gave up (circuit open, deadline, concurrency limit or retries exhausted)."""
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failed attempts and refuses calls for
+    reset_timeout_s; then lets one trial call through, which closes it on success and
+    re-opens it on failure.
+    """
+    def __init__(self, failure_threshold: int, reset_timeout_s: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.reset_timeout_s else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_in_flight or time.monotonic() - self._opened_at < self.reset_timeout_s:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures, self._opened_at, self._trial_in_flight = 0, None, False
+        LLM_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            opened = self._trial_in_flight or self._failures >= self.failure_threshold
+            if opened:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+        if opened:
+            LLM_CIRCUIT_OPEN.set(1)
+
+    def abandon(self):
+        """The attempt ended without telling anything about the provider's health (cancelled, rejected)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+class ResilientLLMProvider(LLMProvider):
+    """
+    Wraps a provider with a deadline per call (LLM_TIMEOUT_SECONDS) and per attempt,
+    bounded retries with jittered exponential backoff for transient errors, a circuit
+    breaker, a concurrency limit, and optional hedging: a second identical request is sent
+    if the first hasn't answered after hedge_after_s, and whichever finishes first wins.
+    """
+    def __init__(self, provider: LLMProvider, breaker: CircuitBreaker, timeout_s: float, attempt_timeout_s: float,
+                 max_retries: int, retry_base_delay_s: float, retry_max_delay_s: float,
+                 max_concurrency: int, hedge_after_s: float = 0.0):
+        self.provider = provider
+        self.name = provider.name
+        self.breaker = breaker
+        self.timeout_s = timeout_s
+        self.attempt_timeout_s = attempt_timeout_s
+        self.max_retries = max_retries
+        self.retry_base_delay_s = retry_base_delay_s
+        self.retry_max_delay_s = retry_max_delay_s
+        self.max_concurrency = max_concurrency
+        self.hedge_after_s = hedge_after_s
+        # asyncio primitives belong to one event loop; keep a limiter per loop.
+        self._async_limits = weakref.WeakKeyDictionary()
+
+    def is_retryable(self, error: Exception) -> bool:
+        return self.provider.is_retryable(error)
+
+    def _async_limit(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        limit = self._async_limits.get(loop)
+        if limit is None:
+            limit = self._async_limits[loop] = asyncio.Semaphore(self.max_concurrency)
+        return limit
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.retry_max_delay_s, self.retry_base_delay_s * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def _check_circuit(self):
+        if not self.breaker.allow():
+            LLM_SHORT_CIRCUITED.inc()
+            raise LLMUnavailable("LLM circuit breaker is open.")
+
+    def _record_failure(self, error: Exception):
+        LLM_ATTEMPTS.labels(outcome="timeout" if isinstance(error, TimeoutError) else "error").inc()
+        if self.is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.abandon()
+
+    def _record_success(self):
+        LLM_ATTEMPTS.labels(outcome="ok").inc()
+        self.breaker.record_success()
+
+    def _count_tokens(self, kind: str, text: str | None):
+        if text:
+            LLM_TOKENS.labels(kind=kind).inc(estimate_tokens(text))
+
+    async def _attempt(self, prompt: str, json_mode: bool, deadline: float) -> str | None:
+        loop = asyncio.get_running_loop()
+        limit = self._async_limit()
+        try:
+            await asyncio.wait_for(limit.acquire(), max(0.0, deadline - loop.time()))
+        except TimeoutError:
+            self.breaker.abandon()
+            raise LLMUnavailable("No LLM concurrency slot became free before the deadline.")
+        try:
+            timeout = min(self.attempt_timeout_s, deadline - loop.time())
+            self._count_tokens("prompt", prompt)
+            result = await asyncio.wait_for(self.provider.agenerate(prompt, json_mode=json_mode, timeout=timeout), timeout)
+        except asyncio.CancelledError:
+            self.breaker.abandon()
+            raise
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        finally:
+            limit.release()
+        self._record_success()
+        self._count_tokens("completion", result)
+        return result
+
+    async def _hedged_attempt(self, prompt: str, json_mode: bool, deadline: float) -> str | None:
+        tasks = [asyncio.ensure_future(self._attempt(prompt, json_mode, deadline))]
+        # asyncio.wait doesn't cancel what it waits on, so a cancelled caller must, or the
+        # attempts would keep running and holding concurrency slots.
+        try:
+            if not self.hedge_after_s:
+                return await tasks[0]
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after_s)
+            # Hedges only use spare capacity and never probe a recovering provider twice.
+            if done or self._async_limit().locked() or self.breaker.state != "closed":
+                return await tasks[0]
+            LLM_HEDGED_REQUESTS.inc()
+            tasks.append(asyncio.ensure_future(self._attempt(prompt, json_mode, deadline)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return tasks[0].result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def agenerate(self, prompt: str, json_mode: bool = False, timeout: float | None = None) -> str | None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout_s)
+        attempt = 0
+        while True:
+            self._check_circuit()
+            try:
+                return await self._hedged_attempt(prompt, json_mode, deadline)
+            except LLMUnavailable:
+                raise
+            except Exception as e:
+                delay = self._backoff(attempt)
+                if not self.is_retryable(e) or attempt >= self.max_retries or loop.time() + delay >= deadline:
+                    raise LLMUnavailable(f"LLM call failed: {e!r}") from e
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def astream(self, prompt: str):
+        """
+        Retries only until the first chunk has been yielded. The deadline covers the wait for
+        the first chunk; after that, each chunk must arrive within the attempt timeout.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout_s
+        attempt = 0
+        while True:
+            self._check_circuit()
+            limit = self._async_limit()
+            try:
+                await asyncio.wait_for(limit.acquire(), max(0.0, deadline - loop.time()))
+            except TimeoutError:
+                self.breaker.abandon()
+                raise LLMUnavailable("No LLM concurrency slot became free before the deadline.")
+            self._count_tokens("prompt", prompt)
+            stream = self.provider.astream(prompt)
+            produced = False
+            try:
+                while True:
+                    timeout = self.attempt_timeout_s if produced else min(self.attempt_timeout_s, deadline - loop.time())
+                    try:
+                        chunk = await asyncio.wait_for(anext(stream), timeout)
+                    except StopAsyncIteration:
+                        break
+                    produced = True
+                    self._count_tokens("completion", chunk)
+                    yield chunk
+                # One outcome per attempt: a stream only succeeds once it has finished.
+                self._record_success()
+                return
+            except (asyncio.CancelledError, GeneratorExit):
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                self._record_failure(e)
+                delay = self._backoff(attempt)
+                if produced or not self.is_retryable(e) or attempt >= self.max_retries or loop.time() + delay >= deadline:
+                    raise LLMUnavailable(f"LLM stream failed: {e!r}") from e
+            finally:
+                limit.release()
+                await stream.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,146 @@
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by method, route template and status code.",
+    ["method", "route", "status"],
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response.",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+
+STAGE_SECONDS = Histogram(
+    "request_stage_seconds",
+    "Time spent in each stage of request handling (bot, history, faq_index, retrieval, llm, persist, ...).",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+CHAT_REQUESTS = Counter(
+    "chat_requests_total",
+    "Chat requests by bot and endpoint.",
+    ["bot_id", "endpoint"],
+)
+
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "response_cache_requests_total",
+    "Semantic response cache lookups by result.",
+    ["result"],
+)
+
+FAQ_INDEX_CACHE_REQUESTS = Counter(
+    "faq_index_cache_requests_total",
+    "FAQ retrieval index cache lookups by result.",
+    ["result"],
+)
+
+FAQ_RETRIEVALS = Counter(
+    "faq_retrievals_total",
+    "FAQ retrievals by path (semantic, hybrid, lexical_fast_path).",
+    ["path"],
+)
+
+IDENTITY_CACHE_REQUESTS = Counter(
+    "identity_cache_requests_total",
+    "User and bot identity cache lookups by kind and result.",
+    ["kind", "result"],
+)
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    "embedding_batch_size",
+    "Queries encoded per batched embedding call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+EMBEDDING_BATCH_WAIT_SECONDS = Histogram(
+    "embedding_batch_wait_seconds",
+    "Time a query waited for its embedding batch to be dispatched.",
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+PROMPT_TOKENS = Histogram(
+    "chat_prompt_tokens",
+    "Estimated tokens per chat response prompt.",
+    buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000),
+)
+
+PROMPT_ITEMS_DROPPED = Counter(
+    "chat_prompt_items_dropped_total",
+    "FAQs and history messages left out of chat prompts to stay within the token budget.",
+    ["kind"],
+)
+
+LLM_ATTEMPTS = Counter(
+    "llm_attempts_total",
+    "Requests sent to the LLM provider, by outcome.",
+    ["outcome"],
+)
+
+LLM_SHORT_CIRCUITED = Counter(
+    "llm_short_circuited_total",
+    "LLM calls refused because the circuit breaker was open.",
+)
+
+LLM_HEDGED_REQUESTS = Counter(
+    "llm_hedged_requests_total",
+    "Second requests sent because the first was slower than LLM_HEDGE_AFTER_MS.",
+)
+
+LLM_CIRCUIT_OPEN = Gauge(
+    "llm_circuit_open",
+    "1 while the LLM circuit breaker is open or half-open.",
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Estimated tokens sent to (prompt) and received from (completion) the LLM provider, retries and hedges included.",
+    ["kind"],
+)
+
+CHAT_RETENTION_SESSIONS = Counter(
+    "chat_retention_sessions_total",
+    "Chat sessions processed by the archival job, by action (archived, deleted).",
+    ["action"],
+)
+
+DB_POOL_SIZE = Gauge(
+    "db_pool_size",
+    "Configured number of persistent connections in the database pool.",
+    ["engine"],
+)
+
+DB_POOL_MAX_CONNECTIONS = Gauge(
+    "db_pool_max_connections",
+    "Most connections the database pool will open (size plus overflow); checked_out / this is the pool's saturation.",
+    ["engine"],
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Database pool connections by state (checked_out, idle, overflow).",
+    ["engine", "state"],
+)
+
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Requests answered 503 because no pooled database connection became free within DB_POOL_TIMEOUT_SECONDS.",
+)
+
+def track_pool(name: str, engine, max_connections: int):
+    """Exports an engine's pool usage at scrape time. Only QueuePools (the default for file and server databases) report."""
+    if not isinstance(engine.pool, QueuePool):
+        return
+    DB_POOL_MAX_CONNECTIONS.labels(engine=name).set(max_connections)
+    # engine.pool is read on every scrape: dispose() replaces the pool object.
+    DB_POOL_SIZE.labels(engine=name).set_function(lambda: engine.pool.size())
+    DB_POOL_CONNECTIONS.labels(engine=name, state="checked_out").set_function(lambda: engine.pool.checkedout())
+    DB_POOL_CONNECTIONS.labels(engine=name, state="idle").set_function(lambda: engine.pool.checkedin())
+    DB_POOL_CONNECTIONS.labels(engine=name, state="overflow").set_function(lambda: max(0, engine.pool.overflow()))
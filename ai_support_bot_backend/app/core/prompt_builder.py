@@ -0,0 +1,83 @@
+from .config import settings
+
+def estimate_tokens(text: str) -> int:
+    # Roughly 4 characters per token for English text; good enough for budgeting prompts.
+    return len(text) // 4 + 1
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max(0, max_tokens) * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + "…"
+
+def _render(bot_name: str, query: str, context_str: str, summary_str: str, history_str: str) -> str:
+    return f"""
+You are '{bot_name}', an advanced AI assistant.
+Your Persona: You are empathetic, professional, and concise.
+
+**Your Core Directives (Follow in this order):**
+1.  **Use Context for Factual Queries:** If "CONTEXT" is available, answer the user's question based strictly on it.
+2.  **Reason About Context:** If the user asks a follow-up question related to the context (e.g., "What does 'original condition' mean?"), provide a helpful, general explanation based on common understanding, but explicitly state that the policy details are not specified in your knowledge base.
+3.  **Acknowledge User Feedback:** If the user provides feedback or suggests an improvement (e.g., "You should add this to your FAQs", "Tell your admin"), you MUST acknowledge their feedback positively. Example: "Thank you for that suggestion. I will pass it along to the team to improve our knowledge base." Do not re-state that you cannot answer.
+4.  **Handle Small Talk:** If no context is found and the query is a simple greeting or question about you, respond conversationally.
+5.  **Intelligent Escalation:** If the query fits none of the above, escalate by politely stating you cannot help and recommending contact with a human agent.
+
+**Output Format:** After your response, you MUST include a markdown-fenced JSON object with one key: "suggestions". This should be an array of 2-3 relevant follow-up questions. For feedback, small talk, or escalations, this array should be empty.
+
+---
+CONTEXT FROM KNOWLEDGE BASE:
+{context_str or "No relevant information found."}
+---
+{f"SUMMARY OF EARLIER CONVERSATION:{chr(10)}{summary_str}{chr(10)}---{chr(10)}" if summary_str else ""}CONVERSATION HISTORY:
+{history_str}
+---
+User Query: {query}
+
+Response:
+"""
+
+def build_response_prompt(query: str, chat_history: list, relevant_faqs: list, bot_name: str,
+                          history_summary: str | None = None, token_budget: int | None = None) -> tuple[str, dict]:
+    """
+    Builds the chat prompt within an estimated token budget and returns it with its stats.
+
+    After the instructions and the query, FAQs (best match first, long answers truncated) may
+    use up to PROMPT_FAQ_SHARE of what is left; the rest, plus whatever the FAQs didn't use,
+    goes to the rolling summary of earlier turns and then to the most recent messages. An FAQ
+    or message that doesn't fit is dropped along with everything ranked or dated below it.
+    """
+    budget = token_budget or settings.PROMPT_TOKEN_BUDGET
+    query = truncate_to_tokens(query, settings.PROMPT_MESSAGE_MAX_TOKENS)
+    remaining = max(0, budget - estimate_tokens(_render(bot_name, query, "", "", "")))
+
+    faq_budget, faq_entries = int(remaining * settings.PROMPT_FAQ_SHARE), []
+    for faq in relevant_faqs:
+        entry = f"Q: {truncate_to_tokens(faq['question'], settings.PROMPT_MESSAGE_MAX_TOKENS)}\nA: {truncate_to_tokens(faq['answer'], settings.PROMPT_FAQ_MAX_TOKENS)}"
+        tokens = estimate_tokens(entry)
+        if tokens > faq_budget:
+            break
+        faq_entries.append(entry)
+        faq_budget -= tokens
+        remaining -= tokens
+
+    summary_str = ""
+    if history_summary:
+        summary_str = truncate_to_tokens(history_summary, min(settings.PROMPT_SUMMARY_MAX_TOKENS, remaining))
+        remaining -= estimate_tokens(summary_str)
+
+    history_lines = []
+    for msg in reversed(chat_history or []):
+        line = f"{msg.role}: {truncate_to_tokens(msg.message, settings.PROMPT_MESSAGE_MAX_TOKENS)}"
+        tokens = estimate_tokens(line)
+        if tokens > remaining:
+            break
+        history_lines.append(line)
+        remaining -= tokens
+
+    prompt = _render(bot_name, query, "\n".join(faq_entries), summary_str, "\n".join(reversed(history_lines)))
+    stats = {
+        "tokens": estimate_tokens(prompt),
+        "faqs_dropped": len(relevant_faqs) - len(faq_entries),
+        "messages_dropped": len(chat_history or []) - len(history_lines),
+    }
+    return prompt, stats
@@ -0,0 +1,90 @@
+import time
+import threading
+import itertools
+from collections import OrderedDict
+import numpy as np
+from .config import settings
+from .metrics import RESPONSE_CACHE_REQUESTS
+
+class _Entry:
+    __slots__ = ("bucket", "embedding", "response", "expires_at")
+
+    def __init__(self, bucket: tuple, embedding: np.ndarray, response: dict, expires_at: float):
+        self.bucket = bucket
+        self.embedding = embedding
+        self.response = response
+        self.expires_at = expires_at
+
+class SemanticResponseCache:
+    """
+    Stores generated answers per (bot, FAQ content hash, retrieved FAQ ids) and serves one
+    for a new query whose embedding is close enough to a cached query's embedding.
+    Entries expire after ttl_s and the least recently used are evicted beyond max_entries.
+    """
+
+    def __init__(self, similarity_threshold: float, ttl_s: float, max_entries: int):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        return embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        bucket = self._buckets[entry.bucket]
+        bucket.discard(entry_id)
+        if not bucket:
+            del self._buckets[entry.bucket]
+
+    def lookup(self, bucket: tuple, query_embedding: np.ndarray) -> dict | None:
+        query = self._normalize(query_embedding)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_score = None, self.similarity_threshold
+            for entry_id in list(self._buckets.get(bucket, ())):
+                entry = self._entries[entry_id]
+                if entry.expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                score = float(entry.embedding @ query)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                RESPONSE_CACHE_REQUESTS.labels(result="miss").inc()
+                return None
+            self._entries.move_to_end(best_id)
+            RESPONSE_CACHE_REQUESTS.labels(result="hit").inc()
+            return self._entries[best_id].response
+
+    def store(self, bucket: tuple, query_embedding: np.ndarray, response: dict):
+        entry = _Entry(bucket, self._normalize(query_embedding), response, time.monotonic() + self.ttl_s)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._buckets.setdefault(bucket, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+response_cache = SemanticResponseCache(
+    similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY,
+    ttl_s=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+)
+
+def cache_bucket(bot, faq_ids: list) -> tuple:
+    return (bot.id, bot.faqs_hash, tuple(faq_ids))
+
+def is_cacheable(chat_history: list) -> bool:
+    return settings.RESPONSE_CACHE_ENABLED and len(chat_history) <= settings.RESPONSE_CACHE_MAX_HISTORY
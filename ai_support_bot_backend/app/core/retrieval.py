@@ -0,0 +1,194 @@
+import re
+import math
+import numpy as np
+
+SIMILARITY_THRESHOLD = 0.5
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _top_k(scores: np.ndarray, k: int):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    order = np.argsort(-scores[candidates], kind="stable")
+    return scores[candidates[order]], candidates[order]
+
+class ExactIndex:
+    """Brute-force cosine similarity as a single matrix-vector product."""
+    name = "exact"
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = _normalize(embeddings)
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    @property
+    def nbytes(self) -> int:
+        return self.embeddings.nbytes
+
+    def search(self, query_embedding: np.ndarray, top_k: int):
+        return _top_k(self.embeddings @ _normalize(query_embedding), top_k)
+
+    def score(self, query_embedding: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query to the given rows."""
+        return self.embeddings[indices] @ _normalize(query_embedding)
+
+class IVFIndex:
+    """
+    Inverted-file index: FAQ vectors are clustered with spherical k-means and a query
+    is only scored against the vectors of its n_probe closest clusters.
+    """
+    name = "ivf"
+
+    def __init__(self, embeddings: np.ndarray, n_lists: int | None = None, n_probe: int = 8,
+                 n_iter: int = 10, train_size: int = 256, seed: int = 0):
+        vectors = _normalize(embeddings)
+        n_rows = len(vectors)
+        self.n_lists = max(1, min(n_lists or int(np.sqrt(n_rows)), n_rows))
+        self.n_probe = max(1, min(n_probe, self.n_lists))
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(n_rows, self.n_lists * train_size)
+        sample = vectors[rng.choice(n_rows, size=sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, size=self.n_lists, replace=False)]
+        for _ in range(n_iter):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=self.n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+        self.centroids = centroids
+
+        # Vectors are stored grouped by list so probing a list is a contiguous slice.
+        assignment = self._assign(vectors, centroids)
+        self.order = np.argsort(assignment, kind="stable")
+        self.positions = np.argsort(self.order)
+        self.vectors = vectors[self.order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=self.n_lists))))
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[start:start + batch_size] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), batch_size)
+        ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.centroids.nbytes + self.order.nbytes + self.positions.nbytes + self.offsets.nbytes
+
+    def search(self, query_embedding: np.ndarray, top_k: int):
+        query = _normalize(query_embedding)
+        probed = np.argpartition(-(self.centroids @ query), self.n_probe - 1)[:self.n_probe]
+        positions = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in probed])
+        scores, candidates = _top_k(self.vectors[positions] @ query, top_k)
+        return scores, self.order[positions[candidates]]
+
+    def score(self, query_embedding: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query to the given rows, whichever lists they are in."""
+        return self.vectors[self.positions[indices]] @ _normalize(query_embedding)
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_CODE_SEPARATORS = re.compile(r"[-_./]")
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased words; codes like "ERR-1042" are kept whole and also split into parts."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        parts = _CODE_SEPARATORS.split(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index. Scores are divided by the query terms' summed idf, so a
+    document matching every term scores about 1 whatever the query's length.
+    """
+    def __init__(self, documents: list[str], k1: float = 1.2, b: float = 0.75):
+        term_counts = []
+        for document in documents:
+            counts = {}
+            for token in tokenize(document):
+                counts[token] = counts.get(token, 0) + 1
+            term_counts.append(counts)
+        self.n_docs = len(documents)
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        length_norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()) if self.n_docs else 0.0, 1e-12))
+
+        postings = {}
+        for doc_id, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+        self.idf, self.postings = {}, {}
+        for term, entries in postings.items():
+            doc_ids = np.array([doc_id for doc_id, _ in entries], dtype=np.int32)
+            tfs = np.array([tf for _, tf in entries], dtype=np.float32)
+            self.idf[term] = self._idf(len(entries))
+            self.postings[term] = (doc_ids, self.idf[term] * tfs * (k1 + 1) / (tfs + length_norm[doc_ids]))
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+
+    def __len__(self):
+        return self.n_docs
+
+    @property
+    def nbytes(self) -> int:
+        return sum(doc_ids.nbytes + weights.nbytes + len(term) for term, (doc_ids, weights) in self.postings.items())
+
+    def search(self, query: str, top_k: int):
+        """Returns the top_k normalised scores and rows, and how many query terms are known."""
+        terms = set(tokenize(query))
+        known = [term for term in terms if term in self.postings]
+        if not known:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64), 0
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in known:
+            doc_ids, weights = self.postings[term]
+            scores[doc_ids] += weights
+        # Unknown terms count as if in no FAQ, so a query that is mostly unknown words scores low.
+        scores /= sum(self.idf.get(term, self._idf(0)) for term in terms)
+        scores, indices = _top_k(scores, top_k)
+        matched = scores > 0
+        return scores[matched], indices[matched], len(known)
+
+def hybrid_search(index, query_embedding: np.ndarray, lexical_scores: np.ndarray, lexical_indices: np.ndarray,
+                  top_k: int, lexical_weight: float, n_candidates: int, min_similarity: float):
+    """
+    Ranks the union of the index's n_candidates nearest rows and the lexical hits by cosine
+    similarity plus lexical_weight times the normalised BM25 score. Only rows whose cosine
+    similarity alone exceeds min_similarity are kept, so BM25 re-ranks but never admits a row.
+    Returns the rows' cosine similarities and indices, best first.
+    """
+    _, semantic_indices = index.search(query_embedding, n_candidates)
+    candidates = np.union1d(semantic_indices, lexical_indices).astype(np.int64)
+    boost = np.zeros(len(candidates), dtype=np.float32)
+    boost[np.searchsorted(candidates, lexical_indices)] = lexical_scores
+    similarities = index.score(query_embedding, candidates)
+    relevant = similarities > min_similarity
+    candidates, similarities, boost = candidates[relevant], similarities[relevant], boost[relevant]
+    _, order = _top_k(similarities + lexical_weight * boost, top_k)
+    return similarities[order], candidates[order]
+
+RETRIEVAL_BACKENDS = {
+    ExactIndex.name: ExactIndex,
+    IVFIndex.name: IVFIndex,
+}
+
+def build_index(backend: str, embeddings: np.ndarray, n_probe: int = 8):
+    if backend == IVFIndex.name:
+        return IVFIndex(embeddings, n_probe=n_probe)
+    if backend == ExactIndex.name:
+        return ExactIndex(embeddings)
+    raise ValueError(f"Unknown retrieval backend: {backend}")
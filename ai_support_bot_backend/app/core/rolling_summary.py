@@ -0,0 +1,31 @@
+import uuid
+from app.db import crud
+from app.db.session import AsyncSessionLocal
+from . import llm
+from .config import settings
+
+def history_window() -> int:
+    """Unsummarized messages loaded for a prompt: the recent ones plus those awaiting the next fold."""
+    return settings.PROMPT_RECENT_MESSAGES + settings.ROLLING_SUMMARY_EVERY
+
+def is_fold_due(chat_history: list) -> bool:
+    """Whether, once the current turn is stored, enough messages will have aged out of the recent window."""
+    return len(chat_history) + 2 >= history_window()
+
+async def update_rolling_summary(session_id: str, user_id: uuid.UUID):
+    """Folds the messages that aged out of the recent window into the session's rolling summary."""
+    async with AsyncSessionLocal() as db:
+        state = await db.run_sync(
+            crud.get_messages_to_summarize, session_id=session_id, user_id=user_id, keep_recent=settings.PROMPT_RECENT_MESSAGES
+        )
+    if state is None or not state[2]:
+        return
+    previous_summary, previous_upto, messages = state
+    summary = await llm.aupdate_rolling_summary(previous_summary, messages)
+    if summary is None:
+        return
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(
+            crud.save_rolling_summary, session_id=session_id, user_id=user_id,
+            summary=summary, upto=messages[-1].timestamp, previous_upto=previous_upto,
+        )
@@ -1,17 +1,72 @@
 import uuid
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from .config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes with any other cost are reported by verify_and_update and rehashed on login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+class PasswordHashingBusy(Exception):
+    """Raised when PASSWORD_HASH_MAX_PENDING password operations are already queued."""
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Returns (valid, new hash or None if the stored hash is already at the configured cost)."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# bcrypt is CPU-bound, so it runs in a process pool sized to the cores instead of the
+# threadpool shared with every sync endpoint.
+_password_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_pending = 0
+
+def _get_password_pool() -> ProcessPoolExecutor:
+    global _password_pool
+    with _pool_lock:
+        if _password_pool is None:
+            _password_pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _password_pool
+
+async def _run_in_password_pool(func, *args):
+    global _pending
+    if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHashingBusy()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_password_pool(), func, *args)
+    finally:
+        _pending -= 1
+
+async def averify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return await _run_in_password_pool(verify_and_update_password, plain_password, hashed_password)
+
+async def aget_password_hash(password: str) -> str:
+    return await _run_in_password_pool(get_password_hash, password)
+
+def shutdown_password_pool():
+    global _password_pool
+    with _pool_lock:
+        if _password_pool is not None:
+            _password_pool.shutdown(cancel_futures=True)
+            _password_pool = None
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
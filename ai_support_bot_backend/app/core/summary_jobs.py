@@ -0,0 +1,104 @@
+import uuid
+import asyncio
+import datetime
+import logging
+from cachetools import LRUCache
+from app.db import crud
+from app.db.session import AsyncSessionLocal
+from . import llm
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class SummaryJob:
+    def __init__(self, bot_id: uuid.UUID, owner_id: uuid.UUID, sessions: list[tuple[str, uuid.UUID]]):
+        self.id = uuid.uuid4()
+        self.bot_id = bot_id
+        self.owner_id = owner_id
+        self.sessions = sessions
+        self.status = "pending"
+        self.total_sessions = len(sessions)
+        self.processed_sessions = 0
+        # Sessions without any messages; marked as summarised without storing a summary.
+        self.skipped_sessions = 0
+        # Sessions whose summary failed; they keep needs_summary so the next job retries them.
+        self.failed_sessions = []
+        self.error = None
+        self.created_at = datetime.datetime.utcnow()
+        self.finished_at = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("pending", "running")
+
+# Job state lives in-process; only the most recent jobs are kept for status polling.
+_jobs = LRUCache(maxsize=1000)
+
+def get_job(job_id: uuid.UUID) -> SummaryJob | None:
+    return _jobs.get(job_id)
+
+def get_active_job_for_bot(bot_id: uuid.UUID) -> SummaryJob | None:
+    return next((job for job in _jobs.values() if job.bot_id == bot_id and job.is_active), None)
+
+def create_job(bot_id: uuid.UUID, owner_id: uuid.UUID, sessions: list[tuple[str, uuid.UUID]]) -> SummaryJob:
+    job = SummaryJob(bot_id=bot_id, owner_id=owner_id, sessions=sessions)
+    _jobs[job.id] = job
+    return job
+
+async def run_summary_job(job: SummaryJob):
+    """
+    Summarises every session of the job: histories are loaded in one query, summaries are
+    generated with bounded concurrency and written back in batches as they complete.
+    """
+    job.status = "running"
+    summarized_at = datetime.datetime.utcnow()
+    tasks = []
+    try:
+        async with AsyncSessionLocal() as db:
+            histories = await db.run_sync(crud.get_full_chat_histories_for_sessions, sessions=job.sessions)
+            empty_sessions = [session_id for session_id, user_id in job.sessions if (session_id, user_id) not in histories]
+            if empty_sessions:
+                await db.run_sync(crud.mark_sessions_summarized, bot_id=job.bot_id, session_ids=empty_sessions, summarized_at=summarized_at)
+                await db.commit()
+            job.skipped_sessions = len(empty_sessions)
+
+        semaphore = asyncio.Semaphore(settings.SUMMARY_JOB_CONCURRENCY)
+
+        async def summarize(session_id: str, history: list):
+            async with semaphore:
+                try:
+                    return session_id, await llm.asummarize_conversation_for_admin(history), None
+                except Exception as e:
+                    return session_id, None, e
+
+        tasks = [asyncio.create_task(summarize(session_id, history)) for (session_id, _), history in histories.items()]
+        pending_summaries, last_error = {}, None
+        async with AsyncSessionLocal() as db:
+            for next_done in asyncio.as_completed(tasks):
+                session_id, summary_text, error = await next_done
+                if error is not None:
+                    logger.warning(f"Summary job {job.id} could not summarise session {session_id}: {error}")
+                    job.failed_sessions.append(session_id)
+                    last_error = error
+                    continue
+                pending_summaries[session_id] = summary_text
+                if len(pending_summaries) >= settings.SUMMARY_JOB_BATCH_SIZE:
+                    await db.run_sync(crud.upsert_chat_summaries, bot_id=job.bot_id, summaries=pending_summaries, summarized_at=summarized_at)
+                    job.processed_sessions += len(pending_summaries)
+                    pending_summaries = {}
+            await db.run_sync(crud.upsert_chat_summaries, bot_id=job.bot_id, summaries=pending_summaries, summarized_at=summarized_at)
+            job.processed_sessions += len(pending_summaries)
+        if job.failed_sessions:
+            job.status = "partial" if job.processed_sessions else "failed"
+            job.error = f"{len(job.failed_sessions)} of {job.total_sessions} session(s) could not be summarised: {last_error}"
+        else:
+            job.status = "completed"
+    except Exception as e:
+        for task in tasks:
+            task.cancel()
+        logger.error(f"Error running summary job {job.id}: {e}")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.sessions = []
+        job.finished_at = datetime.datetime.utcnow()
@@ -0,0 +1,116 @@
+import json
+import time
+import uuid
+import logging
+import contextvars
+from contextlib import contextmanager
+from .metrics import HTTP_REQUESTS, HTTP_REQUEST_SECONDS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Probes and scrapes are logged at DEBUG so they don't drown out real traffic.
+QUIET_ROUTES = {"/metrics", "/ready"}
+
+class RequestTrace:
+    """Per-request timings and fields, logged as one JSON line when the response is complete."""
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.fields = {}
+
+_current_trace = contextvars.ContextVar("request_trace", default=None)
+
+def current_request_id() -> str | None:
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else None
+
+def annotate(**fields):
+    """Adds fields (bot_id, cache result, token counts, ...) to the current request's log line."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+def record_stage(name: str, seconds: float):
+    STAGE_SECONDS.labels(stage=name).observe(seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.stages[name] = trace.stages.get(name, 0.0) + seconds
+
+@contextmanager
+def stage(name: str):
+    """Times the enclosed block (which may await) as a stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = current_request_id() or "-"
+        return True
+
+def configure_logging(level: str):
+    """Sends the app's loggers to stderr, each line tagged with the id of the request it belongs to."""
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(level.upper())
+    if any(isinstance(f, RequestIdFilter) for handler in app_logger.handlers for f in handler.filters):
+        return
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    app_logger.addHandler(handler)
+    app_logger.propagate = False
+
+class RequestTracingMiddleware:
+    """
+    ASGI middleware that opens a RequestTrace for each HTTP request, echoes its id in an
+    X-Request-ID header (reusing the caller's, if sent), and records the request's metrics
+    and log line once the last body chunk is sent, so streamed replies are timed to the end
+    and background tasks are not.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")[:64]
+        trace = RequestTrace(incoming or uuid.uuid4().hex)
+        token = _current_trace.set(trace)
+        status_code, finished = 500, False
+
+        def finish():
+            nonlocal finished
+            finished = True
+            duration = time.perf_counter() - trace.start
+            # The route template, not the path, keeps label cardinality bounded.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.labels(method=scope["method"], route=route, status=str(status_code)).inc()
+            HTTP_REQUEST_SECONDS.labels(method=scope["method"], route=route).observe(duration)
+            logger.log(logging.DEBUG if route in QUIET_ROUTES else logging.INFO, json.dumps({
+                "event": "request",
+                "method": scope["method"],
+                "route": route,
+                "status": status_code,
+                "duration_ms": round(duration * 1000, 2),
+                "stages_ms": {name: round(seconds * 1000, 2) for name, seconds in trace.stages.items()},
+                **trace.fields,
+            }, default=str))
+
+        async def traced_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", trace.request_id.encode("latin-1"))]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not finished:
+                finish()
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            if not finished:
+                finish()
+            _current_trace.reset(token)
@@ -0,0 +1,121 @@
+"""
+Rebuilds the chat_sessions metadata table from chat_history, chat_archives and chat_summaries.
+
+Migration 0004 filled the table with its own frozen copy of this; run this at any time to repair it:
+    python -m app.db.backfill
+Only the columns derived from those tables are rewritten; rolling summaries (history_summary,
+history_summary_upto) are kept, and rows for sessions with no messages left are deleted.
+"""
+import uuid
+import itertools
+from sqlalchemy import select, delete, exists, and_, inspect
+from sqlalchemy.engine import Connection
+from . import models
+
+BATCH_SIZE = 5000
+# Everything but the rolling summary columns, which only the chat endpoints can produce.
+DERIVED_COLUMNS = (
+    "bot_id", "first_message", "message_count", "created_at", "last_updated",
+    "last_summarized_at", "needs_summary", "archived_at",
+)
+
+def _upsert_sessions(conn: Connection, rows: list[dict]):
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    table = models.ChatSession.__table__
+    statement = dialect_insert(table)
+    conn.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.session_id, table.c.user_id],
+        set_={name: statement.excluded[name] for name in DERIVED_COLUMNS},
+    ), rows)
+
+def _delete_empty_sessions(conn: Connection, has_archives: bool):
+    sessions = models.ChatSession.__table__
+    condition = ~exists().where(and_(
+        models.ChatHistory.__table__.c.session_id == sessions.c.session_id,
+        models.ChatHistory.__table__.c.user_id == sessions.c.user_id,
+    ))
+    if has_archives:
+        archives = models.ChatArchive.__table__
+        condition = condition & ~exists().where(and_(
+            archives.c.session_id == sessions.c.session_id, archives.c.user_id == sessions.c.user_id,
+        ))
+    conn.execute(delete(sessions).where(condition))
+
+def _has_archives(conn: Connection) -> bool:
+    # Migration 0004 runs this before 0007 creates chat_archives.
+    return inspect(conn).has_table(models.ChatArchive.__tablename__)
+
+def _archived_sessions(conn: Connection) -> dict:
+    """The archived part of each session, keyed by (session_id, user_id)."""
+    archives = models.ChatArchive.__table__
+    sessions = {}
+    if not _has_archives(conn):
+        return sessions
+    rows = conn.execution_options(stream_results=True, yield_per=BATCH_SIZE).execute(select(archives))
+    for row in rows:
+        first_message = models.unpack_messages(row.messages)[0][2]
+        sessions[(row.session_id, row.user_id)] = {
+            "bot_id": row.bot_id, "first_message": first_message, "message_count": row.message_count,
+            "created_at": row.first_timestamp, "last_updated": row.last_timestamp, "archived_at": row.archived_at,
+        }
+    return sessions
+
+def backfill_chat_sessions(conn: Connection) -> int:
+    """Brings chat_sessions in line with the stored messages; returns the number of sessions written."""
+    history = models.ChatHistory.__table__
+    summaries = models.ChatSummary.__table__
+    last_summarized = dict(conn.execute(select(summaries.c.session_id, summaries.c.created_at)).all())
+    archived = _archived_sessions(conn)
+
+    _delete_empty_sessions(conn, _has_archives(conn))
+    rows = conn.execution_options(stream_results=True, yield_per=BATCH_SIZE).execute(
+        select(history.c.session_id, history.c.user_id, history.c.bot_id, history.c.message, history.c.timestamp)
+        .order_by(history.c.session_id, history.c.user_id, history.c.timestamp)
+    )
+
+    def session_row(session_id, user_id, session):
+        summarized_at = last_summarized.get(session_id)
+        return {
+            "id": uuid.uuid4(), "session_id": session_id, "user_id": user_id, **session,
+            "last_summarized_at": summarized_at,
+            "needs_summary": summarized_at is None or session["last_updated"] > summarized_at,
+        }
+
+    written, batch = 0, []
+    grouped = itertools.groupby(rows, key=lambda row: (row.session_id, row.user_id))
+    for (session_id, user_id), messages in grouped:
+        messages = list(messages)
+        session = {
+            "bot_id": messages[0].bot_id, "first_message": messages[0].message, "message_count": len(messages),
+            "created_at": messages[0].timestamp, "last_updated": messages[-1].timestamp, "archived_at": None,
+        }
+        # Messages written after a session was archived are still in chat_history.
+        archived_part = archived.pop((session_id, user_id), None)
+        if archived_part:
+            session = {
+                **archived_part, "message_count": archived_part["message_count"] + len(messages),
+                "last_updated": max(archived_part["last_updated"], session["last_updated"]),
+            }
+        batch.append(session_row(session_id, user_id, session))
+        if len(batch) >= BATCH_SIZE:
+            _upsert_sessions(conn, batch)
+            written, batch = written + len(batch), []
+    for (session_id, user_id), session in archived.items():
+        batch.append(session_row(session_id, user_id, session))
+        if len(batch) >= BATCH_SIZE:
+            _upsert_sessions(conn, batch)
+            written, batch = written + len(batch), []
+    if batch:
+        _upsert_sessions(conn, batch)
+        written += len(batch)
+    return written
+
+if __name__ == "__main__":
+    from .session import engine
+
+    with engine.begin() as conn:
+        count = backfill_chat_sessions(conn)
+    print(f"Rebuilt chat_sessions with {count} session(s).")
@@ -3,110 +3,442 @@ from sqlalchemy.orm import Session
 import uuid
 from . import models
 from app.schemas.user import UserCreate
-from app.core.security import get_password_hash
-from sqlalchemy import func, desc 
+from app.core import identity_cache
+from sqlalchemy import and_, or_, func, desc, insert, update, bindparam, select, true
 
 def get_user_by_email_and_bot(db: Session, email: str, bot_id: uuid.UUID | None):
     return db.query(models.User).filter(models.User.email == email, models.User.bot_id == bot_id).first()
 
-def create_user(db: Session, user: UserCreate, bot_id: uuid.UUID | None = None):
-    hashed_password = get_password_hash(user.password)
+def get_admin_user_by_email(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email, models.User.bot_id == None).first()
+
+def create_user(db: Session, user: UserCreate, hashed_password: str, bot_id: uuid.UUID | None = None):
     db_user = models.User(email=user.email, hashed_password=hashed_password, bot_id=bot_id)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    identity_cache.invalidate_user(db_user.email, db_user.bot_id)
     return db_user
 
+def update_user_password_hash(db: Session, user: models.User, hashed_password: str):
+    db.query(models.User).filter(models.User.id == user.id).update(
+        {models.User.hashed_password: hashed_password}, synchronize_session=False
+    )
+    db.commit()
+    identity_cache.invalidate_user(user.email, user.bot_id)
+
 def get_bot(db: Session, bot_id: uuid.UUID):
     return db.query(models.Bot).filter(models.Bot.id == bot_id).first()
 
 def get_bots_by_owner(db: Session, owner_id: uuid.UUID):
     return db.query(models.Bot).filter(models.Bot.owner_id == owner_id).all()
 
-def create_bot(db: Session, name: str, faqs_data: list, owner_id: uuid.UUID):
-    db_bot = models.Bot(name=name, faqs=faqs_data, owner_id=owner_id)
+def get_all_bots(db: Session):
+    return db.query(models.Bot).all()
+
+def create_bot(db: Session, name: str, owner_id: uuid.UUID, retrieval_backend: str = "exact",
+               prompt_token_budget: int | None = None, commit: bool = True):
+    """With commit=False the bot is only flushed, so its FAQs can be ingested in the same transaction."""
+    db_bot = models.Bot(
+        name=name, owner_id=owner_id, retrieval_backend=retrieval_backend,
+        prompt_token_budget=prompt_token_budget, faqs_hash=models.faqs_content_hash([]),
+    )
     db.add(db_bot)
+    if not commit:
+        db.flush()
+        return db_bot
     db.commit()
     db.refresh(db_bot)
     return db_bot
 
-def get_chat_history(db: Session, session_id: str, bot_id: uuid.UUID, user_id: uuid.UUID, limit: int = 6):
-    return db.query(models.ChatHistory).filter(
-        models.ChatHistory.session_id == session_id, 
-        models.ChatHistory.bot_id == bot_id, 
-        models.ChatHistory.user_id == user_id
-        ).order_by(models.ChatHistory.timestamp.desc()).limit(limit).all()[::-1]
+def update_bot_settings(db: Session, bot: models.Bot, changes: dict):
+    """Sets the given settings columns; those not in changes keep their value."""
+    for name, value in changes.items():
+        setattr(bot, name, value)
+    db.commit()
+    db.refresh(bot)
+    identity_cache.invalidate_bot(bot.id)
+    return bot
+
+def _dialect_insert(db: Session):
+    """INSERT construct of the bound dialect, for ON CONFLICT upserts."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert
+
+def get_faqs_for_bot(db: Session, bot_id: uuid.UUID):
+    return db.query(
+        models.FAQ.id, models.FAQ.question, models.FAQ.answer, models.FAQ.embedding
+    ).filter(models.FAQ.bot_id == bot_id).order_by(models.FAQ.position).all()
+
+def count_faqs(db: Session, bot_id: uuid.UUID) -> int:
+    return db.query(func.count()).select_from(models.FAQ).filter(models.FAQ.bot_id == bot_id).scalar()
+
+def get_next_faq_position(db: Session, bot_id: uuid.UUID) -> int:
+    return (db.query(func.max(models.FAQ.position)).filter(models.FAQ.bot_id == bot_id).scalar() or 0) + 1
+
+def upsert_faqs(db: Session, bot_id: uuid.UUID, faqs: list[dict], embeddings: list[bytes | None], start_position: int):
+    """
+    Inserts FAQs, or updates the answer and embedding of those whose question already exists
+    for the bot (they keep their position). Does not commit.
+    """
+    rows = {}
+    for offset, (faq, embedding) in enumerate(zip(faqs, embeddings)):
+        # A question repeated within the batch is a single upsert target: the last answer wins,
+        # at the first occurrence's position.
+        key = models.question_hash(faq["question"])
+        rows[key] = {
+            "id": uuid.uuid4(), "bot_id": bot_id, "position": rows[key]["position"] if key in rows else start_position + offset,
+            "question": faq["question"], "question_hash": key, "answer": faq["answer"],
+            "embedding": embedding, "updated_at": datetime.datetime.utcnow(),
+        }
+    if not rows:
+        return
+    statement = _dialect_insert(db)(models.FAQ.__table__).values(list(rows.values()))
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["bot_id", "question_hash"],
+        set_={
+            "answer": statement.excluded.answer,
+            "embedding": statement.excluded.embedding,
+            "updated_at": statement.excluded.updated_at,
+        }
+    ))
+
+def get_bots_with_unembedded_faqs(db: Session):
+    """Bots with at least one FAQ stored without an embedding."""
+    return db.query(models.Bot).filter(
+        models.Bot.id.in_(select(models.FAQ.bot_id).where(models.FAQ.embedding == None))
+    ).all()
+
+def update_faq_embeddings(db: Session, embeddings: dict[uuid.UUID, bytes]):
+    """Stores lazily computed embeddings for FAQs that were saved without one."""
+    if not embeddings:
+        return
+    table = models.FAQ.__table__
+    db.execute(
+        update(table).where(table.c.id == bindparam("faq_id"), table.c.embedding == None).values(embedding=bindparam("new_embedding")),
+        [{"faq_id": faq_id, "new_embedding": embedding} for faq_id, embedding in embeddings.items()]
+    )
+    db.commit()
+
+def set_bot_faqs_hash(db: Session, bot_id: uuid.UUID, faqs_hash: str):
+    """Records a new version of the bot's FAQs and commits the FAQ changes made before it."""
+    db.query(models.Bot).filter(models.Bot.id == bot_id).update({models.Bot.faqs_hash: faqs_hash}, synchronize_session=False)
+    db.commit()
+    identity_cache.invalidate_bot(bot_id)
+
+def get_chat_context(db: Session, session_id: str, bot_id: uuid.UUID, user_id: uuid.UUID, limit: int):
+    """
+    Returns the session's rolling summary and the messages not yet folded into it (at most the
+    last `limit`, oldest first), in one query.
+    """
+    rows = db.query(models.ChatHistory, models.ChatSession.history_summary).outerjoin(
+        models.ChatSession,
+        and_(models.ChatSession.session_id == models.ChatHistory.session_id, models.ChatSession.user_id == models.ChatHistory.user_id),
+    ).filter(
+        models.ChatHistory.session_id == session_id,
+        models.ChatHistory.bot_id == bot_id,
+        models.ChatHistory.user_id == user_id,
+        or_(models.ChatSession.history_summary_upto.is_(None), models.ChatHistory.timestamp > models.ChatSession.history_summary_upto),
+    ).order_by(models.ChatHistory.timestamp.desc()).limit(limit).all()
+    return [message for message, _ in reversed(rows)], (rows[0][1] if rows else None)
+
+def get_messages_to_summarize(db: Session, session_id: str, user_id: uuid.UUID, keep_recent: int):
+    """
+    Returns the session's rolling summary, the timestamp it covers messages up to, and the
+    messages after that which have aged out of the last keep_recent; None for unknown sessions.
+    """
+    chat_session = db.query(models.ChatSession).filter(
+        models.ChatSession.session_id == session_id, models.ChatSession.user_id == user_id
+    ).first()
+    if chat_session is None:
+        return None
+    query = db.query(models.ChatHistory).filter(
+        models.ChatHistory.session_id == session_id, models.ChatHistory.user_id == user_id
+    )
+    if chat_session.history_summary_upto is not None:
+        query = query.filter(models.ChatHistory.timestamp > chat_session.history_summary_upto)
+    messages = query.order_by(models.ChatHistory.timestamp.asc()).all()
+    return chat_session.history_summary, chat_session.history_summary_upto, messages[:max(0, len(messages) - keep_recent)]
+
+def save_rolling_summary(db: Session, session_id: str, user_id: uuid.UUID, summary: str,
+                         upto: datetime.datetime, previous_upto: datetime.datetime | None) -> bool:
+    """Stores a new rolling summary unless another update has replaced previous_upto meanwhile."""
+    covered = models.ChatSession.history_summary_upto
+    updated = db.query(models.ChatSession).filter(
+        models.ChatSession.session_id == session_id,
+        models.ChatSession.user_id == user_id,
+        covered.is_(None) if previous_upto is None else covered == previous_upto,
+    ).update({models.ChatSession.history_summary: summary, covered: upto}, synchronize_session=False)
+    db.commit()
+    return updated > 0
+
+def _archived_messages(archive: models.ChatArchive) -> list[models.ChatHistory]:
+    """Unpacks an archived session into transient (never persisted) ChatHistory objects, oldest first."""
+    return [
+        models.ChatHistory(
+            id=message_id, session_id=archive.session_id, bot_id=archive.bot_id, user_id=archive.user_id,
+            role=role, message=message, timestamp=timestamp,
+        )
+        for message_id, role, message, timestamp in models.unpack_messages(archive.messages)
+    ]
+
+def _get_archived_messages(db: Session, session_id: str, user_id: uuid.UUID) -> list[models.ChatHistory]:
+    archive = db.query(models.ChatArchive).filter(
+        models.ChatArchive.session_id == session_id, models.ChatArchive.user_id == user_id
+    ).first()
+    return _archived_messages(archive) if archive else []
+
+def _message_order(message: models.ChatHistory):
+    return message.timestamp, message.id
 
 def get_full_chat_history_by_session(db: Session, session_id: str, user_id: uuid.UUID):
-    return db.query(models.ChatHistory).filter(
+    """The session's messages oldest first, archived ones included."""
+    messages = db.query(models.ChatHistory).filter(
         models.ChatHistory.session_id == session_id,
         models.ChatHistory.user_id == user_id
-    ).order_by(models.ChatHistory.timestamp.asc()).all() 
+    ).order_by(models.ChatHistory.timestamp.asc()).all()
+    archived = _get_archived_messages(db, session_id, user_id)
+    return sorted(archived + messages, key=_message_order) if archived else messages
 
-def get_user_chat_sessions(db: Session, user_id: uuid.UUID, bot_id: uuid.UUID):
-    sessions = db.query(
-        models.ChatHistory.session_id,
-        func.min(models.ChatHistory.message).label('first_message'),
-        func.max(models.ChatHistory.timestamp).label('last_updated')
-    ).filter(
+def _after(timestamp_column, id_column, after: tuple | None, descending: bool = False):
+    """
+    Keyset condition for rows after the (timestamp, id) cursor in (timestamp, id) order. The
+    redundant range on the timestamp alone lets the index seek instead of filtering from the start.
+    """
+    if after is None:
+        return true()
+    timestamp, row_id = after
+    if descending:
+        return and_(timestamp_column <= timestamp, or_(timestamp_column < timestamp, id_column < row_id))
+    return and_(timestamp_column >= timestamp, or_(timestamp_column > timestamp, id_column > row_id))
+
+def get_chat_history_page(db: Session, session_id: str, user_id: uuid.UUID, limit: int | None, after: tuple | None = None):
+    """
+    Up to limit (every when None) messages of a session in (timestamp, id) order, after the (timestamp, id) cursor,
+    archived ones included.
+    """
+    messages = db.query(models.ChatHistory).filter(
+        models.ChatHistory.session_id == session_id,
         models.ChatHistory.user_id == user_id,
-        models.ChatHistory.bot_id == bot_id
-    ).group_by(
-        models.ChatHistory.session_id
-    ).order_by(
-        desc('last_updated')
+        _after(models.ChatHistory.timestamp, models.ChatHistory.id, after),
+    ).order_by(models.ChatHistory.timestamp.asc(), models.ChatHistory.id.asc()).limit(limit).all()
+    archived = [m for m in _get_archived_messages(db, session_id, user_id) if after is None or _message_order(m) > after]
+    return sorted(archived + messages, key=_message_order)[:limit] if archived else messages
+
+def get_full_chat_histories_for_sessions(db: Session, sessions: list[tuple[str, uuid.UUID]]):
+    """
+    Loads the full history of many (session_id, user_id) pairs, archived messages included, in
+    two queries; keyed by pair.
+    """
+    histories = {}
+    if not sessions:
+        return histories
+    # Separate IN lists can be served by the (session_id, user_id, timestamp) index; a row-value
+    # IN over both columns is not on every backend. Pairs outside the request are dropped below.
+    wanted = set(sessions)
+    messages = db.query(models.ChatHistory).filter(
+        models.ChatHistory.session_id.in_({session_id for session_id, _ in wanted}),
+        models.ChatHistory.user_id.in_({user_id for _, user_id in wanted})
+    ).order_by(models.ChatHistory.session_id, models.ChatHistory.timestamp.asc()).all()
+    for message in messages:
+        key = (message.session_id, message.user_id)
+        if key in wanted:
+            histories.setdefault(key, []).append(message)
+    archives = db.query(models.ChatArchive).filter(
+        models.ChatArchive.session_id.in_({session_id for session_id, _ in wanted}),
+        models.ChatArchive.user_id.in_({user_id for _, user_id in wanted})
     ).all()
-    return sessions
+    for archive in archives:
+        key = (archive.session_id, archive.user_id)
+        if key in wanted:
+            histories[key] = sorted(_archived_messages(archive) + histories.get(key, []), key=_message_order)
+    return histories
+
+def get_user_chat_sessions(db: Session, user_id: uuid.UUID, bot_id: uuid.UUID, limit: int | None, after: tuple | None = None):
+    """Up to limit (every when None) sessions, most recently updated first, after the (last_updated, id) cursor."""
+    return db.query(
+        models.ChatSession.id,
+        models.ChatSession.session_id,
+        models.ChatSession.first_message,
+        models.ChatSession.last_updated
+    ).filter(
+        models.ChatSession.user_id == user_id,
+        models.ChatSession.bot_id == bot_id,
+        _after(models.ChatSession.last_updated, models.ChatSession.id, after, descending=True),
+    ).order_by(
+        desc(models.ChatSession.last_updated), desc(models.ChatSession.id)
+    ).limit(limit).all()
+
+def _upsert_chat_sessions(db: Session, rows: list[dict]):
+    """Creates each session's metadata row, or bumps its counters if it already exists. One row per (session_id, user_id)."""
+    table = models.ChatSession.__table__
+    statement = _dialect_insert(db)(table).values([
+        {**row, "id": uuid.uuid4(), "created_at": row["last_updated"], "needs_summary": True} for row in rows
+    ])
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.session_id, table.c.user_id],
+        set_={
+            "message_count": table.c.message_count + statement.excluded.message_count,
+            "last_updated": statement.excluded.last_updated,
+            "needs_summary": True,
+        }
+    ))
 
-def create_chat_message(db: Session, session_id: str, bot_id: uuid.UUID, user_id: uuid.UUID, role: str, message: str):
-    db_message = models.ChatHistory(session_id=session_id, bot_id=bot_id, user_id=user_id, role=role, message=message)
-    db.add(db_message)
+def create_chat_turns(db: Session, turns: list[dict]):
+    """
+    Persists chat turns (dicts with session_id, bot_id, user_id, user_message, bot_message and
+    timestamp) with one bulk insert per table and a single commit. Turns are either all
+    written or none are, so a user message is never stored without its reply.
+    """
+    if not turns:
+        return
+    messages, sessions = [], {}
+    for turn in turns:
+        key = (turn["session_id"], turn["user_id"])
+        # The reply is stamped a microsecond later so ordering by timestamp keeps the pair in order.
+        for offset, role, message in ((0, "user", turn["user_message"]), (1, "bot", turn["bot_message"])):
+            messages.append({
+                "id": uuid.uuid4(), "session_id": turn["session_id"], "bot_id": turn["bot_id"], "user_id": turn["user_id"],
+                "role": role, "message": message, "timestamp": turn["timestamp"] + datetime.timedelta(microseconds=offset),
+            })
+        if key in sessions:
+            sessions[key]["message_count"] += 2
+            sessions[key]["last_updated"] = max(sessions[key]["last_updated"], messages[-1]["timestamp"])
+        else:
+            sessions[key] = {
+                "session_id": turn["session_id"], "bot_id": turn["bot_id"], "user_id": turn["user_id"],
+                "first_message": turn["user_message"], "message_count": 2, "last_updated": messages[-1]["timestamp"],
+            }
+    db.execute(insert(models.ChatHistory), messages)
+    _upsert_chat_sessions(db, list(sessions.values()))
     db.commit()
-    db.refresh(db_message)
-    return db_message
 
 def get_unsummarized_sessions(db: Session, bot_id: uuid.UUID):
     """
     Finds chat sessions for a bot that are either entirely new or have been updated
     since they were last summarized.
     """
-    latest_history = db.query(
-        models.ChatHistory.session_id,
-        func.max(models.ChatHistory.timestamp).label("last_message_time")
-    ).filter(models.ChatHistory.bot_id == bot_id).group_by(models.ChatHistory.session_id).subquery()
-
-    existing_summaries = db.query(
-        models.ChatSummary.session_id,
-        models.ChatSummary.created_at
-    ).filter(models.ChatSummary.bot_id == bot_id).subquery()
-
-    sessions_to_process = db.query(
-        latest_history.c.session_id,
-        models.User.id.label("user_id") 
-    ).join(
-        models.ChatHistory, latest_history.c.session_id == models.ChatHistory.session_id
-    ).join(
-        models.User, models.ChatHistory.user_id == models.User.id
-    ).outerjoin(
-        existing_summaries, latest_history.c.session_id == existing_summaries.c.session_id
+    return db.query(
+        models.ChatSession.session_id,
+        models.ChatSession.user_id
     ).filter(
-        (existing_summaries.c.session_id == None) | (latest_history.c.last_message_time > existing_summaries.c.created_at)
-    ).distinct().all()
-    
-    return sessions_to_process
-
-def create_chat_summary(db: Session, bot_id: uuid.UUID, session_id: str, summary_text: str):
-    """Creates a new summary or updates an existing one for a given session."""
-    db_summary = db.query(models.ChatSummary).filter_by(session_id=session_id).first()
-    if db_summary:
-        db_summary.summary_text = summary_text
-        db_summary.created_at = datetime.datetime.utcnow()
-    else:
-        db_summary = models.ChatSummary(bot_id=bot_id, session_id=session_id, summary_text=summary_text)
-        db.add(db_summary)
+        models.ChatSession.bot_id == bot_id,
+        models.ChatSession.needs_summary == True
+    ).all()
+
+def mark_sessions_summarized(db: Session, bot_id: uuid.UUID, session_ids: list[str], summarized_at: datetime.datetime):
+    """Sessions that received messages after summarized_at stay marked as needing a summary."""
+    db.query(models.ChatSession).filter(
+        models.ChatSession.bot_id == bot_id,
+        models.ChatSession.session_id.in_(session_ids)
+    ).update({
+        models.ChatSession.last_summarized_at: summarized_at,
+        models.ChatSession.needs_summary: models.ChatSession.last_updated > summarized_at,
+    }, synchronize_session=False)
+
+def upsert_chat_summaries(db: Session, bot_id: uuid.UUID, summaries: dict[str, str], summarized_at: datetime.datetime):
+    """
+    Creates or updates the summaries for many sessions with a single lookup and commit.
+    summarized_at should be taken before the histories were loaded, so messages that
+    arrive while summarising still mark the session as unsummarized.
+    """
+    if not summaries:
+        return
+    existing = {
+        s.session_id: s for s in
+        db.query(models.ChatSummary).filter(models.ChatSummary.session_id.in_(list(summaries))).all()
+    }
+    for session_id, summary_text in summaries.items():
+        db_summary = existing.get(session_id)
+        if db_summary:
+            db_summary.summary_text = summary_text
+            db_summary.created_at = summarized_at
+        else:
+            db.add(models.ChatSummary(bot_id=bot_id, session_id=session_id, summary_text=summary_text, created_at=summarized_at))
+    mark_sessions_summarized(db, bot_id, list(summaries), summarized_at)
     db.commit()
-    db.refresh(db_summary)
-    return db_summary
+
+def get_summaries_fingerprint(db: Session, bot_id: uuid.UUID):
+    """(count, latest created_at) of a bot's summaries; changes whenever one is added or updated."""
+    return tuple(db.query(
+        func.count(),
+        func.max(models.ChatSummary.created_at)
+    ).filter(models.ChatSummary.bot_id == bot_id).one())
 
 def get_all_summaries_for_bot(db: Session, bot_id: uuid.UUID):
     return db.query(models.ChatSummary).filter(models.ChatSummary.bot_id == bot_id).all()
+
+def get_summaries_page(db: Session, bot_id: uuid.UUID, limit: int | None, after: tuple | None = None):
+    """Up to limit (every when None) summaries of a bot in (created_at, id) order, after the (created_at, id) cursor."""
+    return db.query(models.ChatSummary).filter(
+        models.ChatSummary.bot_id == bot_id,
+        _after(models.ChatSummary.created_at, models.ChatSummary.id, after),
+    ).order_by(models.ChatSummary.created_at.asc(), models.ChatSummary.id.asc()).limit(limit).all()
+
+def select_summaries_for_export(bot_id: uuid.UUID):
+    """A bot's summaries as plain rows in (created_at, id) order, for streaming with AsyncSession.stream."""
+    return select(
+        models.ChatSummary.session_id, models.ChatSummary.summary_text, models.ChatSummary.created_at
+    ).where(models.ChatSummary.bot_id == bot_id).order_by(models.ChatSummary.created_at.asc(), models.ChatSummary.id.asc())
+
+def get_sessions_to_archive(db: Session, bot_id: uuid.UUID, idle_before: datetime.datetime, limit: int):
+    """Up to limit (session_id, user_id) pairs of a bot's sessions idle since before idle_before and not archived since."""
+    return db.query(models.ChatSession.session_id, models.ChatSession.user_id).filter(
+        models.ChatSession.bot_id == bot_id,
+        models.ChatSession.last_updated < idle_before,
+        or_(models.ChatSession.archived_at.is_(None), models.ChatSession.archived_at < models.ChatSession.last_updated),
+    ).limit(limit).all()
+
+def archive_sessions(db: Session, bot_id: uuid.UUID, sessions: list[tuple[str, uuid.UUID]], archived_at: datetime.datetime):
+    """
+    Moves the sessions' messages from chat_history into one compressed chat_archives row per
+    session, merged with what was archived before, in a single transaction. Messages written
+    meanwhile stay in chat_history; reads merge the two.
+    """
+    histories = get_full_chat_histories_for_sessions(db, sessions)
+    rows = [
+        {
+            "id": uuid.uuid4(), "session_id": session_id, "bot_id": bot_id, "user_id": user_id,
+            "message_count": len(messages), "first_timestamp": messages[0].timestamp,
+            "last_timestamp": messages[-1].timestamp, "messages": models.pack_messages(messages), "archived_at": archived_at,
+        }
+        for (session_id, user_id), messages in histories.items()
+    ]
+    if rows:
+        table = models.ChatArchive.__table__
+        statement = _dialect_insert(db)(table).values(rows)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.session_id, table.c.user_id],
+            set_={name: statement.excluded[name] for name in ("message_count", "first_timestamp", "last_timestamp", "messages", "archived_at")},
+        ))
+    for session_id, user_id in sessions:
+        messages = histories.get((session_id, user_id))
+        if messages:
+            db.query(models.ChatHistory).filter(
+                models.ChatHistory.session_id == session_id,
+                models.ChatHistory.user_id == user_id,
+                models.ChatHistory.timestamp <= messages[-1].timestamp,
+            ).delete(synchronize_session=False)
+        db.query(models.ChatSession).filter(
+            models.ChatSession.session_id == session_id, models.ChatSession.user_id == user_id
+        ).update({models.ChatSession.archived_at: archived_at}, synchronize_session=False)
+    db.commit()
+
+def get_expired_sessions(db: Session, bot_id: uuid.UUID, idle_before: datetime.datetime, limit: int):
+    """Up to limit (session_id, user_id) pairs of a bot's sessions idle since before idle_before."""
+    return db.query(models.ChatSession.session_id, models.ChatSession.user_id).filter(
+        models.ChatSession.bot_id == bot_id, models.ChatSession.last_updated < idle_before
+    ).limit(limit).all()
+
+def delete_sessions(db: Session, bot_id: uuid.UUID, sessions: list[tuple[str, uuid.UUID]]):
+    """Deletes the sessions' messages, archives, summaries and metadata in a single transaction."""
+    for session_id, user_id in sessions:
+        for model in (models.ChatHistory, models.ChatArchive, models.ChatSession):
+            db.query(model).filter(model.session_id == session_id, model.user_id == user_id).delete(synchronize_session=False)
+    db.query(models.ChatSummary).filter(
+        models.ChatSummary.bot_id == bot_id, models.ChatSummary.session_id.in_({session_id for session_id, _ in sessions})
+    ).delete(synchronize_session=False)
+    db.commit()
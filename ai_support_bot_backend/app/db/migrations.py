@@ -0,0 +1,206 @@
+"""
+Minimal forward-only schema migrations.
+
+Each migration is applied once, in order, inside its own transaction, and recorded in the
+schema_migrations table. Migrations must be idempotent: on a fresh database the initial
+create_all already produces the current schema, and later steps only fill in what an
+older database is missing.
+
+Run with `python -m app.db.migrations`; the application also applies them on startup.
+"""
+import uuid
+import datetime
+import itertools
+from sqlalchemy import (
+    JSON, Boolean, Column, DateTime, ForeignKey, Index, Integer, LargeBinary, MetaData, String, Table, UniqueConstraint,
+    column, delete, insert, inspect, select, table, update,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.engine import Connection, Engine
+from . import models
+
+_migrations_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _migrations_metadata,
+    Column("version", String, primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Tables as they were when the migrations using them were written, so that later model changes
+# can't alter what an old migration does. Never created as a whole.
+_legacy_metadata = MetaData()
+_legacy_users = Table("users", _legacy_metadata, Column("id", UUID(as_uuid=True), primary_key=True))
+_legacy_bots = Table(
+    "bots",
+    _legacy_metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("faqs_hash", String(64), nullable=True),
+    Column("faq_embeddings", LargeBinary, nullable=True),
+    Column("retrieval_backend", String, nullable=False, server_default="exact"),
+)
+_legacy_chat_sessions = Table(
+    "chat_sessions",
+    _legacy_metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("session_id", String, nullable=False),
+    Column("bot_id", UUID(as_uuid=True), ForeignKey("bots.id"), nullable=False),
+    Column("user_id", UUID(as_uuid=True), ForeignKey("users.id"), nullable=False),
+    Column("first_message", String, nullable=False),
+    Column("message_count", Integer, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("last_updated", DateTime, nullable=False),
+    Column("last_summarized_at", DateTime, nullable=True),
+    Column("needs_summary", Boolean, nullable=False),
+    UniqueConstraint("session_id", "user_id", name="_chat_session_user_uc"),
+    Index("ix_chat_sessions_user_bot_updated", "user_id", "bot_id", "last_updated"),
+    Index("ix_chat_sessions_bot_needs_summary", "bot_id", "needs_summary"),
+)
+
+def _add_missing_columns(conn: Connection, table: Table, column_names: list[str]):
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        ddl = f"ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(dialect=conn.dialect)}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT '{column.server_default.arg}'"
+        if not column.nullable:
+            ddl += " NOT NULL"
+        conn.exec_driver_sql(ddl)
+
+def _create_indexes(conn: Connection, table: Table, index_names: list[str]):
+    for index in table.indexes:
+        if index.name in index_names:
+            index.create(conn, checkfirst=True)
+
+def _drop_index(conn: Connection, table: Table, index_name: str, *columns: str):
+    Index(index_name, *(table.c[column] for column in columns)).drop(conn, checkfirst=True)
+
+def _0001_initial_schema(conn: Connection):
+    models.Base.metadata.create_all(bind=conn)
+
+def _0002_bot_faq_index_columns(conn: Connection):
+    _add_missing_columns(conn, _legacy_bots, ["faqs_hash", "faq_embeddings", "retrieval_backend"])
+
+def _0003_chat_history_composite_indexes(conn: Connection):
+    _create_indexes(conn, models.ChatHistory.__table__, ["ix_chat_history_session_user_ts", "ix_chat_history_user_bot_session_ts"])
+    _create_indexes(conn, models.ChatSummary.__table__, ["ix_chat_summaries_bot_created"])
+    # Superseded by ix_chat_history_session_user_ts, which has session_id as its prefix.
+    _drop_index(conn, models.ChatHistory.__table__, "ix_chat_history_session_id", "session_id")
+
+def _0004_chat_sessions(conn: Connection):
+    """Creates chat_sessions and fills it from chat_history; app.db.backfill is the re-runnable repair."""
+    sessions = _legacy_chat_sessions
+    sessions.create(conn, checkfirst=True)
+    history = table(
+        "chat_history", column("session_id", String), column("user_id", UUID(as_uuid=True)),
+        column("bot_id", UUID(as_uuid=True)), column("message", String), column("timestamp", DateTime),
+    )
+    summaries = table("chat_summaries", column("session_id", String), column("created_at", DateTime))
+    last_summarized = dict(conn.execute(select(summaries.c.session_id, summaries.c.created_at)).all())
+
+    conn.execute(delete(sessions))
+    batch_size = 5000
+    rows = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+        select(history.c.session_id, history.c.user_id, history.c.bot_id, history.c.message, history.c.timestamp)
+        .order_by(history.c.session_id, history.c.user_id, history.c.timestamp)
+    )
+    batch = []
+    for (session_id, user_id), messages in itertools.groupby(rows, key=lambda row: (row.session_id, row.user_id)):
+        messages = list(messages)
+        summarized_at = last_summarized.get(session_id)
+        batch.append({
+            "id": uuid.uuid4(), "session_id": session_id, "bot_id": messages[0].bot_id, "user_id": user_id,
+            "first_message": messages[0].message, "message_count": len(messages),
+            "created_at": messages[0].timestamp, "last_updated": messages[-1].timestamp,
+            "last_summarized_at": summarized_at,
+            "needs_summary": summarized_at is None or messages[-1].timestamp > summarized_at,
+        })
+        if len(batch) >= batch_size:
+            conn.execute(insert(sessions), batch)
+            batch = []
+    if batch:
+        conn.execute(insert(sessions), batch)
+
+def _0005_faqs_table(conn: Connection):
+    """
+    Moves each bot's FAQ JSON into faqs rows. A repeated question becomes one row with the
+    last answer at the first occurrence's position, as it would when uploaded today. Embeddings
+    are left NULL here and computed after startup (see faq_index.embed_missing_faqs).
+    """
+    models.FAQ.__table__.create(conn, checkfirst=True)
+    bot_columns = {column["name"] for column in inspect(conn).get_columns("bots")}
+    if "faqs" not in bot_columns:
+        return
+    legacy_bots = table("bots", column("id", models.Bot.__table__.c.id.type), column("faqs", JSON), column("faqs_hash", String))
+    # One bot at a time: a bot's FAQ JSON can be large.
+    for bot_id in conn.execute(select(legacy_bots.c.id)).scalars().all():
+        faqs, faqs_hash = conn.execute(
+            select(legacy_bots.c.faqs, legacy_bots.c.faqs_hash).where(legacy_bots.c.id == bot_id)
+        ).one()
+        faqs = faqs or []
+        rows = {}
+        for position, faq in enumerate(faqs, start=1):
+            key = models.question_hash(faq["question"])
+            rows[key] = {
+                "id": uuid.uuid4(), "bot_id": bot_id, "position": rows[key]["position"] if key in rows else position,
+                "question": faq["question"], "question_hash": key, "answer": faq["answer"],
+                "embedding": None, "updated_at": datetime.datetime.utcnow(),
+            }
+        if rows:
+            conn.execute(insert(models.FAQ.__table__), list(rows.values()))
+        if faqs_hash is None:
+            conn.execute(update(legacy_bots).where(legacy_bots.c.id == bot_id).values(faqs_hash=models.faqs_content_hash(faqs)))
+    for name in ("faqs", "faq_embeddings"):
+        if name in bot_columns:
+            conn.exec_driver_sql(f"ALTER TABLE bots DROP COLUMN {name}")
+
+def _0006_prompt_budget_and_rolling_summary(conn: Connection):
+    _add_missing_columns(conn, models.Bot.__table__, ["prompt_token_budget"])
+    _add_missing_columns(conn, models.ChatSession.__table__, ["history_summary", "history_summary_upto"])
+
+def _0007_chat_archives(conn: Connection):
+    _add_missing_columns(conn, models.Bot.__table__, ["archive_after_days", "retention_days"])
+    _add_missing_columns(conn, models.ChatSession.__table__, ["archived_at"])
+    _create_indexes(conn, models.ChatSession.__table__, ["ix_chat_sessions_bot_updated"])
+    models.ChatArchive.__table__.create(conn, checkfirst=True)
+
+def _0008_drop_bot_faq_embeddings(conn: Connection):
+    # 0002 adds bots.faq_embeddings and 0005 only drops it from databases that still had FAQ JSON.
+    if "faq_embeddings" in {column["name"] for column in inspect(conn).get_columns("bots")}:
+        conn.exec_driver_sql("ALTER TABLE bots DROP COLUMN faq_embeddings")
+
+MIGRATIONS = [
+    ("0001_initial_schema", _0001_initial_schema),
+    ("0002_bot_faq_index_columns", _0002_bot_faq_index_columns),
+    ("0003_chat_history_composite_indexes", _0003_chat_history_composite_indexes),
+    ("0004_chat_sessions", _0004_chat_sessions),
+    ("0005_faqs_table", _0005_faqs_table),
+    ("0006_prompt_budget_and_rolling_summary", _0006_prompt_budget_and_rolling_summary),
+    ("0007_chat_archives", _0007_chat_archives),
+    ("0008_drop_bot_faq_embeddings", _0008_drop_bot_faq_embeddings),
+]
+
+def run_migrations(engine: Engine) -> list[str]:
+    """Applies all pending migrations and returns the versions that were applied."""
+    _migrations_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        applied = set(conn.execute(schema_migrations.select().with_only_columns(schema_migrations.c.version)).scalars())
+
+    newly_applied = []
+    for version, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(version=version, applied_at=datetime.datetime.utcnow()))
+        newly_applied.append(version)
+    return newly_applied
+
+if __name__ == "__main__":
+    from .session import engine
+
+    versions = run_migrations(engine)
+    print(f"Applied {len(versions)} migration(s): {', '.join(versions)}" if versions else "Database schema is up to date.")
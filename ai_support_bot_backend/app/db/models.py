@@ -1,5 +1,8 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, UniqueConstraint, Text
+import json
+import zlib
+import hashlib
+from sqlalchemy import Column, String, DateTime, ForeignKey, UniqueConstraint, Text, LargeBinary, Index, Integer, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.dialects.postgresql import UUID
@@ -7,6 +10,11 @@ import datetime
 
 Base = declarative_base()
 
+def faqs_content_hash(faqs: list, previous_hash: str | None = None) -> str:
+    """Chains a batch of FAQ changes onto the hash of the bot's previous FAQ set."""
+    payload = json.dumps(faqs, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(((previous_hash or "") + payload).encode("utf-8")).hexdigest()
+
 class User(Base):
     __tablename__ = "users"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -20,17 +28,48 @@ class Bot(Base):
     __tablename__ = "bots"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, index=True, nullable=False)
-    faqs = Column(JSON, nullable=False)
+    # Changes whenever the bot's FAQs do; caches of FAQ-derived data are keyed by it.
+    faqs_hash = Column(String(64), nullable=True)
+    retrieval_backend = Column(String, nullable=False, default="exact", server_default="exact")
+    # Estimated token budget of a chat prompt; PROMPT_TOKEN_BUDGET when null.
+    prompt_token_budget = Column(Integer, nullable=True)
+    # Days of inactivity after which a session is archived / deleted; CHAT_ARCHIVE_AFTER_DAYS
+    # and CHAT_RETENTION_DAYS when null, never when 0.
+    archive_after_days = Column(Integer, nullable=True)
+    retention_days = Column(Integer, nullable=True)
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     owner = relationship("User", foreign_keys=[owner_id])
     users = relationship("User", back_populates="bot", foreign_keys=[User.bot_id])
     chat_history = relationship("ChatHistory", back_populates="bot")
     summaries = relationship("ChatSummary", back_populates="bot")
+    faqs = relationship("FAQ", back_populates="bot", order_by="FAQ.position")
+
+def question_hash(question: str) -> str:
+    return hashlib.sha256(question.encode("utf-8")).hexdigest()
+
+class FAQ(Base):
+    __tablename__ = "faqs"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    bot_id = Column(UUID(as_uuid=True), ForeignKey("bots.id"), nullable=False)
+    # Insertion order; updating an FAQ keeps its position.
+    position = Column(Integer, nullable=False)
+    question = Column(Text, nullable=False)
+    # sha256 of the question; FAQs are upserted by question, and long texts can't be indexed directly.
+    question_hash = Column(String(64), nullable=False)
+    answer = Column(Text, nullable=False)
+    # Raw float32 embedding of the question; NULL until computed.
+    embedding = Column(LargeBinary, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    bot = relationship("Bot", back_populates="faqs")
+    __table_args__ = (
+        UniqueConstraint("bot_id", "question_hash", name="_faq_bot_question_uc"),
+        Index("ix_faqs_bot_position", "bot_id", "position"),
+    )
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    session_id = Column(String, index=True, nullable=False)
+    session_id = Column(String, nullable=False)
     bot_id = Column(UUID(as_uuid=True), ForeignKey("bots.id"))
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     role = Column(String, nullable=False)
@@ -38,6 +77,66 @@ class ChatHistory(Base):
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
     bot = relationship("Bot", back_populates="chat_history")
     user = relationship("User")
+    __table_args__ = (
+        # Session reads (recent turns, full history, bulk summarisation) filter on session and
+        # user and read in timestamp order, so they never sort.
+        Index("ix_chat_history_session_user_ts", "session_id", "user_id", "timestamp"),
+        # Session listing for a user of a bot, grouped by session.
+        Index("ix_chat_history_user_bot_session_ts", "user_id", "bot_id", "session_id", "timestamp"),
+    )
+
+class ChatSession(Base):
+    """Per-session metadata maintained on every chat write, so listings never aggregate chat_history."""
+    __tablename__ = "chat_sessions"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    session_id = Column(String, nullable=False)
+    bot_id = Column(UUID(as_uuid=True), ForeignKey("bots.id"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    first_message = Column(String, nullable=False)
+    message_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    last_updated = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    last_summarized_at = Column(DateTime, nullable=True)
+    # True while last_updated > last_summarized_at; kept as a column so it can be indexed.
+    needs_summary = Column(Boolean, nullable=False, default=True)
+    # Rolling summary of the messages up to history_summary_upto, sent to the LLM in their place.
+    history_summary = Column(Text, nullable=True)
+    history_summary_upto = Column(DateTime, nullable=True)
+    # When the session's messages were last moved to chat_archives.
+    archived_at = Column(DateTime, nullable=True)
+    __table_args__ = (
+        UniqueConstraint("session_id", "user_id", name="_chat_session_user_uc"),
+        Index("ix_chat_sessions_user_bot_updated", "user_id", "bot_id", "last_updated"),
+        Index("ix_chat_sessions_bot_needs_summary", "bot_id", "needs_summary"),
+        # Archival and retention: a bot's sessions idle since before a cutoff.
+        Index("ix_chat_sessions_bot_updated", "bot_id", "last_updated"),
+    )
+
+def pack_messages(messages: list) -> bytes:
+    """Compresses ChatHistory rows, oldest first, into a chat_archives blob."""
+    rows = [[message.id.hex, message.role, message.message, message.timestamp.isoformat()] for message in messages]
+    return zlib.compress(json.dumps(rows, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+def unpack_messages(blob: bytes) -> list[tuple[uuid.UUID, str, str, datetime.datetime]]:
+    return [
+        (uuid.UUID(hex=message_id), role, message, datetime.datetime.fromisoformat(timestamp))
+        for message_id, role, message, timestamp in json.loads(zlib.decompress(blob))
+    ]
+
+class ChatArchive(Base):
+    """The messages of an idle session, moved out of chat_history as one compressed blob."""
+    __tablename__ = "chat_archives"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    session_id = Column(String, nullable=False)
+    bot_id = Column(UUID(as_uuid=True), ForeignKey("bots.id"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    message_count = Column(Integer, nullable=False)
+    first_timestamp = Column(DateTime, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+    # zlib-compressed JSON rows of (id, role, message, timestamp); see pack_messages.
+    messages = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, nullable=False)
+    __table_args__ = (UniqueConstraint("session_id", "user_id", name="_chat_archive_session_user_uc"),)
 
 class ChatSummary(Base):
     __tablename__ = "chat_summaries"
@@ -48,4 +147,5 @@ class ChatSummary(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
     bot = relationship("Bot", back_populates="summaries")
+    __table_args__ = (Index("ix_chat_summaries_bot_created", "bot_id", "created_at"),)
 
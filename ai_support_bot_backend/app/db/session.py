@@ -1,9 +1,54 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from app.core.config import settings
+from app.core.metrics import track_pool
 
-engine = create_engine(settings.DATABASE_URL)
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def to_async_database_url(database_url: str) -> str:
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+def engine_options(database_url: str) -> dict:
+    """Pool settings for an engine. In-memory SQLite uses a per-thread pool that takes no sizing."""
+    url = make_url(database_url)
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+    return {
+        **options,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+
+def _create_engines(database_url: str, async_database_url: str | None, name: str):
+    async_database_url = async_database_url or to_async_database_url(database_url)
+    sync_engine = create_engine(database_url, **engine_options(database_url))
+    async_engine = create_async_engine(async_database_url, **engine_options(async_database_url))
+    track_pool(name, sync_engine, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+    track_pool(f"async_{name}", async_engine.sync_engine, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+    return sync_engine, async_engine
+
+engine, async_engine = _create_engines(settings.DATABASE_URL, settings.ASYNC_DATABASE_URL, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Read-only views that can tolerate replication lag use these; they are the primary without a replica.
+if settings.READ_REPLICA_DATABASE_URL:
+    read_engine, async_read_engine = _create_engines(
+        settings.READ_REPLICA_DATABASE_URL, settings.ASYNC_READ_REPLICA_DATABASE_URL, "replica"
+    )
+else:
+    read_engine, async_read_engine = engine, async_engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False)
 
 def get_db():
     db = SessionLocal()
@@ -11,3 +56,18 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -1,12 +1,70 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.db.session import engine
-from app.db import models
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import exc, text
+from app.db.session import engine, async_engine, async_read_engine, AsyncSessionLocal
+from app.db.migrations import run_migrations
+from app.core import llm, archival, faq_index
+from app.core.llm_providers import get_llm_provider
+from app.core.config import settings
+from app.core.tracing import RequestTracingMiddleware, configure_logging
+from app.core.metrics import DB_POOL_TIMEOUTS
+from app.core.chat_writer import chat_write_buffer
+from app.core.security import shutdown_password_pool
 from app.api.api import api_router
 
-models.Base.metadata.create_all(bind=engine)
+configure_logging(settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Multi-Tenant AI Support Bot")
+async def _warm_up():
+    try:
+        await llm.run_in_embedding_executor(llm.warm_up)
+    except Exception as e:
+        logger.exception(f"Error warming up the embedding model: {e}")
+        raise
+    try:
+        async with AsyncSessionLocal() as db:
+            bots = await faq_index.embed_missing_faqs(db)
+        if bots:
+            logger.info(f"Computed missing FAQ embeddings for {bots} bot(s).")
+    except Exception as e:
+        logger.exception(f"Error computing missing FAQ embeddings: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.RUN_MIGRATIONS_ON_STARTUP:
+        run_migrations(engine)
+    get_llm_provider()
+    # Fail at startup, not on the first request, if the configured backend can't load.
+    llm.check_embedding_backend(settings.EMBEDDING_BACKEND)
+    # Serving starts right away; /ready reports when the embedding model is loaded.
+    app.state.warm_up = asyncio.create_task(_warm_up()) if settings.WARM_UP_ON_STARTUP else None
+    if settings.CHAT_WRITE_BUFFER_ENABLED:
+        chat_write_buffer.start()
+    if settings.EMBEDDING_BATCHING_ENABLED:
+        llm.query_embedding_batcher.start()
+    retention = (
+        asyncio.create_task(archival.run_periodically(settings.CHAT_ARCHIVE_INTERVAL_SECONDS))
+        if settings.CHAT_ARCHIVE_INTERVAL_SECONDS > 0 else None
+    )
+    yield
+    if retention is not None:
+        retention.cancel()
+        await asyncio.gather(retention, return_exceptions=True)
+    if app.state.warm_up is not None:
+        await asyncio.gather(app.state.warm_up, return_exceptions=True)
+    await llm.query_embedding_batcher.stop()
+    await chat_write_buffer.stop()
+    shutdown_password_pool()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+app = FastAPI(title="Multi-Tenant AI Support Bot", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -15,10 +73,59 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], 
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "X-Request-ID"],
 )
+app.add_middleware(RequestTracingMiddleware)
 
 app.include_router(api_router, prefix="/api/v1")
 
+@app.exception_handler(exc.TimeoutError)
+async def database_pool_exhausted(request: Request, error: exc.TimeoutError):
+    # Every pooled connection stayed busy for DB_POOL_TIMEOUT_SECONDS: shed load instead of failing with a 500.
+    DB_POOL_TIMEOUTS.inc()
+    logger.warning(f"Database pool exhausted: {error}")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "The service is busy, please retry shortly."},
+        headers={"Retry-After": "1"},
+    )
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the AI Support Bot API"}
+
+def _embedding_model_state() -> str:
+    warm_up = getattr(app.state, "warm_up", None)
+    if llm.is_embedding_model_loaded():
+        return "warm"
+    if warm_up is None:
+        return "cold"
+    if not warm_up.done():
+        return "warming"
+    return "failed"
+
+@app.get("/ready")
+async def readiness(response: Response):
+    """
+    Readiness probe. The embedding model is "cold" when it will load on first use; with
+    WARM_UP_ON_STARTUP the app only reports ready once it is "warm".
+    """
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        database = "ok"
+    except Exception as e:
+        logger.warning(f"Readiness check could not reach the database: {e}")
+        database = "unavailable"
+
+    embedding_model = _embedding_model_state()
+    ready = database == "ok" and (embedding_model == "warm" or (embedding_model == "cold" and not settings.WARM_UP_ON_STARTUP))
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"ready": ready, "database": database, "embedding_model": embedding_model}
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Prometheus metrics of this process."""
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,5 +1,5 @@
 import uuid
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List
 
 class FAQItem(BaseModel):
@@ -10,6 +10,22 @@ class Bot(BaseModel):
     id: uuid.UUID
     name: str
     owner_id: uuid.UUID
+    retrieval_backend: str
+    prompt_token_budget: int | None = None
+    archive_after_days: int | None = None
+    retention_days: int | None = None
 
     class Config:
         from_attributes = True
+
+class FAQUploadResult(BaseModel):
+    bot_id: uuid.UUID
+    faqs_received: int
+    total_faqs: int
+
+class BotSettingsUpdate(BaseModel):
+    # Estimated tokens per chat prompt; null falls back to the server default.
+    prompt_token_budget: int | None = Field(default=None, ge=500)
+    # Days of inactivity before a session is archived / deleted; 0 never, null the server default.
+    archive_after_days: int | None = Field(default=None, ge=0)
+    retention_days: int | None = Field(default=None, ge=0)
@@ -1,3 +1,4 @@
+import uuid
 from pydantic import BaseModel
 from datetime import datetime
 from typing import List
@@ -35,3 +36,17 @@ class AnalyticsReport(BaseModel):
     trending_topics: List[str]
     unanswered_questions: List[str]
     suggested_new_faqs: List[FAQItem]
+
+class SummaryJobStatus(BaseModel):
+    id: uuid.UUID
+    bot_id: uuid.UUID
+    status: str
+    total_sessions: int
+    processed_sessions: int
+    skipped_sessions: int = 0
+    failed_sessions: List[str] = []
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
+    class Config:
+        from_attributes = True
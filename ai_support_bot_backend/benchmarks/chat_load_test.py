@@ -0,0 +1,97 @@
+"""
+Concurrency load test for POST /chat/{bot_id} against the fake LLM provider with a fixed latency.
+
+With a stubbed LLM latency L, a non-blocking pipeline completes C concurrent chats in
+roughly L seconds, so throughput should grow close to linearly with concurrency.
+
+Run from ai_support_bot_backend/ (uses a throwaway SQLite database unless DATABASE_URL is set):
+    python -m benchmarks.chat_load_test --concurrency 1 10 50 200 --llm-latency-ms 500
+    CHAT_WRITE_BUFFER_ENABLED=true python -m benchmarks.chat_load_test --concurrency 200
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/chat_load_test_{uuid.uuid4().hex}.db")
+os.environ.setdefault("SECRET_KEY", "load-test-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+# One log line per request would swamp the report.
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["LLM_PROVIDER"] = "fake"
+# The stub LLM has no rate limit; don't let the provider concurrency limit cap the pipeline under test.
+os.environ.setdefault("LLM_MAX_CONCURRENCY", "100000")
+
+import httpx
+from app.main import app
+from app.core.llm_providers import get_llm_provider
+
+API = "/api/v1"
+FAQS = [
+    {"question": "What is your return policy?", "answer": "Returns are accepted within 30 days."},
+    {"question": "How long does shipping take?", "answer": "Standard shipping takes 5-7 business days."},
+    {"question": "How can I track my order?", "answer": "You will receive a tracking link by email."},
+]
+
+async def seed(client: httpx.AsyncClient, n_users: int):
+    admin_email = f"admin-{uuid.uuid4().hex[:8]}@example.com"
+    await client.post(f"{API}/auth/admin/register", json={"email": admin_email, "password": "password"})
+    token = (await client.post(f"{API}/auth/admin/login", data={"username": admin_email, "password": "password"})).json()["access_token"]
+    response = await client.post(
+        f"{API}/bots/", data={"name": "load-test-bot"},
+        files={"file": ("faqs.json", json.dumps(FAQS), "application/json")},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    bot_id = response.json()["id"]
+
+    headers = []
+    for i in range(n_users):
+        email = f"user{i}@example.com"
+        await client.post(f"{API}/auth/{bot_id}/register", json={"email": email, "password": "password"})
+        login = await client.post(f"{API}/auth/{bot_id}/login", data={"username": email, "password": "password"})
+        headers.append({"Authorization": f"Bearer {login.json()['access_token']}"})
+    return bot_id, headers
+
+async def run_level(client: httpx.AsyncClient, bot_id: str, headers: list, concurrency: int) -> dict:
+    async def one_chat(i: int):
+        start = time.perf_counter()
+        response = await client.post(
+            f"{API}/chat/{bot_id}",
+            json={"session_id": f"load-{concurrency}-{i}", "message": "How long does shipping take?"},
+            headers=headers[i % len(headers)],
+        )
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(one_chat(i) for i in range(concurrency))))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(concurrency / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+    }
+
+async def main(args):
+    get_llm_provider().provider.latency_s = args.llm_latency_ms / 1000
+    transport = httpx.ASGITransport(app=app)
+    # ASGITransport does not run the app lifespan (migrations, warm-up, write buffer), so run it here.
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+        bot_id, headers = await seed(client, args.users)
+        for concurrency in args.concurrency:
+            print(json.dumps(await run_level(client, bot_id, headers, concurrency)))
+            sys.stdout.flush()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--users", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
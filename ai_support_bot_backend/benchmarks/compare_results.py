@@ -0,0 +1,64 @@
+"""
+Compares two benchmarks.hot_paths result files, e.g. from the base and head commits of a change.
+
+Prints, per scenario, the throughput and p50/p95/p99 latency of both runs and the relative
+change, and exits non-zero when a scenario's throughput dropped or its p95/p99 rose by more
+than --threshold. Both runs should use the same scale, load and machine; the metadata of
+each is printed so mismatches are easy to spot.
+
+Run from ai_support_bot_backend/:
+    python -m benchmarks.compare_results base.json head.json --threshold 0.15
+"""
+import sys
+import json
+import argparse
+
+# (metric, whether higher is better)
+METRICS = (("throughput_rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False))
+# p50 is reported but too sensitive to noise on shared machines to fail a comparison.
+GATED = {"throughput_rps", "p95_ms", "p99_ms"}
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def compare(base: dict, head: dict, threshold: float) -> tuple[list[dict], list[str]]:
+    rows, regressions = [], []
+    head_results = {result["scenario"]: result for result in head["results"]}
+    for base_result in base["results"]:
+        scenario = base_result["scenario"]
+        head_result = head_results.get(scenario)
+        if head_result is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            before, after = base_result.get(metric), head_result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            rows.append({"scenario": scenario, "metric": metric, "base": before, "head": after, "change": round(change, 3)})
+            worse = -change if higher_is_better else change
+            if metric in GATED and worse > threshold:
+                regressions.append(f"{scenario} {metric}: {before} -> {after} ({change:+.1%})")
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    base, head = load(args.base), load(args.head)
+    for label, run in (("base", base), ("head", head)):
+        meta = run["metadata"]
+        print(json.dumps({"run": label, "commit": meta["commit"], "dirty": meta["dirty"], "database": meta["database"],
+                          "scale": meta["scale"], "load": meta["load"]}))
+    rows, regressions = compare(base, head, args.threshold)
+    for row in rows:
+        print(json.dumps(row))
+    if regressions:
+        print("Regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Throughput, latency, memory and agreement of the embedding backends (EMBEDDING_BACKEND).
+
+Each backend is loaded in a fresh interpreter, which reports load time, peak RSS, FAQ batch
+encoding throughput and single-query latency. Agreement is measured against the first backend
+listed (the reference, normally torch): the cosine similarity of the query embeddings, and the
+share of queries for which semantic retrieval picks the same FAQs, both with FAQs encoded by the
+backend itself and with FAQs encoded by the reference, as happens when the backend changes but
+the embeddings stored in the database don't.
+
+Run from ai_support_bot_backend/ (the onnx/openvino backends need sentence-transformers[onnx]
+/ [openvino]):
+    python -m benchmarks.embedding_backend_benchmark torch onnx onnx:onnx/model_qint8_avx2.onnx
+    python -m benchmarks.embedding_backend_benchmark torch onnx --faqs faqs.json
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import tempfile
+
+os.environ.setdefault("SECRET_KEY", "embedding-benchmark-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+import numpy as np
+from app.core.retrieval import ExactIndex, SIMILARITY_THRESHOLD
+
+FAQ_QUESTIONS = [
+    "What is your return policy?",
+    "How long does shipping take?",
+    "Do you ship internationally?",
+    "How can I track my order?",
+    "Can I change my shipping address after ordering?",
+    "How do I cancel my order?",
+    "What payment methods do you accept?",
+    "Is it safe to save my card details?",
+    "How do I reset my password?",
+    "How do I delete my account?",
+    "Do you offer gift cards?",
+    "How do I apply a discount code?",
+    "Why was my payment declined?",
+    "When will I receive my refund?",
+    "Can I exchange an item for a different size?",
+    "What should I do if my item arrived damaged?",
+    "Do you offer a warranty?",
+    "How do I contact customer support?",
+    "What are your opening hours?",
+    "Do you have a physical store?",
+    "Can I pick up my order in store?",
+    "How much does express delivery cost?",
+    "Do you offer student discounts?",
+    "How do I unsubscribe from marketing emails?",
+]
+
+QUERIES = [
+    "can i send something back",
+    "how many days until my package arrives",
+    "do you deliver to canada",
+    "where is my parcel right now",
+    "I moved, can the delivery go to my new address?",
+    "I want to cancel what I bought yesterday",
+    "can I pay with paypal",
+    "is my credit card information stored securely",
+    "I forgot my password",
+    "please remove my account and data",
+    "can I buy a voucher for a friend",
+    "my promo code isn't working",
+    "why did my card get rejected",
+    "how long do refunds take",
+    "the shoes are too small, can I get a bigger pair",
+    "the box was crushed and the item is broken",
+    "is there a guarantee on electronics",
+    "how do I talk to a human",
+    "what time do you open on saturday",
+    "where is your shop",
+    "can I collect the order myself",
+    "what is the price of next day delivery",
+    "discount for university students?",
+    "stop sending me newsletters",
+    "hello",
+    "what's the weather like today",
+    "tell me a joke",
+    "who won the football match",
+]
+
+CHILD = r"""
+import sys, json, time, resource
+import numpy as np
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+backend, file_name, model_name, questions, queries, out, batch_size = json.loads(sys.argv[1])
+start = time.perf_counter()
+from app.core.llm import load_embedding_model
+model = load_embedding_model(model_name, backend, file_name)
+result = {"load_s": time.perf_counter() - start, "load_rss_mb": rss_mb()}
+model.encode(queries[0], convert_to_numpy=True)
+
+start = time.perf_counter()
+faq_embeddings = model.encode(questions, batch_size=batch_size, convert_to_numpy=True).astype(np.float32)
+result["faqs_per_s"] = len(questions) / (time.perf_counter() - start)
+
+latencies, query_embeddings = [], []
+for _ in range(3):
+    for query in queries:
+        start = time.perf_counter()
+        query_embeddings.append(model.encode(query, convert_to_numpy=True))
+        latencies.append((time.perf_counter() - start) * 1000)
+result["query_p50_ms"] = float(np.percentile(latencies, 50))
+result["query_p95_ms"] = float(np.percentile(latencies, 95))
+result["peak_rss_mb"] = rss_mb()
+np.savez(out, faqs=faq_embeddings, queries=np.stack(query_embeddings[:len(queries)]).astype(np.float32))
+print(json.dumps({key: round(value, 3) for key, value in result.items()}))
+"""
+
+def run_backend(spec: str, model_name: str, questions: list, queries: list, batch_size: int, out: str) -> dict:
+    backend, _, file_name = spec.partition(":")
+    payload = json.dumps([backend, file_name or None, model_name, questions, queries, out, batch_size])
+    process = subprocess.run([sys.executable, "-c", CHILD, payload], capture_output=True, text=True)
+    if process.returncode:
+        sys.exit(f"{spec}: {process.stderr.strip().splitlines()[-1]}")
+    return {"backend": spec, **json.loads(process.stdout.strip().splitlines()[-1])}
+
+def relevant_faqs(faq_embeddings: np.ndarray, query_embeddings: np.ndarray, top_k: int) -> list:
+    """The FAQ indices semantic retrieval (llm.search_faqs) would return for each query."""
+    index = ExactIndex(faq_embeddings)
+    results = []
+    for query in query_embeddings:
+        scores, indices = index.search(query, top_k)
+        results.append([int(idx) for score, idx in zip(scores, indices) if score > SIMILARITY_THRESHOLD])
+    return results
+
+def agreement(reference: dict, candidate: dict, top_k: int) -> dict:
+    expected = relevant_faqs(reference["faqs"], reference["queries"], top_k)
+    own = relevant_faqs(candidate["faqs"], candidate["queries"], top_k)
+    mixed = relevant_faqs(reference["faqs"], candidate["queries"], top_k)
+    a, b = reference["queries"], candidate["queries"]
+    cosine = np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {
+        "query_cosine_mean": round(float(cosine.mean()), 5),
+        "query_cosine_min": round(float(cosine.min()), 5),
+        "same_faqs": round(sum(x == y for x, y in zip(expected, own)) / len(expected), 3),
+        "same_faqs_stored_reference": round(sum(x == y for x, y in zip(expected, mixed)) / len(expected), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("backends", nargs="*", default=["torch", "onnx"], help="backend or backend:file_name; the first is the reference")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2"))
+    parser.add_argument("--faqs", help="JSON list of FAQs to encode instead of the built-in questions")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    questions = FAQ_QUESTIONS
+    if args.faqs:
+        with open(args.faqs) as f:
+            questions = [item["question"] for item in json.load(f)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        embeddings = {}
+        for i, spec in enumerate(args.backends):
+            out = os.path.join(tmp, f"{i}.npz")
+            result = run_backend(spec, args.model, questions, QUERIES, args.batch_size, out)
+            embeddings[spec] = dict(np.load(out))
+            if i:
+                result.update(agreement(embeddings[args.backends[0]], embeddings[spec], args.top_k))
+            print(json.dumps(result), flush=True)
+
+if __name__ == "__main__":
+    main()
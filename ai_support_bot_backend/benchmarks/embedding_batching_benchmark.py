@@ -0,0 +1,73 @@
+"""
+Query embedding throughput with and without the micro-batcher (EMBEDDING_BATCHING_ENABLED).
+
+For each concurrency level, runs that many concurrent llm.aretrieve_faqs calls in waves, first
+with one encode per query and then through the batcher, and reports queries/s, latency and the
+batch sizes the batcher actually formed.
+
+Run from ai_support_bot_backend/:
+    python -m benchmarks.embedding_batching_benchmark --concurrency 1 8 32 128 --max-wait-ms 2
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+
+os.environ.setdefault("SECRET_KEY", "embedding-benchmark-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+from app.core import llm
+from app.core.metrics import EMBEDDING_BATCH_SIZE
+from app.core.retrieval import ExactIndex
+from benchmarks.embedding_backend_benchmark import FAQ_QUESTIONS, QUERIES
+
+def batch_size_totals() -> tuple[float, float]:
+    samples = {sample.name: sample.value for metric in EMBEDDING_BATCH_SIZE.collect() for sample in metric.samples}
+    return samples["embedding_batch_size_sum"], samples["embedding_batch_size_count"]
+
+async def run_level(concurrency: int, n_queries: int, faqs: list, index: ExactIndex) -> dict:
+    latencies = []
+
+    async def one_query(i: int):
+        start = time.perf_counter()
+        await llm.aretrieve_faqs(QUERIES[i % len(QUERIES)], faqs, faq_index=index)
+        latencies.append(time.perf_counter() - start)
+
+    queries_before, batches_before = batch_size_totals()
+    start = time.perf_counter()
+    for wave in range(0, n_queries, concurrency):
+        await asyncio.gather(*(one_query(i) for i in range(wave, min(wave + concurrency, n_queries))))
+    elapsed = time.perf_counter() - start
+    queries_after, batches_after = batch_size_totals()
+    latencies.sort()
+    return {
+        "batching": llm.query_embedding_batcher.running,
+        "concurrency": concurrency,
+        "queries_per_s": round(n_queries / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+        "mean_batch_size": round((queries_after - queries_before) / (batches_after - batches_before), 2) if batches_after > batches_before else None,
+    }
+
+async def main(args):
+    batcher = llm.query_embedding_batcher
+    batcher.max_batch, batcher.max_wait_s = args.max_batch, args.max_wait_ms / 1000
+    faqs = [{"question": question, "answer": ""} for question in FAQ_QUESTIONS]
+    index = ExactIndex(llm.encode_faq_questions(faqs))
+    llm.warm_up()
+    for concurrency in args.concurrency:
+        n_queries = max(args.queries, concurrency)
+        print(json.dumps(await run_level(concurrency, n_queries, faqs, index)), flush=True)
+        batcher.start()
+        print(json.dumps(await run_level(concurrency, n_queries, faqs, index)), flush=True)
+        await batcher.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--max-batch", type=int, default=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "2")))
+    asyncio.run(main(parser.parse_args()))
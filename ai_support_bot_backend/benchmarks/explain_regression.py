@@ -0,0 +1,170 @@
+"""
+EXPLAIN-based regression check for the chat history and session access paths.
+
+Seeds a database with synthetic chat history, runs the real crud functions while capturing
+the SQL they emit, and asserts that each hot query is answered from its intended index
+without a full scan or a sort over the table. Exits non-zero on any regression.
+
+Run from ai_support_bot_backend/ against a throwaway SQLite file (default) or a local
+PostgreSQL database:
+    python -m benchmarks.explain_regression --rows 2000000
+    python -m benchmarks.explain_regression --database-url postgresql://user:pw@localhost/explain_check
+"""
+import os
+import sys
+import json
+import uuid
+import random
+import argparse
+import datetime
+import tempfile
+
+os.environ.setdefault("SECRET_KEY", "explain-regression")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+def seed(engine, models, backfill_chat_sessions, n_rows: int, n_users: int, sessions_per_user: int):
+    rng = random.Random(0)
+    bot_ids = [uuid.uuid4() for _ in range(max(1, n_users // 1000))]
+    users = [(uuid.uuid4(), rng.choice(bot_ids)) for _ in range(n_users)]
+    admin_id = uuid.uuid4()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [{"id": admin_id, "email": "admin@example.com", "hashed_password": "x", "bot_id": None}])
+        conn.execute(insert(models.Bot), [{"id": b, "name": f"bot-{i}", "owner_id": admin_id} for i, b in enumerate(bot_ids)])
+        conn.execute(insert(models.User), [
+            {"id": u, "email": f"user{i}@example.com", "hashed_password": "x", "bot_id": b} for i, (u, b) in enumerate(users)
+        ])
+        start = datetime.datetime(2024, 1, 1)
+        batch = []
+        for i in range(n_rows):
+            user_id, bot_id = users[i % n_users]
+            batch.append({
+                "id": uuid.uuid4(), "session_id": f"s-{i % n_users}-{rng.randrange(sessions_per_user)}",
+                "bot_id": bot_id, "user_id": user_id, "role": "user" if i % 2 == 0 else "bot",
+                "message": "message text", "timestamp": start + datetime.timedelta(seconds=i),
+            })
+            if len(batch) == 50_000:
+                conn.execute(insert(models.ChatHistory), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(models.ChatHistory), batch)
+        conn.execute(insert(models.ChatSummary), [
+            {"id": uuid.uuid4(), "bot_id": bot_id, "session_id": f"s-{i}-0", "summary_text": "summary", "created_at": start}
+            for i, (_, bot_id) in enumerate(users)
+        ])
+        backfill_chat_sessions(conn)
+        conn.exec_driver_sql("ANALYZE")
+    return users
+
+def capture_statements(engine, action):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        action()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return [s for s in statements if s[0].lstrip().upper().startswith("SELECT")]
+
+def explain(engine, statement, parameters) -> list[str]:
+    """Returns one line per plan node: "<operation> <index or table>"."""
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            return [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        plan = plan if isinstance(plan, list) else json.loads(plan)
+        nodes, stack = [], [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            nodes.append(f"{node['Node Type']} {node.get('Index Name') or node.get('Relation Name') or ''}".strip())
+            stack.extend(node.get("Plans", []))
+        return nodes
+
+def check_plan(plan: list[str], indexes: tuple[str, ...], allow_sort: bool) -> list[str]:
+    problems = []
+    text = "\n".join(plan)
+    if not any(index in text for index in indexes):
+        problems.append(f"does not use {' or '.join(indexes)}")
+    for table in ("chat_history", "chat_sessions", "chat_archives", "faqs"):
+        if any(line.startswith(f"SCAN {table}") or line == f"Seq Scan {table}" for line in plan):
+            problems.append(f"full scan of {table}")
+    # Keyset pages order by (timestamp, id) on a timestamp index: sorting the id ties within
+    # each timestamp ("RIGHT PART OF ORDER BY", "Incremental Sort") is bounded and fine.
+    full_sort = lambda line: ("TEMP B-TREE" in line and "RIGHT PART" not in line) or line.startswith("Sort")
+    if not allow_sort and any(full_sort(line) for line in plan):
+        problems.append("sorts instead of reading in index order")
+    return problems
+
+# Archived sessions are looked up by chat_archives' (session_id, user_id) unique constraint.
+ARCHIVE_INDEXES = ("sqlite_autoindex_chat_archives", "_chat_archive_session_user_uc")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("EXPLAIN_DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--sessions-per-user", type=int, default=5)
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{tempfile.gettempdir()}/explain_regression_{uuid.uuid4().hex}.db"
+    os.environ.setdefault("DATABASE_URL", database_url)
+    from app.db import crud, models
+    from app.db.migrations import run_migrations
+    from app.db.backfill import backfill_chat_sessions
+
+    engine = create_engine(database_url)
+    run_migrations(engine)
+    users = seed(engine, models, backfill_chat_sessions, args.rows, args.users, args.sessions_per_user)
+    db = sessionmaker(bind=engine)()
+    user_id, bot_id = users[0]
+    session_id = "s-0-0"
+    # Keyset cursors for the paginated queries, taken at the edge of the seeded time range.
+    start, end = datetime.datetime(2024, 1, 1), datetime.datetime(2100, 1, 1)
+
+    # (name, crud call, indexes that may serve it, whether a sort of the result set is acceptable)
+    cases = [
+        ("get_chat_context", lambda: crud.get_chat_context(db, session_id=session_id, bot_id=bot_id, user_id=user_id, limit=10),
+         ("ix_chat_history_session_user_ts", "ix_chat_history_user_bot_session_ts"), False),
+        ("get_full_chat_history_by_session", lambda: crud.get_full_chat_history_by_session(db, session_id=session_id, user_id=user_id),
+         ("ix_chat_history_session_user_ts",), False),
+        ("get_full_chat_histories_for_sessions", lambda: crud.get_full_chat_histories_for_sessions(db, sessions=[(session_id, user_id), ("s-1-0", users[1][0])]),
+         ("ix_chat_history_session_user_ts",), True),
+        ("get_chat_history_page", lambda: crud.get_chat_history_page(db, session_id=session_id, user_id=user_id, limit=101, after=(start, uuid.UUID(int=0))),
+         ("ix_chat_history_session_user_ts",), False),
+        ("get_user_chat_sessions", lambda: crud.get_user_chat_sessions(db, user_id=user_id, bot_id=bot_id, limit=101, after=(end, uuid.UUID(int=0))),
+         ("ix_chat_sessions_user_bot_updated",), False),
+        ("get_unsummarized_sessions", lambda: crud.get_unsummarized_sessions(db, bot_id=bot_id),
+         ("ix_chat_sessions_bot_needs_summary",), True),
+        ("get_faqs_for_bot", lambda: crud.get_faqs_for_bot(db, bot_id=bot_id),
+         ("ix_faqs_bot_position",), False),
+        ("get_summaries_page", lambda: crud.get_summaries_page(db, bot_id=bot_id, limit=101, after=(start, uuid.UUID(int=0))),
+         ("ix_chat_summaries_bot_created",), False),
+        ("get_sessions_to_archive", lambda: crud.get_sessions_to_archive(db, bot_id=bot_id, idle_before=end, limit=200),
+         ("ix_chat_sessions_bot_updated",), True),
+        ("get_expired_sessions", lambda: crud.get_expired_sessions(db, bot_id=bot_id, idle_before=end, limit=200),
+         ("ix_chat_sessions_bot_updated",), True),
+        ("get_summaries_fingerprint", lambda: crud.get_summaries_fingerprint(db, bot_id=bot_id),
+         ("ix_chat_summaries_bot_created",), False),
+    ]
+
+    failures = 0
+    for name, action, indexes, allow_sort in cases:
+        plans, problems = [], []
+        for statement, parameters in capture_statements(engine, action):
+            plan = explain(engine, statement, parameters)
+            archive_lookup = "FROM chat_archives" in statement
+            problems += check_plan(plan, ARCHIVE_INDEXES if archive_lookup else indexes, allow_sort)
+            plans += plan
+        failures += bool(problems)
+        print(f"{'FAIL' if problems else 'ok  '} {name}: {'; '.join(problems) or plans[0]}")
+        if problems:
+            print("      " + "\n      ".join(plans))
+    db.close()
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Benchmark suite for the chat and admin hot paths.
+
+Starts the app with uvicorn in a subprocess, against a throwaway SQLite database (or
+DATABASE_URL, e.g. a local PostgreSQL database) and the fake LLM provider, seeds synthetic bots,
+users and chat sessions at the requested scale, then measures each scenario over HTTP with a
+fixed number of requests from concurrent clients:
+
+    chat               POST /chat/{bot_id} on a seeded session (history and retrieval included)
+    sessions           GET  /chat/{bot_id}/sessions
+    history            GET  /chat/history/{session_id}
+    login              POST /auth/{bot_id}/login (bcrypt, BCRYPT_ROUNDS)
+    process_summaries  POST /admin/bots/{bot_id}/process-summaries over every seeded session of a
+                       bot, timed until the job has completed
+
+Each scenario runs --rounds times and prints one JSON line with the median of each metric
+(throughput and p50/p95/p99 latency) across rounds; --output also writes
+them with the commit, scale and settings of the run, for benchmarks.compare_results.
+
+With --url, an already running single-worker server is measured instead; it must share this
+process's DATABASE_URL and SECRET_KEY, since users and history are seeded straight into the
+database and tokens are minted here.
+
+Run from ai_support_bot_backend/:
+    python -m benchmarks.hot_paths --output results.json
+    python -m benchmarks.hot_paths --users-per-bot 500 --concurrency 32 --scenarios chat history
+    DATABASE_URL=postgresql://user:pw@localhost/bench python -m benchmarks.hot_paths
+"""
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import datetime
+import platform
+import statistics
+import socket
+import tempfile
+import subprocess
+from contextlib import contextmanager, nullcontext
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/hot_paths_{uuid.uuid4().hex}.db")
+os.environ.setdefault("SECRET_KEY", "hot-paths-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "600")
+# One log line per request would swamp the report.
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["LLM_PROVIDER"] = "fake"
+# The stub LLM has no rate limit; don't let the provider concurrency limit cap the pipeline under test.
+os.environ.setdefault("LLM_MAX_CONCURRENCY", "100000")
+
+import httpx
+from sqlalchemy import insert, update
+from app.db import crud, models
+from app.db.session import SessionLocal, engine
+from app.core import security
+from app.core.config import settings
+
+API = "/api/v1"
+SCENARIOS = ("chat", "sessions", "history", "login", "process_summaries")
+TOPICS = ["order", "refund", "invoice", "password", "subscription", "delivery", "warranty", "account", "coupon", "address"]
+ACTIONS = ["track", "cancel", "change", "update", "find", "download", "renew", "reset"]
+
+def synthetic_faqs(n: int) -> list[dict]:
+    return [
+        {
+            "question": f"How do I {ACTIONS[i % len(ACTIONS)]} my {TOPICS[(i // len(ACTIONS)) % len(TOPICS)]}? ({i})",
+            "answer": f"To {ACTIONS[i % len(ACTIONS)]} your {TOPICS[(i // len(ACTIONS)) % len(TOPICS)]}, open your account page and follow step {i}.",
+        }
+        for i in range(n)
+    ]
+
+def user_message(rng: random.Random) -> str:
+    return f"How do I {rng.choice(ACTIONS)} my {rng.choice(TOPICS)}?"
+
+class Dataset:
+    def __init__(self):
+        self.admin_headers = None
+        self.bot_ids = []
+        # (bot_id, email, headers, [session_id, ...]) per user
+        self.users = []
+
+async def seed(client: httpx.AsyncClient, args) -> Dataset:
+    """
+    Bots go through the API so their FAQs are embedded and indexed by the real ingest path;
+    users and chat history are bulk inserted, all users sharing one password hash, and tokens
+    are minted directly instead of logging everyone in.
+    """
+    rng = random.Random(args.seed)
+    data = Dataset()
+    admin_email = "admin@example.com"
+    await client.post(f"{API}/auth/admin/register", json={"email": admin_email, "password": "password"})
+    data.admin_headers = {"Authorization": f"Bearer {security.create_access_token(data={'sub': admin_email})}"}
+    for b in range(args.bots):
+        response = await client.post(
+            f"{API}/bots/", data={"name": f"bench-bot-{b}"},
+            files={"file": ("faqs.json", json.dumps(synthetic_faqs(args.faqs)), "application/json")},
+            headers=data.admin_headers,
+        )
+        response.raise_for_status()
+        data.bot_ids.append(uuid.UUID(response.json()["id"]))
+
+    hashed_password = security.get_password_hash("password")
+    start = datetime.datetime.utcnow() - datetime.timedelta(days=30)
+    with SessionLocal() as db:
+        for bot_id in data.bot_ids:
+            rows = [
+                {"id": uuid.uuid4(), "email": f"user{i}@example.com", "hashed_password": hashed_password, "bot_id": bot_id}
+                for i in range(args.users_per_bot)
+            ]
+            db.execute(insert(models.User), rows)
+            db.commit()
+            turns = []
+            for row in rows:
+                sessions = [f"bench-{row['id'].hex[:12]}-{s}" for s in range(args.sessions_per_user)]
+                token = security.create_access_token(data={"sub": row["email"], "bot_id": bot_id})
+                data.users.append((bot_id, row["email"], {"Authorization": f"Bearer {token}"}, sessions))
+                for session_id in sessions:
+                    for _ in range(args.turns_per_session):
+                        turns.append({
+                            "session_id": session_id, "bot_id": bot_id, "user_id": row["id"],
+                            "user_message": user_message(rng), "bot_message": "Here is how to do that: open your account page.",
+                            "timestamp": start + datetime.timedelta(seconds=len(turns) * 10),
+                        })
+                if len(turns) >= 5_000:
+                    crud.create_chat_turns(db, turns)
+                    turns = []
+            crud.create_chat_turns(db, turns)
+    return data
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+def summarize(name: str, latencies: list[float], errors: int, elapsed: float, **extra) -> dict:
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2)
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(latencies[-1]),
+        **extra,
+    }
+
+async def run_requests(name: str, call, expected_status: int, n_requests: int, concurrency: int, warmup: int) -> dict:
+    """Sends n_requests calls (call() -> response) from `concurrency` clients, after `warmup` unmeasured ones."""
+    for _ in range(warmup):
+        await call()
+    latencies, errors = [], 0
+    remaining = iter(range(n_requests))
+
+    async def client_loop():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await call()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != expected_status:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return summarize(name, latencies, errors, time.perf_counter() - start, concurrency=concurrency)
+
+async def run_process_summaries(client: httpx.AsyncClient, data: Dataset, runs: int) -> dict:
+    """Each run first marks every session of the bot as changed, so every run summarises all of them."""
+    bot_id = data.bot_ids[0]
+    post_latencies, job_latencies, errors, sessions = [], [], 0, 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        with SessionLocal() as db:
+            db.execute(update(models.ChatSession).where(models.ChatSession.bot_id == bot_id).values(needs_summary=True))
+            db.commit()
+        started = time.perf_counter()
+        response = await client.post(f"{API}/admin/bots/{bot_id}/process-summaries", headers=data.admin_headers)
+        post_latencies.append(time.perf_counter() - started)
+        job_id = response.json().get("job_id") if response.status_code == 202 else None
+        if job_id is None:
+            errors += 1
+            continue
+        while True:
+            job = (await client.get(f"{API}/admin/jobs/{job_id}", headers=data.admin_headers)).json()
+            if job["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(0.005)
+        job_latencies.append(time.perf_counter() - started)
+        sessions += job["processed_sessions"]
+        errors += job["status"] == "failed"
+    result = summarize("process_summaries", job_latencies or post_latencies, errors, time.perf_counter() - start)
+    result.update({
+        "post_p50_ms": round(percentile(sorted(post_latencies), 0.5) * 1000, 2),
+        "sessions_per_job": sessions // max(1, len(job_latencies)),
+        "sessions_per_s": round(sessions / sum(job_latencies), 1) if job_latencies else None,
+    })
+    return result
+
+def median_of_rounds(rounds: list[dict]) -> dict:
+    """Per-metric medians across rounds, which damp the odd round slowed down by the rest of the machine."""
+    combined = dict(rounds[0])
+    for key, value in rounds[0].items():
+        values = [result[key] for result in rounds]
+        if isinstance(value, float) and None not in values:
+            combined[key] = round(statistics.median(values), 2)
+    combined["errors"] = sum(result["errors"] for result in rounds)
+    combined["rounds"] = len(rounds)
+    return combined
+
+async def run_scenario(name: str, client: httpx.AsyncClient, data: Dataset, args) -> dict:
+    rng = random.Random(args.seed + SCENARIOS.index(name))
+    pick = lambda: data.users[rng.randrange(len(data.users))]
+    if name == "chat":
+        async def call():
+            bot_id, _, headers, sessions = pick()
+            return await client.post(
+                f"{API}/chat/{bot_id}", json={"session_id": rng.choice(sessions), "message": user_message(rng)}, headers=headers
+            )
+        return await run_requests(name, call, 200, args.requests, args.concurrency, args.warmup)
+    if name == "sessions":
+        async def call():
+            bot_id, _, headers, _ = pick()
+            return await client.get(f"{API}/chat/{bot_id}/sessions", headers=headers)
+        return await run_requests(name, call, 200, args.requests, args.concurrency, args.warmup)
+    if name == "history":
+        async def call():
+            _, _, headers, sessions = pick()
+            return await client.get(f"{API}/chat/history/{rng.choice(sessions)}", headers=headers)
+        return await run_requests(name, call, 200, args.requests, args.concurrency, args.warmup)
+    if name == "login":
+        async def call():
+            bot_id, email, _, _ = pick()
+            return await client.post(f"{API}/auth/{bot_id}/login", data={"username": email, "password": "password"})
+        return await run_requests(name, call, 200, args.login_requests, args.concurrency, min(args.warmup, 2))
+    return await run_process_summaries(client, data, args.summary_runs)
+
+def run_metadata(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database": engine.dialect.name,
+        "scale": {key: getattr(args, key) for key in ("bots", "faqs", "users_per_bot", "sessions_per_user", "turns_per_session")},
+        "load": {key: getattr(args, key) for key in ("requests", "login_requests", "summary_runs", "rounds", "concurrency", "warmup", "llm_latency_ms", "seed")},
+        "settings": {
+            "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+            "password_hash_workers": settings.PASSWORD_HASH_WORKERS,
+            "chat_write_buffer": settings.CHAT_WRITE_BUFFER_ENABLED,
+            "embedding_batching": settings.EMBEDDING_BATCHING_ENABLED,
+            "response_cache": settings.RESPONSE_CACHE_ENABLED,
+        },
+    }
+
+@contextmanager
+def start_server(args):
+    """
+    Runs uvicorn in its own process so background tasks (rolling summaries, summary jobs) and
+    the app's event loop don't share a process with the load generator; yields its URL once
+    /ready answers 200 (migrations applied, embedding model loaded).
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = {**os.environ, "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms)}
+    log = tempfile.NamedTemporaryFile("w+", prefix="hot_paths_server_", suffix=".log", delete=False)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--no-access-log"],
+        env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + args.startup_timeout
+        while True:
+            if server.poll() is not None or time.monotonic() > deadline:
+                log.seek(0)
+                raise RuntimeError(f"Server did not become ready (log: {log.name}):\n{log.read()[-4000:]}")
+            try:
+                if httpx.get(f"{url}/ready").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+        yield url
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        log.close()
+
+async def run(args, base_url: str):
+    metadata = run_metadata(args)
+    metadata["server"] = base_url if args.url else "uvicorn subprocess"
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        seed_start = time.perf_counter()
+        data = await seed(client, args)
+        metadata["seed_s"] = round(time.perf_counter() - seed_start, 1)
+        for name in args.scenarios:
+            result = median_of_rounds([await run_scenario(name, client, data, args) for _ in range(args.rounds)])
+            results.append(result)
+            print(json.dumps(result), flush=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"metadata": metadata, "results": results}, f, indent=2)
+    return results
+
+def main(args):
+    with nullcontext(args.url) if args.url else start_server(args) as base_url:
+        results = asyncio.run(run(args, base_url))
+    if any(result["errors"] for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--bots", type=int, default=2)
+    parser.add_argument("--faqs", type=int, default=100, help="FAQs per bot")
+    parser.add_argument("--users-per-bot", type=int, default=100)
+    parser.add_argument("--sessions-per-user", type=int, default=3)
+    parser.add_argument("--turns-per-session", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--summary-runs", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3, help="runs of each scenario; the median of each metric is reported")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument("--llm-latency-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results and run metadata to this JSON file")
+    parser.add_argument("--url", help="measure this running server instead of starting one")
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    main(parser.parse_args())
@@ -0,0 +1,173 @@
+"""
+Relevance and latency of semantic, hybrid and lexical-fast-path FAQ retrieval on a labelled set.
+
+Each query is labelled with the FAQ it should retrieve, or with none for off-topic small talk.
+The built-in set mixes paraphrases, near-verbatim questions and queries that hinge on an
+error code, product code or plan name. For every mode the benchmark reports, overall and per
+category: hit@1 and hit@k (the labelled FAQ is first / among the returned FAQs), the share of
+off-topic queries that wrongly got an FAQ, how often the fast path skipped the embedding, and
+p50/p99 retrieval latency including query encoding.
+
+Modes:
+    semantic   embedding similarity only (HYBRID_RETRIEVAL_ENABLED=false)
+    hybrid     FAQs above the cosine threshold ranked by cosine + HYBRID_LEXICAL_WEIGHT x BM25,
+               query always embedded
+    fast_path  hybrid, skipping the embedding on confident lexical matches (turns that can't
+               use the response cache)
+
+Run from ai_support_bot_backend/ with the real embedding model:
+    python -m benchmarks.hybrid_retrieval_benchmark
+    python -m benchmarks.hybrid_retrieval_benchmark --faqs faqs.json --labels labels.json --lexical-weight 0.2 0.3 0.5
+where labels.json is a list of {"query": ..., "faq": <question text or null>, "category": ...}.
+"""
+import os
+import json
+import time
+import argparse
+
+os.environ.setdefault("SECRET_KEY", "hybrid-retrieval-benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+import numpy as np
+from app.core import llm
+from app.core.config import settings
+from app.core.faq_index import build_faq_index, build_lexical_index
+
+FAQS = [
+    ("What is your return policy?", "You can return any item within 30 days of purchase for a full refund if it is unused and in its original packaging."),
+    ("How long does shipping take?", "Standard shipping takes 5-7 business days; express delivery takes 1-2 business days."),
+    ("Do you ship internationally?", "Yes, we ship to over 40 countries. Duties and taxes are paid by the recipient."),
+    ("How can I track my order?", "Use the tracking link in your shipping confirmation email or the Orders page of your account."),
+    ("How do I cancel my order?", "Orders can be cancelled from the Orders page until they are packed, usually within 2 hours."),
+    ("What payment methods do you accept?", "We accept Visa, Mastercard, American Express, PayPal and Apple Pay."),
+    ("How do I reset my password?", "Click 'Forgot password' on the sign-in page and follow the link we email you."),
+    ("How do I delete my account?", "Go to Settings > Privacy and choose Delete account. Your data is erased within 30 days."),
+    ("Do you offer gift cards?", "Digital gift cards from $10 to $500 are available and never expire."),
+    ("When will I receive my refund?", "Refunds are issued to the original payment method within 5 business days of receiving the return."),
+    ("What should I do if my item arrived damaged?", "Send us photos of the damage within 7 days and we will send a replacement free of charge."),
+    ("How do I contact customer support?", "Chat with us here, email support@example.com or call 0800 123 456, 8am-8pm."),
+    ("What does error E1042 mean?", "E1042 means the card issuer declined the payment. Try another card or contact your bank."),
+    ("What does error E2210 mean?", "E2210 means your session expired during checkout. Sign in again and retry the payment."),
+    ("What does error E3007 mean?", "E3007 means the discount code has expired or is not valid for the items in your basket."),
+    ("Is the SKU-7731 kettle compatible with 110V outlets?", "The SKU-7731 kettle is 230V only; use the SKU-7732 model in 110V countries."),
+    ("How do I descale the SKU-4410 coffee machine?", "Run the descaling programme with one sachet of descaler every 3 months."),
+    ("What is included in the Pro plan?", "The Pro plan includes free express delivery, extended 2-year warranty and priority support."),
+    ("Can I pause my Basic plan subscription?", "Basic plan subscriptions can be paused for up to 3 months from Settings > Subscription."),
+    ("What is the format of an order number?", "Order numbers look like ORD-2024-000123 and are shown in your confirmation email."),
+]
+
+# (query, labelled FAQ question or None for off-topic, category)
+LABELS = [
+    ("can i send something back", FAQS[0][0], "paraphrase"),
+    ("how many days until my package arrives", FAQS[1][0], "paraphrase"),
+    ("do you deliver to canada", FAQS[2][0], "paraphrase"),
+    ("where is my parcel right now", FAQS[3][0], "paraphrase"),
+    ("I want to cancel what I bought yesterday", FAQS[4][0], "paraphrase"),
+    ("can I pay with paypal", FAQS[5][0], "paraphrase"),
+    ("I forgot my password", FAQS[6][0], "paraphrase"),
+    ("please remove my account and data", FAQS[7][0], "paraphrase"),
+    ("can I buy a voucher for a friend", FAQS[8][0], "paraphrase"),
+    ("how long do refunds take", FAQS[9][0], "paraphrase"),
+    ("the box was crushed and the item is broken", FAQS[10][0], "paraphrase"),
+    ("how do I talk to a human", FAQS[11][0], "paraphrase"),
+    ("What is your return policy?", FAQS[0][0], "verbatim"),
+    ("how long does shipping take", FAQS[1][0], "verbatim"),
+    ("How can I track my order", FAQS[3][0], "verbatim"),
+    ("how do i reset my password", FAQS[6][0], "verbatim"),
+    ("do you offer gift cards", FAQS[8][0], "verbatim"),
+    ("what is included in the pro plan", FAQS[17][0], "verbatim"),
+    ("I got error E1042 at checkout", FAQS[12][0], "code"),
+    ("E2210", FAQS[13][0], "code"),
+    ("checkout says E2210 what do I do", FAQS[13][0], "code"),
+    ("code E3007 when applying my voucher", FAQS[14][0], "code"),
+    ("does the sku-7731 work in the US", FAQS[15][0], "code"),
+    ("SKU-4410 descaling", FAQS[16][0], "code"),
+    ("how often should I descale sku 4410", FAQS[16][0], "code"),
+    ("what do I get with pro", FAQS[17][0], "code"),
+    ("pause basic plan", FAQS[18][0], "code"),
+    ("where do I find my ORD-2024 number", FAQS[19][0], "code"),
+    ("hello", None, "off_topic"),
+    ("what's the weather like today", None, "off_topic"),
+    ("tell me a joke", None, "off_topic"),
+    ("who won the football match", None, "off_topic"),
+]
+
+MODES = ("semantic", "hybrid", "fast_path")
+
+def evaluate(mode: str, faqs: list[dict], labels: list, faq_index, lexical_index, top_k: int, rounds: int) -> dict:
+    settings.HYBRID_RETRIEVAL_ENABLED = mode != "semantic"
+    questions = [faq["question"] for faq in faqs]
+    rows, latencies = [], []
+    for round_number in range(rounds):
+        for query, expected, category in labels:
+            start = time.perf_counter()
+            query_embedding, faq_ids = llm.retrieve_faqs(
+                query, faqs, top_k=top_k, faq_index=faq_index, lexical_index=lexical_index, need_embedding=mode != "fast_path",
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            if round_number == 0:
+                returned = [questions[i] for i in faq_ids]
+                rows.append({
+                    "category": category,
+                    "hit@1": expected is not None and returned[:1] == [expected],
+                    f"hit@{top_k}": expected is not None and expected in returned,
+                    "false_positive": expected is None and bool(returned),
+                    "skipped_embedding": query_embedding is None,
+                })
+
+    def summary(selected: list) -> dict:
+        on_topic = [row for row in selected if row["category"] != "off_topic"]
+        off_topic = [row for row in selected if row["category"] == "off_topic"]
+        result = {"queries": len(selected)}
+        for metric in ("hit@1", f"hit@{top_k}"):
+            if on_topic:
+                result[metric] = round(sum(row[metric] for row in on_topic) / len(on_topic), 3)
+        if off_topic:
+            result["false_positive_rate"] = round(sum(row["false_positive"] for row in off_topic) / len(off_topic), 3)
+        result["skipped_embedding"] = round(sum(row["skipped_embedding"] for row in selected) / len(selected), 3)
+        return result
+
+    return {
+        "mode": mode,
+        **summary(rows),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "by_category": {category: summary([row for row in rows if row["category"] == category])
+                        for category in dict.fromkeys(row["category"] for row in rows)},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faqs", help="JSON list of {question, answer} instead of the built-in FAQs")
+    parser.add_argument("--labels", help="JSON list of {query, faq, category} for --faqs")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--lexical-weight", type=float, nargs="+", default=[settings.HYBRID_LEXICAL_WEIGHT])
+    parser.add_argument("--backend", default="exact", help="embedding index backend (exact or ivf)")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=5, help="timed passes over the queries")
+    args = parser.parse_args()
+
+    if bool(args.faqs) != bool(args.labels):
+        parser.error("--faqs and --labels go together")
+    if args.faqs:
+        with open(args.faqs) as f:
+            faqs = json.load(f)
+        with open(args.labels) as f:
+            labels = [(item["query"], item.get("faq"), item.get("category", "labelled")) for item in json.load(f)]
+    else:
+        faqs = [{"question": question, "answer": answer} for question, answer in FAQS]
+        labels = LABELS
+
+    llm.warm_up()
+    faq_index = build_faq_index(args.backend, llm.encode_faq_questions(faqs))
+    lexical_index = build_lexical_index(faqs)
+    for weight in args.lexical_weight:
+        settings.HYBRID_LEXICAL_WEIGHT = weight
+        for mode in args.modes:
+            if mode == "semantic" and weight != args.lexical_weight[0]:
+                continue
+            print(json.dumps({"lexical_weight": weight, **evaluate(mode, faqs, labels, faq_index, lexical_index, args.top_k, args.rounds)}), flush=True)
+
+if __name__ == "__main__":
+    main()
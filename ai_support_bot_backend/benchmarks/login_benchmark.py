@@ -0,0 +1,87 @@
+"""
+Login throughput benchmark for POST /auth/{bot_id}/login.
+
+For each password pool size, fires a storm of concurrent logins and reports logins/s,
+logins/s per worker process, and the latency of a cheap request (GET /) probed during the
+storm, which stays low as long as bcrypt is kept off the event loop and threadpool.
+
+Run from ai_support_bot_backend/ (uses a throwaway SQLite database unless DATABASE_URL is set):
+    BCRYPT_ROUNDS=12 python -m benchmarks.login_benchmark --workers 1 2 4 --logins 200
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/login_benchmark_{uuid.uuid4().hex}.db")
+os.environ.setdefault("SECRET_KEY", "login-benchmark-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+# One log line per request would swamp the report.
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["LLM_PROVIDER"] = "fake"
+
+import httpx
+from app.main import app
+from app.core import security
+from app.core.config import settings
+from benchmarks.chat_load_test import API, seed
+
+async def probe_latencies(client: httpx.AsyncClient, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+    return sorted(latencies)
+
+async def run_level(client: httpx.AsyncClient, bot_id: str, n_users: int, workers: int, n_logins: int) -> dict:
+    settings.PASSWORD_HASH_WORKERS = workers
+    security.shutdown_password_pool()
+    # Start the worker processes outside the measured window.
+    await security.aget_password_hash("warm-up")
+
+    async def one_login(i: int):
+        response = await client.post(
+            f"{API}/auth/{bot_id}/login", data={"username": f"user{i % n_users}@example.com", "password": "password"}
+        )
+        return response.status_code
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_latencies(client, stop))
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(one_login(i) for i in range(n_logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    probe_ms = await probe
+    ok = statuses.count(200)
+    return {
+        "workers": workers,
+        "logins": n_logins,
+        "ok": ok,
+        "rejected_503": statuses.count(503),
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(ok / elapsed, 1),
+        "logins_per_s_per_worker": round(ok / elapsed / workers, 1),
+        "probe_p50_ms": round(probe_ms[len(probe_ms) // 2] * 1000, 1) if probe_ms else None,
+        "probe_max_ms": round(probe_ms[-1] * 1000, 1) if probe_ms else None,
+    }
+
+async def main(args):
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://login-benchmark", timeout=None) as client:
+        bot_id, _ = await seed(client, args.users)
+        print(json.dumps({"cpu_count": os.cpu_count(), "bcrypt_rounds": settings.BCRYPT_ROUNDS}))
+        for workers in args.workers:
+            print(json.dumps(await run_level(client, bot_id, args.users, workers, args.logins)), flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--users", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
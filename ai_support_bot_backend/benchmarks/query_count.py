@@ -0,0 +1,58 @@
+"""
+Counts the SQL statements issued by each hot authenticated endpoint.
+
+Every endpoint is called once to warm the in-process caches, then again while counting the
+statements sent to the database (BEGIN/COMMIT are not counted). Uses the fake LLM provider
+and a throwaway SQLite database unless DATABASE_URL is set.
+
+Run from ai_support_bot_backend/:
+    python -m benchmarks.query_count
+"""
+import os
+import json
+import uuid
+import asyncio
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/query_count_{uuid.uuid4().hex}.db")
+os.environ.setdefault("SECRET_KEY", "query-count-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+# One log line per request would swamp the report.
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["LLM_PROVIDER"] = "fake"
+
+import httpx
+from sqlalchemy import event
+from app.main import app
+from app.db.session import engine, async_engine
+from benchmarks.chat_load_test import API, seed
+
+class StatementCounter:
+    def __init__(self):
+        self.statements = []
+        for target in (engine, async_engine.sync_engine):
+            event.listen(target, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement.split()[0].upper())
+
+async def main():
+    counter = StatementCounter()
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://query-count", timeout=None) as client:
+        bot_id, headers = await seed(client, 1)
+        user = headers[0]
+        requests = [
+            ("POST /chat/{bot_id}", lambda: client.post(f"{API}/chat/{bot_id}", json={"session_id": "q", "message": "How can I track my order?"}, headers=user)),
+            ("GET /chat/{bot_id}/sessions", lambda: client.get(f"{API}/chat/{bot_id}/sessions", headers=user)),
+            ("GET /chat/history/{session_id}", lambda: client.get(f"{API}/chat/history/q", headers=user)),
+        ]
+        for name, call in requests:
+            (await call()).raise_for_status()
+            counter.statements = []
+            (await call()).raise_for_status()
+            print(json.dumps({"endpoint": name, "queries": len(counter.statements), "statements": counter.statements}))
+
+if __name__ == "__main__":
+    asyncio.run(main())
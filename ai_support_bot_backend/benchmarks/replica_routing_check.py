@@ -0,0 +1,112 @@
+"""
+Checks that read-only views are served by READ_REPLICA_DATABASE_URL and writes by the primary.
+
+Uses two throwaway SQLite files as primary and replica and the fake LLM provider. It seeds a bot,
+a user, a chat session and its summaries through the API, all of which lands on the primary.
+It then checks that:
+  - before "replication", the history view can't see the session (it reads the empty replica);
+  - after the primary is copied onto the replica, the history, session list, user summary,
+    admin summaries and analytics views answer 200 while sending every statement to the
+    replica and none to the primary;
+  - a chat turn only touches the primary.
+Prints one JSON line per check and exits non-zero on any failure.
+
+Run from ai_support_bot_backend/:
+    python -m benchmarks.replica_routing_check
+"""
+import os
+import sys
+import json
+import uuid
+import asyncio
+import sqlite3
+import tempfile
+
+_directory = tempfile.mkdtemp(prefix="replica_routing_")
+PRIMARY_PATH = os.path.join(_directory, "primary.db")
+REPLICA_PATH = os.path.join(_directory, "replica.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{PRIMARY_PATH}"
+os.environ["READ_REPLICA_DATABASE_URL"] = f"sqlite:///{REPLICA_PATH}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("ASYNC_READ_REPLICA_DATABASE_URL", None)
+os.environ.setdefault("SECRET_KEY", "replica-routing-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["LLM_PROVIDER"] = "fake"
+
+import httpx
+from sqlalchemy import event
+from app.main import app
+from app.db.migrations import run_migrations
+from app.db.session import engine, async_engine, read_engine, async_read_engine
+from benchmarks.chat_load_test import API, FAQS
+
+class StatementCounter:
+    def __init__(self, *engines):
+        self.count = 0
+        for target in engines:
+            event.listen(target, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+async def replicate():
+    """Stands in for replication: copies the primary onto the replica with SQLite's online backup."""
+    read_engine.dispose()
+    await async_read_engine.dispose()
+    with sqlite3.connect(PRIMARY_PATH) as source, sqlite3.connect(REPLICA_PATH) as target:
+        source.backup(target)
+
+async def main() -> bool:
+    primary = StatementCounter(engine, async_engine.sync_engine)
+    replica = StatementCounter(read_engine, async_read_engine.sync_engine)
+    # A real replica gets its schema from the primary.
+    run_migrations(read_engine)
+    results = []
+
+    def check(name: str, ok: bool, **details):
+        results.append(ok)
+        print(json.dumps({"check": name, "ok": ok, **details}), flush=True)
+
+    async def routed(name: str, call, expected_status: int, reads_replica: bool):
+        primary.count = replica.count = 0
+        response = await call()
+        used, unused = (replica, primary) if reads_replica else (primary, replica)
+        check(
+            name, response.status_code == expected_status and used.count > 0 and unused.count == 0,
+            status=response.status_code, primary_statements=primary.count, replica_statements=replica.count,
+        )
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://replica-check", timeout=None) as client:
+        await client.post(f"{API}/auth/admin/register", json={"email": "admin@example.com", "password": "password"})
+        admin_token = (await client.post(f"{API}/auth/admin/login", data={"username": "admin@example.com", "password": "password"})).json()["access_token"]
+        admin = {"Authorization": f"Bearer {admin_token}"}
+        bot_id = (await client.post(
+            f"{API}/bots/", data={"name": "replica-bot"},
+            files={"file": ("faqs.json", json.dumps(FAQS), "application/json")}, headers=admin,
+        )).json()["id"]
+        await client.post(f"{API}/auth/{bot_id}/register", json={"email": "user@example.com", "password": "password"})
+        user_token = (await client.post(f"{API}/auth/{bot_id}/login", data={"username": "user@example.com", "password": "password"})).json()["access_token"]
+        user = {"Authorization": f"Bearer {user_token}"}
+        session_id = f"replica-{uuid.uuid4().hex[:8]}"
+        for message in ("What is your return policy?", "How long does shipping take?"):
+            (await client.post(f"{API}/chat/{bot_id}", json={"session_id": session_id, "message": message}, headers=user)).raise_for_status()
+        # The in-process transport returns once the summary job (a background task) has finished.
+        (await client.post(f"{API}/admin/bots/{bot_id}/process-summaries", headers=admin)).raise_for_status()
+
+        await routed("history before replication reads the empty replica",
+                     lambda: client.get(f"{API}/chat/history/{session_id}", headers=user), 404, True)
+        await replicate()
+        await routed("history", lambda: client.get(f"{API}/chat/history/{session_id}", headers=user), 200, True)
+        await routed("session list", lambda: client.get(f"{API}/chat/{bot_id}/sessions", headers=user), 200, True)
+        await routed("user summary", lambda: client.get(f"{API}/chat/summary/{session_id}", headers=user), 200, True)
+        await routed("admin summaries", lambda: client.get(f"{API}/admin/bots/{bot_id}/summaries", headers=admin), 200, True)
+        await routed("analytics", lambda: client.get(f"{API}/admin/bots/{bot_id}/analytics", headers=admin), 200, True)
+        await routed("chat writes to the primary",
+                     lambda: client.post(f"{API}/chat/{bot_id}", json={"session_id": session_id, "message": "Thanks!"}, headers=user), 200, False)
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,144 @@
+"""
+Checks chat history archival and retention end to end.
+
+Uses a throwaway SQLite file and the fake LLM provider. It seeds a bot, a user and three chat
+sessions through the API, backdates two of them, applies the bot's policy (archive after 30
+days, delete after 90) and checks that:
+  - the 40-day-old session leaves chat_history for one compressed chat_archives row, and its
+    history (paged or not), summary and summary job read the same messages as before;
+  - a message sent to an archived session is merged after the archived ones;
+  - the 120-day-old session is deleted, and the fresh session is untouched;
+  - rebuilding chat_sessions keeps the archived session's message count and the rolling
+    summaries stored on sessions.
+Prints one JSON line per check and exits non-zero on any failure.
+
+Run from ai_support_bot_backend/:
+    python -m benchmarks.retention_check
+"""
+import os
+import sys
+import json
+import uuid
+import asyncio
+import datetime
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='retention_check_')}/retention.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("READ_REPLICA_DATABASE_URL", None)
+os.environ.setdefault("SECRET_KEY", "retention-check-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["LLM_PROVIDER"] = "fake"
+
+import httpx
+from sqlalchemy import func, select, update
+from app.main import app
+from app.core import archival
+from app.db import models
+from app.db.session import engine
+from app.db.backfill import backfill_chat_sessions
+from benchmarks.chat_load_test import API, FAQS
+
+MESSAGES = ("What is your return policy?", "How long does shipping take?", "Do you ship abroad?")
+
+def backdate(session_id: str, days: int):
+    """Moves a session's messages and metadata days into the past."""
+    delta = datetime.timedelta(days=days)
+    with engine.begin() as conn:
+        # Row by row: date arithmetic in SQL isn't portable (SQLite stores datetimes as text).
+        for model, columns in ((models.ChatHistory, ("timestamp",)), (models.ChatSession, ("created_at", "last_updated"))):
+            rows = conn.execute(select(model.id, *(getattr(model, c) for c in columns)).where(model.session_id == session_id)).all()
+            for row_id, *values in rows:
+                conn.execute(update(model).where(model.id == row_id).values({c: v - delta for c, v in zip(columns, values)}))
+
+def count(model, session_id: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model).where(model.session_id == session_id)).scalar()
+
+async def main() -> bool:
+    results = []
+
+    def check(name: str, ok: bool, **details):
+        results.append(ok)
+        print(json.dumps({"check": name, "ok": ok, **details}, default=str), flush=True)
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://retention-check", timeout=None) as client:
+        await client.post(f"{API}/auth/admin/register", json={"email": "admin@example.com", "password": "password"})
+        admin_token = (await client.post(f"{API}/auth/admin/login", data={"username": "admin@example.com", "password": "password"})).json()["access_token"]
+        admin = {"Authorization": f"Bearer {admin_token}"}
+        bot_id = (await client.post(
+            f"{API}/bots/", data={"name": "retention-bot"},
+            files={"file": ("faqs.json", json.dumps(FAQS), "application/json")}, headers=admin,
+        )).json()["id"]
+        bot = (await client.patch(f"{API}/bots/{bot_id}", json={"archive_after_days": 30, "retention_days": 90}, headers=admin)).json()
+        check("bot policy saved", (bot["archive_after_days"], bot["retention_days"], bot["prompt_token_budget"]) == (30, 90, None))
+        await client.post(f"{API}/auth/{bot_id}/register", json={"email": "user@example.com", "password": "password"})
+        user_token = (await client.post(f"{API}/auth/{bot_id}/login", data={"username": "user@example.com", "password": "password"})).json()["access_token"]
+        user = {"Authorization": f"Bearer {user_token}"}
+
+        idle, expired, fresh = (f"{name}-{uuid.uuid4().hex[:8]}" for name in ("idle", "expired", "fresh"))
+        for session_id in (idle, expired, fresh):
+            for message in MESSAGES:
+                (await client.post(f"{API}/chat/{bot_id}", json={"session_id": session_id, "message": message}, headers=user)).raise_for_status()
+        backdate(idle, 40)
+        backdate(expired, 120)
+        before = (await client.get(f"{API}/chat/history/{idle}", headers=user)).json()
+
+        totals = await archival.run_retention()
+        check("policy applied", totals == {"archived": 1, "deleted": 1}, totals=totals)
+        with engine.connect() as conn:
+            archive = conn.execute(select(models.ChatArchive).where(models.ChatArchive.session_id == idle)).one()
+        raw_size = sum(len(json.dumps(message)) for message in before)
+        check("idle session moved to chat_archives", count(models.ChatHistory, idle) == 0 and archive.message_count == len(before),
+              archived_messages=archive.message_count, json_bytes=raw_size, archive_bytes=len(archive.messages))
+        after = (await client.get(f"{API}/chat/history/{idle}", headers=user)).json()
+        check("archived history unchanged", after == before, messages=len(after))
+        paged, cursor = [], None
+        while True:
+            response = await client.get(f"{API}/chat/history/{idle}", params={"limit": 4, **({"cursor": cursor} if cursor else {})}, headers=user)
+            paged += response.json()
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        check("archived history pages", paged == before, pages_total=len(paged))
+        summary = await client.get(f"{API}/chat/summary/{idle}", headers=user)
+        check("archived session summary", summary.status_code == 200, status=summary.status_code)
+        job = (await client.post(f"{API}/admin/bots/{bot_id}/process-summaries", headers=admin)).json()
+        summaries = {s["session_id"] for s in (await client.get(f"{API}/admin/bots/{bot_id}/summaries", headers=admin)).json()}
+        check("summary job reads archived sessions", {idle, fresh} <= summaries, job=job)
+
+        (await client.post(f"{API}/chat/{bot_id}", json={"session_id": idle, "message": "Thanks!"}, headers=user)).raise_for_status()
+        resumed = (await client.get(f"{API}/chat/history/{idle}", headers=user)).json()
+        check("resumed session merges archive and new messages",
+              resumed[:len(before)] == before and [m["message"] for m in resumed[len(before):]][:1] == ["Thanks!"],
+              messages=len(resumed))
+
+        deleted = (count(models.ChatHistory, expired), count(models.ChatSession, expired), count(models.ChatSummary, expired))
+        expired_history = await client.get(f"{API}/chat/history/{expired}", headers=user)
+        check("expired session deleted", deleted == (0, 0, 0) and expired_history.status_code == 404, rows_left=deleted)
+        check("fresh session untouched", count(models.ChatHistory, fresh) == 2 * len(MESSAGES) and count(models.ChatArchive, fresh) == 0)
+
+        rolling_summary = ("Earlier: the user asked about returns.", datetime.datetime(2024, 1, 1))
+        with engine.begin() as conn:
+            conn.execute(update(models.ChatSession).where(models.ChatSession.session_id == fresh).values(
+                history_summary=rolling_summary[0], history_summary_upto=rolling_summary[1],
+            ))
+        session_columns = (models.ChatSession.session_id, models.ChatSession.message_count,
+                           models.ChatSession.history_summary, models.ChatSession.history_summary_upto)
+        with engine.connect() as conn:
+            sessions_before = {row[0]: tuple(row[1:]) for row in conn.execute(select(*session_columns))}
+        with engine.begin() as conn:
+            backfill_chat_sessions(conn)
+        with engine.connect() as conn:
+            sessions_after = {row[0]: tuple(row[1:]) for row in conn.execute(select(*session_columns))}
+        check("backfill keeps archived sessions", {k: v[0] for k, v in sessions_after.items()} == {k: v[0] for k, v in sessions_before.items()},
+              message_counts={k: v[0] for k, v in sessions_after.items()})
+        check("backfill keeps rolling summaries", sessions_after == sessions_before and sessions_after[fresh][1:] == rolling_summary,
+              fresh_session=sessions_after.get(fresh))
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
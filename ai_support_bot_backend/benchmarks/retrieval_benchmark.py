@@ -0,0 +1,69 @@
+"""
+Recall/latency comparison of the FAQ retrieval backends on synthetic embeddings.
+
+Run from ai_support_bot_backend/:
+    python -m benchmarks.retrieval_benchmark --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import json
+import time
+import numpy as np
+from app.core.retrieval import ExactIndex, RETRIEVAL_BACKENDS, build_index
+
+def synthetic_faq_embeddings(n_rows: int, dim: int, n_topics: int, rng: np.random.Generator) -> np.ndarray:
+    # FAQ sets are clustered by topic, so sample around topic centres rather than uniformly.
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    embeddings = topics[rng.integers(0, n_topics, size=n_rows)]
+    embeddings += 0.6 * rng.standard_normal((n_rows, dim)).astype(np.float32)
+    return embeddings
+
+def run(n_rows: int, dim: int, n_queries: int, top_k: int, n_probe: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    embeddings = synthetic_faq_embeddings(n_rows, dim, n_topics=max(8, n_rows // 500), rng=rng)
+    # Queries are paraphrases of existing FAQs: a stored vector plus noise.
+    queries = embeddings[rng.integers(0, n_rows, size=n_queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    exact = ExactIndex(embeddings)
+    truth = [set(exact.search(q, top_k)[1].tolist()) for q in queries]
+
+    results = []
+    for backend in RETRIEVAL_BACKENDS:
+        start = time.perf_counter()
+        index = build_index(backend, embeddings, n_probe=n_probe)
+        build_seconds = time.perf_counter() - start
+
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            _, indices = index.search(query, top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(expected & set(indices.tolist()))
+
+        results.append({
+            "backend": backend,
+            "rows": n_rows,
+            "build_s": round(build_seconds, 3),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            f"recall@{top_k}": round(hits / (len(queries) * top_k), 4),
+            "index_mb": round(index.nbytes / 2**20, 1),
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--n-probe", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for n_rows in args.sizes:
+        for result in run(n_rows, args.dim, args.queries, args.top_k, args.n_probe, args.seed):
+            print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
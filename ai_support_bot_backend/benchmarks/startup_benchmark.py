@@ -0,0 +1,68 @@
+"""
+Application startup benchmark, to be tracked across releases.
+
+Each run starts a fresh interpreter and reports, in seconds since the interpreter started:
+import_s (app.main imported), serving_s (lifespan done, first request answered) and ready_s
+(GET /ready returned 200, i.e. the embedding model is warm), plus peak RSS after import and
+once ready. Uses a throwaway SQLite database and the fake LLM provider.
+
+Run from ai_support_bot_backend/:
+    python -m benchmarks.startup_benchmark --runs 5
+    WARM_UP_ON_STARTUP=false python -m benchmarks.startup_benchmark
+"""
+import os
+import sys
+import json
+import uuid
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+CHILD = r"""
+import time, json, asyncio, resource
+start = time.perf_counter()
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+from app.main import app
+result = {"import_s": time.perf_counter() - start, "import_rss_mb": rss_mb()}
+
+async def main():
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+        (await client.get("/")).raise_for_status()
+        result["serving_s"] = time.perf_counter() - start
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.01)
+        result["ready_s"] = time.perf_counter() - start
+        result["ready_rss_mb"] = rss_mb()
+
+asyncio.run(main())
+print(json.dumps({key: round(value, 3) for key, value in result.items()}))
+"""
+
+def run_once() -> dict:
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "startup-benchmark-secret")
+    env.setdefault("JWT_ALGORITHM", "HS256")
+    env.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+    env["DATABASE_URL"] = f"sqlite:///{tempfile.gettempdir()}/startup_benchmark_{uuid.uuid4().hex}.db"
+    env["LLM_PROVIDER"] = "fake"
+    output = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    for run in runs:
+        print(json.dumps(run))
+    print(json.dumps({"median": {key: statistics.median(run[key] for run in runs) for key in runs[0]}}))
+
+if __name__ == "__main__":
+    main()